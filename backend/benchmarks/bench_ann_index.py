@@ -0,0 +1,95 @@
+"""
+Recall@k vs latency vs memory of the index types in app.db.ann_index, over synthetic
+clustered vectors; ground truth comes from the exact flat index.
+
+    python benchmarks/bench_ann_index.py --size 100000 --dim 1536 --pq-m 64
+    python benchmarks/bench_ann_index.py --types hnsw --ef-search 16 32 64 128 256
+
+Each row is one (type, nprobe/efSearch) point; pick the cheapest one meeting the recall target.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import faiss  # noqa: E402
+from app.db.ann_index import INDEX_TYPES, IndexConfig, index_memory_bytes  # noqa: E402
+
+
+def synthetic_vectors(size: int, dim: int, clusters: int, seed: int = 0) -> np.ndarray:
+    """
+    Gaussian blobs in a low-dimensional latent space, projected up to dim: like real
+    embeddings, and unlike uniform noise, the data has low intrinsic dimension.
+    """
+    latent_dim = min(dim, 32)
+    basis = np.random.default_rng(42).standard_normal((latent_dim, dim), dtype="float32")
+    centres = np.random.default_rng(43).standard_normal((clusters, latent_dim), dtype="float32")
+    rng = np.random.default_rng(seed)
+    latent = centres[rng.integers(0, clusters, size)] + 0.3 * rng.standard_normal((size, latent_dim), dtype="float32")
+    return latent @ basis + 0.05 * rng.standard_normal((size, dim), dtype="float32")
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    return np.mean([len(set(f) & set(t)) / len(t) for f, t in zip(found, truth)])
+
+
+def measure(index, queries: np.ndarray, k: int, params=None):
+    """Return (result ids, p50 ms, p99 ms) searching one query at a time like the API does."""
+    ids, latencies = [], []
+    for q in queries:
+        start = time.perf_counter()
+        _, I = index.search(q[None, :], k, params=params)
+        latencies.append(time.perf_counter() - start)
+        ids.append(I[0])
+    ms = np.array(latencies) * 1000
+    return np.array(ids), np.percentile(ms, 50), np.percentile(ms, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--clusters", type=int, default=500)
+    parser.add_argument("--types", nargs="+", default=[t for t in INDEX_TYPES if t != "flat"], choices=INDEX_TYPES)
+    parser.add_argument("--nlist", type=int, default=1024)
+    parser.add_argument("--pq-m", type=int, default=32)
+    parser.add_argument("--hnsw-m", type=int, default=32)
+    parser.add_argument("--train-sample", type=int, default=100_000)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[16, 64, 256])
+    args = parser.parse_args()
+
+    vectors = synthetic_vectors(args.size, args.dim, args.clusters)
+    queries = synthetic_vectors(args.queries, args.dim, args.clusters, seed=1)
+
+    flat = IndexConfig("flat").build(vectors)
+    truth, p50, p99 = measure(flat, queries, args.k)
+    print(f"size={args.size} dim={args.dim} queries={args.queries} k={args.k} threads={faiss.omp_get_max_threads()}")
+    print(f"{'type':<11} {'param':<12} {'build s':>8} {'memory MB':>10} {'recall@k':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    print(f"{'flat':<11} {'-':<12} {0:>8.1f} {index_memory_bytes(flat) / 2**20:>10.1f} {1:>9.3f} {p50:>8.3f} {p99:>8.3f}")
+
+    for kind in args.types:
+        config = IndexConfig(kind, nlist=args.nlist, pq_m=args.pq_m, hnsw_m=args.hnsw_m,
+                             train_sample=args.train_sample)
+        start = time.perf_counter()
+        index = config.build(vectors)
+        build_s = time.perf_counter() - start
+        memory_mb = index_memory_bytes(index) / 2**20
+
+        sweep = [("efSearch", {"ef_search": ef}) for ef in args.ef_search] if kind == "hnsw" else \
+            [("nprobe", {"nprobe": n}) for n in args.nprobe]
+        for name, kwargs in sweep:
+            found, p50, p99 = measure(index, queries, args.k, config.search_params(index, **kwargs))
+            param = f"{name}={next(iter(kwargs.values()))}"
+            print(f"{kind:<11} {param:<12} {build_s:>8.1f} {memory_mb:>10.1f} "
+                  f"{recall_at_k(found, truth):>9.3f} {p50:>8.3f} {p99:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+p50 / p99 latency of an authenticated request through the real middleware stack
+(CORS, rate limit, auth_middleware) with and without the auth cache. Users are
+looked up in a stand-in for Mongo that answers after --mongo-ms; Redis is fakeredis.
+
+    python benchmarks/bench_auth_cache.py --mongo-ms 1
+"""
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+sys.path.insert(0, str(BACKEND_DIR / "src"))
+
+import tests.conftest  # noqa: E402,F401  (settings defaults)
+import fakeredis  # noqa: E402
+import httpx  # noqa: E402
+import numpy as np  # noqa: E402
+from bson import ObjectId  # noqa: E402
+from fastapi import FastAPI, Request  # noqa: E402
+
+from app.db import redis as app_redis  # noqa: E402
+
+app_redis.async_redis_client = fakeredis.FakeAsyncRedis(decode_responses=True)
+
+from app.core import middleware  # noqa: E402
+from app.core.security import create_access_token  # noqa: E402
+from app.services.auth_cache import AuthCache  # noqa: E402
+from app.utils import rate_limiter  # noqa: E402
+from app.utils.rate_limiter import HybridRateLimiter, RedisRateLimiter  # noqa: E402
+
+
+def build_app() -> FastAPI:
+    rate_limiter.general_limiter = HybridRateLimiter(RedisRateLimiter(app_redis.async_redis_client, 10 ** 9, 60))
+    app = FastAPI()
+    middleware.setup_middlewares(app)
+
+    @app.get("/profile/")
+    async def profile(request: Request):
+        return {"username": request.state.user["username"]}
+
+    return app
+
+
+async def measure(app: FastAPI, tokens: list[str], requests: int):
+    samples = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for i in range(requests):
+            start = time.perf_counter()
+            response = await client.get("/profile/", headers={"Authorization": f"Bearer {tokens[i % len(tokens)]}"})
+            samples.append(time.perf_counter() - start)
+            response.raise_for_status()
+    ms = np.array(samples) * 1000
+    return np.percentile(ms, 50), np.percentile(ms, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--mongo-ms", type=float, default=1.0, help="latency of a user lookup")
+    args = parser.parse_args()
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    records = {str(ObjectId()): {"username": f"user{i}"} for i in range(args.users)}
+    tokens = [create_access_token({"sub": user_id}) for user_id in records]
+
+    def find_user(user_id):
+        time.sleep(args.mongo_ms / 1000)
+        return records.get(user_id)
+
+    app = build_app()
+    print(f"requests={args.requests} users={args.users} mongo={args.mongo_ms}ms")
+    for name, size in (("no cache", 0), ("auth cache", 10_000)):
+        middleware.auth_cache = AuthCache(size=size, ttl=60, find_user=find_user)
+        p50, p99 = asyncio.run(measure(app, tokens, args.requests))
+        print(f"{name:>10} | p50={p50:6.3f}ms p99={p99:6.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
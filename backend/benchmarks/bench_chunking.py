@@ -0,0 +1,72 @@
+"""
+Chunking throughput on a large generated PDF: the original path (join every page's
+text, then fixed 200-word windows) versus pages streamed through the TokenChunker.
+Reports pages/s, chunks/s, peak traced memory and the spread of chunk sizes in tokens.
+
+    python benchmarks/bench_chunking.py --pages 2000 --max-tokens 400 --overlap 50
+"""
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+sys.path.insert(0, str(BACKEND_DIR / "src"))
+
+import tests.conftest  # noqa: E402,F401  (settings defaults)
+import PyPDF2  # noqa: E402
+from app.services.chunking import TokenChunker, WordChunker  # noqa: E402
+from app.utils.tokens import count_tokens  # noqa: E402
+from tests.fake_pdf import generated_pages, write_pdf  # noqa: E402
+
+
+def joined_words(path):
+    reader = PyPDF2.PdfReader(path)
+    text = "\n".join([p.extract_text() or "" for p in reader.pages])
+    return [{"text": c["text"]} for c in WordChunker(200)([(0, text)])]
+
+
+def streamed_tokens(path, max_tokens, overlap):
+    reader = PyPDF2.PdfReader(path)
+    pages = ((i + 1, p.extract_text() or "") for i, p in enumerate(reader.pages))
+    # Keep only the sizes, as process_pdf drops each batch once it is embedded
+    return [{"tokens": c["tokens"]} for c in TokenChunker(max_tokens, overlap)(pages)]
+
+
+def run(name, fn, pages):
+    tracemalloc.start()
+    start = time.perf_counter()
+    chunks = fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    sizes = [c["tokens"] if "tokens" in c else count_tokens(c["text"]) for c in chunks]
+    print(f"{name:<16} {pages / elapsed:>8.0f} {len(chunks) / elapsed:>9.0f} {peak / 2**20:>8.1f} "
+          f"{len(chunks):>7} {min(sizes):>5} {statistics.median(sizes):>6.0f} {max(sizes):>5} {statistics.pstdev(sizes):>6.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--lines-per-page", type=int, default=50)
+    parser.add_argument("--max-tokens", type=int, default=400)
+    parser.add_argument("--overlap", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "large.pdf"
+        write_pdf(path, generated_pages(args.pages, args.lines_per_page))
+        print(f"pages={args.pages} size={path.stat().st_size / 2**20:.1f} MB")
+        print(f"{'chunker':<16} {'pages/s':>8} {'chunks/s':>9} {'peak MB':>8} {'chunks':>7} "
+              f"{'min':>5} {'median':>6} {'max':>5} {'stdev':>6}")
+        run("join+200 words", lambda: joined_words(path), args.pages)
+        run("stream+tokens", lambda: streamed_tokens(path, args.max_tokens, args.overlap), args.pages)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Embedding throughput for a document's chunks: one request per chunk (old
+process_pdf loop) versus create_embeddings with sequential and concurrent
+batches, against a local fake OpenAI server with injected per-request latency.
+
+    python benchmarks/bench_embeddings.py --chunks 300 --latency 0.05 --batch-inputs 32 --concurrency 8
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+sys.path.insert(0, str(BACKEND_DIR / "src"))
+
+import tests.conftest  # noqa: E402,F401  (settings defaults)
+from openai import OpenAI  # noqa: E402
+from app.services import embedding_service  # noqa: E402
+from tests.fake_openai import FakeOpenAIServer  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=300)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per request")
+    parser.add_argument("--batch-inputs", type=int, default=embedding_service.EMBEDDING_BATCH_MAX_INPUTS)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+    embedding_service.EMBEDDING_BATCH_MAX_INPUTS = args.batch_inputs
+
+    server = FakeOpenAIServer(latency=args.latency).start()
+    embedding_service.client = OpenAI(api_key="bench", base_url=server.base_url, max_retries=0)
+    chunks = [f"chunk {i} " + "lorem ipsum dolor sit amet " * 40 for i in range(args.chunks)]
+
+    start = time.perf_counter()
+    for c in chunks:
+        embedding_service.create_embedding(c)
+    loop = time.perf_counter() - start
+
+    start = time.perf_counter()
+    embedding_service.create_embeddings(chunks, max_concurrency=1)
+    batched = time.perf_counter() - start
+
+    start = time.perf_counter()
+    embedding_service.create_embeddings(chunks, max_concurrency=args.concurrency)
+    concurrent = time.perf_counter() - start
+    server.stop()
+
+    print(f"chunks={args.chunks} latency={args.latency * 1000:.0f}ms/request batch={args.batch_inputs}")
+    print(f"per-chunk loop:           {args.chunks / loop:8.1f} chunks/s ({loop:.2f}s)")
+    print(f"batched, sequential:      {args.chunks / batched:8.1f} chunks/s ({batched:.2f}s)")
+    print(f"batched, concurrency={args.concurrency:<3} {args.chunks / concurrent:8.1f} chunks/s ({concurrent:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
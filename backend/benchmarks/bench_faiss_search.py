@@ -0,0 +1,76 @@
+"""
+Search latency of FaissStore with a full reload per query (old behaviour)
+versus the change-aware refresh.
+
+    python benchmarks/bench_faiss_search.py --sizes 10000 100000 1000000
+
+At dim=1536 a million vectors needs ~6 GB of RAM; use --dim to scale down.
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from app.db.faiss_store import FaissStore  # noqa: E402
+
+
+def build_store(data_dir: str, size: int, dim: int, users: int) -> FaissStore:
+    store = FaissStore(dim=dim, data_dir=data_dir)
+    rng = np.random.default_rng(0)
+    vectors = rng.random((size, dim), dtype="float32")
+    metadata = [
+        {"user_id": f"user{i % users}", "chunk": f"chunk {i}", "doc_id": f"doc{i // 50}", "filename": "bench.pdf"}
+        for i in range(size)
+    ]
+    store.add(list(vectors), metadata)
+    return store
+
+
+def percentiles(samples):
+    ms = np.array(samples) * 1000
+    return np.percentile(ms, 50), np.percentile(ms, 99)
+
+
+def run(size: int, dim: int, queries: int, users: int):
+    with tempfile.TemporaryDirectory() as data_dir:
+        build_store(data_dir, size, dim, users)
+        reader = FaissStore(dim=dim, data_dir=data_dir)
+        qs = np.random.default_rng(1).random((queries, dim), dtype="float32")
+
+        before, after = [], []
+        for q in qs:
+            start = time.perf_counter()
+            reader.reload()
+            reader.search(q, user_id="user0", top_k=5)
+            before.append(time.perf_counter() - start)
+
+        for q in qs:
+            start = time.perf_counter()
+            reader.search(q, user_id="user0", top_k=5)
+            after.append(time.perf_counter() - start)
+
+    b50, b99 = percentiles(before)
+    a50, a99 = percentiles(after)
+    print(f"{size:>9} | reload p50={b50:9.2f}ms p99={b99:9.2f}ms | refresh p50={a50:8.2f}ms p99={a99:8.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--users", type=int, default=100)
+    args = parser.parse_args()
+
+    print(f"dim={args.dim} queries={args.queries} users={args.users}")
+    for size in args.sizes:
+        run(size, args.dim, args.queries, args.users)
+
+
+if __name__ == "__main__":
+    main()
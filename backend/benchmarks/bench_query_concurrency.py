@@ -0,0 +1,133 @@
+"""
+Concurrent /query throughput of one uvicorn worker: the old handler (sync OpenAI,
+Redis and FAISS calls made directly on the event loop) versus the async path.
+OpenAI is a local fake server with --latency seconds per request; Redis is fakeredis.
+
+    python benchmarks/bench_query_concurrency.py --concurrency 20 --requests 100 --latency 0.2
+"""
+import argparse
+import asyncio
+import itertools
+import socket
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+sys.path.insert(0, str(BACKEND_DIR / "src"))
+
+import tests.conftest  # noqa: E402,F401  (settings defaults)
+import fakeredis  # noqa: E402
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+from fastapi import FastAPI, Form, Request  # noqa: E402
+from openai import AsyncOpenAI, OpenAI  # noqa: E402
+
+from app.api import query  # noqa: E402
+from app.db.faiss_store import FaissStore  # noqa: E402
+from app.services import embedding_service  # noqa: E402
+from app.services.answer_cache import SemanticAnswerCache  # noqa: E402
+from app.services.embedding_cache import EmbeddingCache  # noqa: E402
+from app.utils.rate_limiter import RedisRateLimiter  # noqa: E402
+from tests.fake_openai import FakeOpenAIServer, fake_embedding  # noqa: E402
+
+DIM = 64
+
+
+def build_app(openai_url: str, data_dir: str) -> FastAPI:
+    embedding_service.client = OpenAI(api_key="bench", base_url=openai_url, max_retries=0)
+    embedding_service.async_client = AsyncOpenAI(api_key="bench", base_url=openai_url, max_retries=0)
+    embedding_service.embedding_cache = EmbeddingCache(
+        fakeredis.FakeRedis(), local_size=10, ttl=60, async_redis_client=fakeredis.FakeAsyncRedis())
+
+    redis_server = fakeredis.FakeServer()
+    sync_redis = fakeredis.FakeRedis(server=redis_server, decode_responses=True)
+    query.llm_limiter = RedisRateLimiter(fakeredis.FakeAsyncRedis(server=redis_server, decode_responses=True),
+                                         limit=10 ** 9, window=60)
+    query.answer_cache = SemanticAnswerCache(
+        sync_redis,
+        fakeredis.FakeAsyncRedis(server=redis_server, decode_responses=True),
+        fakeredis.FakeAsyncRedis(server=redis_server),
+        threshold=0.95, ttl=60, max_entries=10_000,
+    )
+
+    store = FaissStore(dim=DIM, data_dir=data_dir)
+    chunks = [f"chunk {i}" for i in range(1000)]
+    store.add([fake_embedding(c, DIM) for c in chunks],
+              [{"user_id": "u1", "chunk": c, "doc_id": "d1", "filename": "a.pdf"} for c in chunks])
+    query.search_store = store
+
+    app = FastAPI()
+
+    @app.middleware("http")
+    async def fake_auth(request: Request, call_next):
+        request.state.user = {"_id": "u1"}
+        return await call_next(request)
+
+    @app.post("/before")
+    async def before(question: str = Form(...)):
+        # The pre-async handler: every call below blocks the event loop
+        if sync_redis.get(f"answer:u1:{question}"):
+            return "cached"
+        count = sync_redis.incr("llm_limit:user:u1")
+        query_emb = embedding_service.client.embeddings.create(
+            input=question, model=embedding_service.EMBEDDING_MODEL).data[0].embedding
+        results = store.search(query_emb, user_id="u1", top_k=5)
+        answer = embedding_service.ask_openai(query.build_prompt(results, question))
+        sync_redis.set(f"answer:u1:{question}", answer, ex=300)
+        return count
+
+    app.include_router(query.router)
+    return app
+
+
+def serve(app: FastAPI) -> tuple[str, uvicorn.Server]:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}", server
+
+
+async def load(url: str, requests: int, concurrency: int) -> float:
+    counter = itertools.count()
+
+    async def worker(client: httpx.AsyncClient):
+        while (i := next(counter)) < requests:
+            response = await client.post(url, data={"question": f"question number {i}?"})
+            response.raise_for_status()
+
+    start = time.perf_counter()
+    async with httpx.AsyncClient(timeout=120) as client:
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+    return requests / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per OpenAI request")
+    args = parser.parse_args()
+
+    openai_server = FakeOpenAIServer(dim=DIM, latency=args.latency).start()
+    with tempfile.TemporaryDirectory() as data_dir:
+        base_url, server = serve(build_app(openai_server.base_url, data_dir))
+        before = asyncio.run(load(f"{base_url}/before", args.requests, args.concurrency))
+        after = asyncio.run(load(f"{base_url}/query/", args.requests, args.concurrency))
+        server.should_exit = True
+    openai_server.stop()
+
+    print(f"requests={args.requests} concurrency={args.concurrency} openai latency={args.latency * 1000:.0f}ms")
+    print(f"blocking handler: {before:7.1f} req/s")
+    print(f"async handler:    {after:7.1f} req/s")
+
+
+if __name__ == "__main__":
+    main()
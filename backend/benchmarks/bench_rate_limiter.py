@@ -0,0 +1,84 @@
+"""
+Latency of the general rate limit check, and the Redis round-trips it makes, with
+the strict limiter (every check in Redis) and the hybrid one (counted in memory,
+synced every --sync-ms). Requests are spread over --keys users, as a worker sees
+them. Redis is fakeredis, each round-trip delayed by --rtt-ms.
+
+    python benchmarks/bench_rate_limiter.py --rtt-ms 1
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import fakeredis
+import numpy as np
+import redis.asyncio.client
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import tests.conftest  # noqa: E402,F401  (settings defaults)
+from app.utils.rate_limiter import HybridRateLimiter, RedisRateLimiter  # noqa: E402
+
+round_trips = 0
+
+
+def delay_round_trips(rtt: float):
+    command, pipeline = redis.asyncio.client.Redis.execute_command, redis.asyncio.client.Pipeline.execute
+
+    async def execute_command(client, *args, **kwargs):
+        global round_trips
+        round_trips += 1
+        await asyncio.sleep(rtt)
+        return await command(client, *args, **kwargs)
+
+    async def execute(pipe, *args, **kwargs):
+        global round_trips
+        round_trips += 1
+        await asyncio.sleep(rtt)
+        return await pipeline(pipe, *args, **kwargs)
+
+    redis.asyncio.client.Redis.execute_command = execute_command
+    redis.asyncio.client.Pipeline.execute = execute
+
+
+async def measure(limiter, requests: int, keys: int, rate: float):
+    global round_trips
+    samples, rejected = [], 0
+    round_trips = 0
+    for i in range(requests):
+        start = time.perf_counter()
+        allowed, _, _ = await limiter.take(f"ratelimit:user:{i % keys}")
+        samples.append(time.perf_counter() - start)
+        rejected += not allowed
+        await asyncio.sleep(1 / rate)  # lets the hybrid limiter's sync run
+    ms = np.array(samples) * 1000
+    return np.percentile(ms, 50), np.percentile(ms, 99), round_trips / requests, rejected
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--keys", type=int, default=50)
+    parser.add_argument("--rate", type=float, default=1000, help="requests per second")
+    parser.add_argument("--limit", type=int, default=20, help="requests per key per minute")
+    parser.add_argument("--rtt-ms", type=float, default=1.0)
+    parser.add_argument("--sync-ms", type=float, default=250)
+    parser.add_argument("--max-error", type=int, default=5)
+    args = parser.parse_args()
+    delay_round_trips(args.rtt_ms / 1000)
+
+    print(f"requests={args.requests} keys={args.keys} limit={args.limit}/min rtt={args.rtt_ms}ms")
+    for mode in ("strict", "hybrid"):
+        limiter = RedisRateLimiter(fakeredis.FakeAsyncRedis(decode_responses=True), args.limit, 60)
+        if mode == "hybrid":
+            limiter = HybridRateLimiter(limiter, args.sync_ms / 1000, args.max_error)
+        p50, p99, per_request, rejected = asyncio.run(measure(limiter, args.requests, args.keys, args.rate))
+        print(f"{mode:>7} | p50={p50:6.3f}ms p99={p99:6.3f}ms | "
+              f"Redis round-trips/request={per_request:.3f} | rejected={rejected}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Redis round-trips made by one POST /query/ (general rate limit middleware plus the
+handler), per path: a new question (LLM call), an exact cache hit, and a question
+refused by the LLM limit. A pipeline counts as one round-trip. With --rtt-ms each
+round-trip is delayed, to show what they cost against a remote Redis.
+
+    python benchmarks/bench_redis_roundtrips.py --rtt-ms 1
+
+Redis is fakeredis and OpenAI a local fake server; the shared clients in
+app.db.redis are replaced before the app is imported.
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+sys.path.insert(0, str(BACKEND_DIR / "src"))
+
+import tests.conftest  # noqa: E402,F401  (settings defaults)
+import fakeredis  # noqa: E402
+import httpx  # noqa: E402
+import redis.asyncio.client  # noqa: E402
+from fastapi import FastAPI, Request  # noqa: E402
+
+from app.db import redis as app_redis  # noqa: E402
+
+REDIS_SERVER = fakeredis.FakeServer()
+app_redis.redis_client = fakeredis.FakeRedis(server=REDIS_SERVER, decode_responses=True)
+app_redis.redis_binary_client = fakeredis.FakeRedis(server=REDIS_SERVER)
+app_redis.async_redis_client = fakeredis.FakeAsyncRedis(server=REDIS_SERVER, decode_responses=True)
+app_redis.async_redis_binary_client = fakeredis.FakeAsyncRedis(server=REDIS_SERVER)
+
+from openai import AsyncOpenAI  # noqa: E402
+from app.api import query  # noqa: E402
+from app.db.faiss_store import FaissStore  # noqa: E402
+from app.services import embedding_service  # noqa: E402
+from app.utils.rate_limiter import rate_limiter  # noqa: E402
+from tests.fake_openai import FakeOpenAIServer, fake_embedding  # noqa: E402
+
+DIM = 64
+
+
+class RoundTrips:
+    """Counts (and optionally delays) every command, and every pipeline as one."""
+
+    def __init__(self, rtt: float):
+        self.rtt = rtt
+        self.count = 0
+        self._command = redis.asyncio.client.Redis.execute_command
+        self._pipeline = redis.asyncio.client.Pipeline.execute
+
+    def install(self):
+        counter = self
+
+        async def execute_command(client, *args, **kwargs):
+            await counter.hit()
+            return await counter._command(client, *args, **kwargs)
+
+        async def execute(pipe, *args, **kwargs):
+            await counter.hit()
+            return await counter._pipeline(pipe, *args, **kwargs)
+
+        redis.asyncio.client.Redis.execute_command = execute_command
+        redis.asyncio.client.Pipeline.execute = execute
+
+    async def hit(self):
+        self.count += 1
+        if self.rtt:
+            await asyncio.sleep(self.rtt)
+
+
+def build_app(openai_url: str, data_dir: str, users: int) -> FastAPI:
+    embedding_service.async_client = AsyncOpenAI(api_key="bench", base_url=openai_url, max_retries=0)
+    store = FaissStore(dim=DIM, data_dir=data_dir)
+    chunks = [(f"user{u}", f"chunk {i}") for u in range(users) for i in range(20)]
+    store.add([fake_embedding(c, DIM) for _, c in chunks],
+              [{"user_id": user, "chunk": c, "doc_id": "d1", "filename": "a.pdf"} for user, c in chunks])
+    query.search_store = store
+    query.settings.RETRIEVAL_MIN_SCORE = 0.0
+
+    app = FastAPI()
+    app.middleware("http")(rate_limiter)
+
+    @app.middleware("http")
+    async def fake_auth(request: Request, call_next):
+        request.state.user = {"_id": request.headers["x-user"]}
+        return await call_next(request)
+
+    app.include_router(query.router)
+    return app
+
+
+async def measure(app: FastAPI, round_trips: RoundTrips, requests: int):
+    paths = {"new question": [], "exact cache hit": [], "LLM limit reached": []}
+    timings = {name: [] for name in paths}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def post(name, user, question):
+            round_trips.count = 0
+            start = time.perf_counter()
+            response = await client.post("/query/", data={"question": question}, headers={"x-user": user})
+            response.raise_for_status()
+            timings[name].append(time.perf_counter() - start)
+            paths[name].append(round_trips.count)
+
+        for i in range(requests):
+            user = f"user{i}"  # a fresh user per request, so no limit is reached by accident
+            await post("new question", user, f"what is in chunk {i}?")
+            await post("exact cache hit", user, f"What is in chunk {i}?")
+            for n in range(query.LLM_LIMIT_COUNT - 1):
+                await post("new question", user, f"question {n} of {user}?")
+            await post("LLM limit reached", user, "one question too many?")
+    return paths, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--rtt-ms", type=float, default=0.0, help="delay added to every Redis round-trip")
+    args = parser.parse_args()
+
+    round_trips = RoundTrips(args.rtt_ms / 1000)
+    round_trips.install()
+    openai_server = FakeOpenAIServer(dim=DIM).start()
+    with tempfile.TemporaryDirectory() as data_dir:
+        paths, timings = asyncio.run(measure(build_app(openai_server.base_url, data_dir, args.requests), round_trips, args.requests))
+    openai_server.stop()
+
+    print(f"requests={args.requests} rtt={args.rtt_ms}ms")
+    for name, counts in paths.items():
+        p50 = statistics.median(timings[name]) * 1000
+        print(f"{name:>18} | Redis round-trips p50={statistics.median(counts):g} max={max(counts)} | p50={p50:6.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
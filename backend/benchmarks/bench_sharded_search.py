@@ -0,0 +1,79 @@
+"""
+Search latency of a single in-process FaissStore versus scatter-gather over
+local search worker processes (one per shard), sharded by user_id and by doc_id.
+
+    python benchmarks/bench_sharded_search.py --size 200000 --shards 4
+
+At dim=1536 a million vectors needs ~6 GB of RAM; use --dim to scale down.
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from app.db.faiss_store import FaissStore  # noqa: E402
+from app.db.sharded_store import ShardedFaissStore, ShardSearchClient, shard_roots, start_local_workers  # noqa: E402
+
+AUTHKEY = b"bench"
+
+
+def fill(store, size: int, dim: int, users: int):
+    rng = np.random.default_rng(0)
+    vectors = rng.random((size, dim), dtype="float32")
+    metadata = [
+        {"user_id": f"user{i % users}", "chunk": f"chunk {i}", "doc_id": f"doc{i // 50}", "filename": "bench.pdf"}
+        for i in range(size)
+    ]
+    store.add(list(vectors), metadata)
+
+
+def timed(search, qs, users: int):
+    samples = []
+    for i, q in enumerate(qs):
+        start = time.perf_counter()
+        search(q, user_id=f"user{i % users}", top_k=5)
+        samples.append(time.perf_counter() - start)
+    ms = np.array(samples) * 1000
+    return np.percentile(ms, 50), np.percentile(ms, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--shards", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--users", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"size={args.size} dim={args.dim} shards={args.shards} queries={args.queries} users={args.users}")
+    qs = np.random.default_rng(1).random((args.queries, args.dim), dtype="float32")
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        single = FaissStore(dim=args.dim, data_dir=data_dir)
+        fill(single, args.size, args.dim, args.users)
+        p50, p99 = timed(single.search, qs, args.users)
+        print(f"{'in-process':>16} | p50={p50:8.2f}ms p99={p99:8.2f}ms")
+
+    for key in ("user_id", "doc_id"):
+        with tempfile.TemporaryDirectory() as root:
+            roots = shard_roots(root, args.shards)
+            fill(ShardedFaissStore(roots, key, dim=args.dim), args.size, args.dim, args.users)
+            addresses, processes = start_local_workers(roots, AUTHKEY, dim=args.dim)
+            try:
+                client = ShardSearchClient(addresses, AUTHKEY, key=key, timeout=30)
+                timed(client.search, qs[:args.users], args.users)  # workers load their shards
+                p50, p99 = timed(client.search, qs, args.users)
+            finally:
+                for process in processes:
+                    process.terminate()
+        print(f"{'by ' + key:>16} | p50={p50:8.2f}ms p99={p99:8.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Per-worker memory of N processes searching the same FaissStore, with shards read
+into each process (the default) versus memory-mapped read-only (FAISS_MMAP),
+like N uvicorn workers of the query API.
+
+    python benchmarks/bench_shared_index.py --size 500000 --workers 4
+
+RSS counts the mapped pages a worker touched, so it barely changes; what the
+workers share shows in RssAnon (private copies) and PSS (shared pages split
+between the processes mapping them).
+"""
+import argparse
+import multiprocessing
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from app.db.ann_index import IndexConfig  # noqa: E402
+from app.db.faiss_store import FaissStore  # noqa: E402
+
+
+def memory_mb() -> dict:
+    """RSS, RssAnon and PSS of this process in MB."""
+    fields = {}
+    for path in ("/proc/self/status", "/proc/self/smaps_rollup"):
+        with open(path) as f:
+            for line in f:
+                name, _, value = line.partition(":")
+                if name in ("VmRSS", "RssAnon", "Pss"):
+                    fields[name] = int(value.split()[0]) / 1024
+    return fields
+
+
+def worker(data_dir, dim, users, kind, mmap, ready, go, results):
+    store = FaissStore(dim=dim, data_dir=data_dir, index_config=IndexConfig(kind, min_vectors=1), mmap=mmap)
+    before = memory_mb()
+    query = np.random.default_rng(1).random(dim, dtype="float32")
+    for user in range(users):
+        store.search(query, user_id=f"user{user}", top_k=5)
+    ready.wait()
+    go.wait()  # measure PSS only once every worker has mapped the shards
+    results.put((before, memory_mb()))
+
+
+def run(data_dir, dim, users, kind, mmap, workers):
+    context = multiprocessing.get_context("spawn")
+    ready, go, results = context.Barrier(workers + 1), context.Barrier(workers + 1), context.Queue()
+    processes = [context.Process(target=worker, args=(data_dir, dim, users, kind, mmap, ready, go, results))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    ready.wait()
+    go.wait()
+    samples = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    loaded = {k: np.mean([after[k] - before[k] for before, after in samples]) for k in ("VmRSS", "RssAnon", "Pss")}
+    print(f"{'mmap' if mmap else 'copy':>5} | per worker after loading: RSS +{loaded['VmRSS']:8.1f} MB  "
+          f"RssAnon +{loaded['RssAnon']:8.1f} MB  PSS +{loaded['Pss']:8.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=500_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--type", default="flat", help="index type of the shards (see IndexConfig)")
+    args = parser.parse_args()
+
+    print(f"size={args.size} dim={args.dim} users={args.users} workers={args.workers} type={args.type}")
+    with tempfile.TemporaryDirectory() as data_dir:
+        store = FaissStore(dim=args.dim, data_dir=data_dir, index_config=IndexConfig(args.type, min_vectors=1))
+        vectors = np.random.default_rng(0).random((args.size, args.dim), dtype="float32")
+        metadata = [{"user_id": f"user{i % args.users}", "chunk": f"chunk {i}", "doc_id": f"doc{i // 50}"}
+                    for i in range(args.size)]
+        store.add(vectors, metadata)
+        if args.type != "flat":
+            store.rebuild_indexes()
+        del vectors, metadata
+
+        for mmap in (False, True):
+            run(data_dir, args.dim, args.users, args.type, mmap, args.workers)
+
+
+if __name__ == "__main__":
+    main()
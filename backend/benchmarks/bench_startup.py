@@ -0,0 +1,108 @@
+"""
+Cold-start time of each entry point: importing its module in a fresh interpreter,
+and for the API, starting uvicorn until /healthz (live) and /readyz (warm) answer.
+
+    python benchmarks/bench_startup.py --runs 5
+
+Only imports are timed for the consumers, as their run() connects to Kafka.
+Unset settings get harmless defaults, as in the tests.
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+
+ENTRY_POINTS = [
+    "app.main",
+    "app.main_uploaded_consumer",
+    "app.main_processed_consumer",
+    "app.main_notifier_consumer",
+    "app.main_index_writer",
+    "app.main_search_worker",
+    "app.main_rebuild_index",
+    "app.main_replay_dlq",
+]
+
+DEFAULTS = {
+    "OPENAI_API_KEY": "bench",
+    "MONGO_URI": "mongodb://localhost:27017",
+    "MONGO_DB": "bench",
+    "REDIS_HOST": "localhost",
+    "REDIS_PORT": "6379",
+    "SECRET_KEY": "bench",
+    "CELERY_BROKER_URL": "redis://localhost:6379/0",
+    "CELERY_RESULT_BACKEND": "redis://localhost:6379/0",
+    "KAFKA_BROKER": "localhost:9092",
+    "KAFKA_TOPIC_DOCUMENT_UPLOADED": "document_uploaded",
+    "KAFKA_TOPIC_DOCUMENT_PROCESSED": "document_processed",
+    "KAFKA_TOPIC_NOTIFICATION_READY": "notification_ready",
+    "UPLOADS_DIR": "/tmp/uploads",
+}
+
+
+def import_time(module: str, env: dict) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", f"import {module}"], cwd=SRC_DIR, env=env, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def _status(url: str) -> int | None:
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return None
+
+
+def api_start_time(env: dict) -> tuple[float, float]:
+    """Seconds from spawning uvicorn until /healthz, then /readyz, return 200."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    base = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port)], cwd=SRC_DIR,
+                              env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        live = ready = None
+        while ready is None and time.perf_counter() - start < 60:
+            if live is None and _status(f"{base}/healthz") == 200:
+                live = time.perf_counter() - start
+            if live is not None and _status(f"{base}/readyz") == 200:
+                ready = time.perf_counter() - start
+            time.sleep(0.005)
+        return live, ready
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    env = {**DEFAULTS, **os.environ}
+    for module in ENTRY_POINTS:
+        samples = [import_time(module, env) for _ in range(args.runs)]
+        print(f"{module:>30} | import median={statistics.median(samples) * 1000:7.0f}ms")
+
+    samples = [api_start_time(env) for _ in range(args.runs)]
+    live = statistics.median(s[0] for s in samples)
+    ready = statistics.median(s[1] for s in samples)
+    print(f"{'uvicorn app.main:app':>30} | live after {live * 1000:.0f}ms, ready after {ready * 1000:.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
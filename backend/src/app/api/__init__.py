@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api import login, signup, query, logout, profile
+from app.api import login, signup, query, logout, profile, metrics, health
 from . import upload
 
 api_router = APIRouter()
@@ -10,3 +10,5 @@ api_router.include_router(upload.router)
 api_router.include_router(query.router)
 api_router.include_router(logout.router)
 api_router.include_router(profile.router)
+api_router.include_router(metrics.router)
+api_router.include_router(health.router)
@@ -0,0 +1,23 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from app.core import startup
+
+router = APIRouter(tags=["health"])
+
+
+@router.get("/healthz")
+async def liveness():
+    """
+    The process is up and serving (liveness probe).
+    """
+    return {"status": "alive"}
+
+
+@router.get("/readyz")
+async def readiness():
+    """
+    Startup warm-up is done and the worker can take traffic (readiness probe).
+    """
+    if not startup.ready.is_set():
+        return JSONResponse(status_code=503, content={"status": "warming up"})
+    return {"status": "ready"}
@@ -2,6 +2,7 @@ from fastapi import APIRouter, Request
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
 from pathlib import Path
+from app.services.auth_cache import auth_cache
 
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
@@ -11,6 +12,10 @@ router = APIRouter(prefix="/logout", tags=["logout"])
 
 @router.get("/", response_class=HTMLResponse)
 async def logout(request: Request):
+    token = request.cookies.get("access_token", "").removeprefix("Bearer ")
+    payload = auth_cache.decode(token) if token else None
+    if payload and payload.get("sub"):
+        await auth_cache.invalidate(payload["sub"], token)
     response = templates.TemplateResponse("logout.html", {"request": request})
     response.delete_cookie(key="access_token", path="/")
     return response
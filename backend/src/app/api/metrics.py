@@ -0,0 +1,16 @@
+from fastapi import APIRouter
+from app.services.answer_cache import answer_cache
+from app.services.embedding_cache import embedding_cache
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+
+@router.get("/")
+async def get_metrics():
+    """
+    Cache counters of this worker process.
+    """
+    return {
+        "embedding_cache": embedding_cache.stats(),
+        "answer_cache": answer_cache.stats(),
+    }
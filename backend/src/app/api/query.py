@@ -1,16 +1,22 @@
-from fastapi import APIRouter, Form, Request, HTTPException
-from fastapi.responses import HTMLResponse
+import json
+from fastapi import APIRouter, Form, Request
+from fastapi.responses import HTMLResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
-from app.services import embedding_service
-from app.db.faiss_store import faiss_store
-from app.db.redis import redis_client
 from app.core.config import settings
+from app.services import embedding_service
+from app.db.sharded_store import search_store
+from app.db.lexical_index import is_lexical_query
+from app.db.redis import async_redis_client
+from app.services.answer_cache import answer_cache
+from app.utils.blocking import run_blocking
+from app.utils.rate_limiter import RedisRateLimiter
 from pathlib import Path
-from typing import Optional
+from typing import AsyncIterator, Optional
 
 # --- Configuration for LLM Cost Control ---
 LLM_LIMIT_COUNT = 5     # Only allow 5 expensive LLM calls
 LLM_LIMIT_WINDOW = 60   # Per 60 seconds
+LLM_LIMIT_MESSAGE = f"LLM Generation rate limit exceeded. Max {LLM_LIMIT_COUNT} queries per minute."
 
 # --- Initialization ---
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
@@ -26,23 +32,81 @@ def get_current_user_id(request: Request) -> Optional[str]:
         return str(user["_id"])
     return None
 
-def check_llm_rate_limit(user_id: str):
+# Strict rate limit specifically for costly LLM operations (per user)
+llm_limiter = RedisRateLimiter(async_redis_client, LLM_LIMIT_COUNT, LLM_LIMIT_WINDOW, settings.RATE_LIMIT_ALGORITHM)
+
+def llm_limit_key(user_id: str) -> str:
+    return f"llm_limit:user:{user_id}"
+
+async def lookup_cached_answer(user_id: str, question: str) -> tuple[Optional[str], Optional[list], bool]:
     """
-    Enforces a strict rate limit specifically for costly LLM operations (per user).
-    Raises HTTPException 429 if the limit is exceeded.
+    Exact match on the normalised question first, then by embedding similarity.
+    Returns (cached answer or None, query embedding or None if never computed,
+    whether an LLM call is allowed by the LLM rate limit).
+    The limit is checked in the same Redis round-trip as the exact match, and only
+    counted when it misses; a call counted for a question then answered by
+    similarity is given back. The query embedding is needed for retrieval anyway
+    (and is itself cached), except for identifier lookups, which keyword search
+    answers without one.
     """
-    key = f"llm_limit:user:{user_id}"
-    
-    count = redis_client.incr(key)
-    
-    if count == 1:
-        redis_client.expire(key, LLM_LIMIT_WINDOW)
+    limit_key = llm_limit_key(user_id)
+    cached, allowed = await answer_cache.get_exact_or_take(user_id, question, llm_limiter, limit_key)
+    if cached is not None:
+        return cached, None, True
+    if is_lexical_query(question):
+        return None, None, allowed
+    query_emb = await embedding_service.create_embedding_async(question)
+    cached = await answer_cache.get_similar(user_id, query_emb)
+    if cached is not None and allowed:
+        await llm_limiter.give_back(limit_key)
+    return cached, query_emb, allowed
+
+def retrieve_context(query_emb: Optional[list], user_id: str, question: str) -> list:
+    """
+    The user's most similar chunks that clear the relevance threshold and fit the
+    context budget, so irrelevant text never reaches the LLM prompt. Keyword (BM25)
+    hits are fused in when RETRIEVAL_HYBRID is on, and are all there is when no
+    embedding was computed (see lookup_cached_answer). Blocking.
+    """
+    return search_store.search(
+        query_emb,
+        user_id=user_id,
+        top_k=settings.RETRIEVAL_TOP_K,
+        min_score=settings.RETRIEVAL_MIN_SCORE,
+        max_tokens=settings.RETRIEVAL_MAX_CONTEXT_TOKENS,
+        query_text=question if settings.RETRIEVAL_HYBRID or query_emb is None else None,
+    )
 
-    if count > LLM_LIMIT_COUNT:
-        raise HTTPException(
-            status_code=429, 
-            detail=f"LLM Generation rate limit exceeded. Max {LLM_LIMIT_COUNT} queries per minute."
-        )
+def build_prompt(results: list, question: str) -> str:
+    context = "\n".join([r[0]["chunk"] for r in results])
+
+    return f"""Answer the question based only on the context below.
+If the answer is not contained within the context, say 'I don't know.'
+
+Context:
+{context}
+
+Question:
+{question}
+"""
+
+def sse_event(event: str, data) -> str:
+    """Format one server-sent event; data is JSON-encoded so newlines stay intact."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def sse_events(*events: tuple[str, object]) -> AsyncIterator[str]:
+    """A fixed sequence of (event, data) pairs as an SSE stream."""
+    for event, data in events:
+        yield sse_event(event, data)
+
+def sse_response(events: AsyncIterator[str], status_code: int = 200) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        status_code=status_code,
+        media_type="text/event-stream",
+        # Disable proxy buffering so tokens reach the browser as they are produced
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 # --- Endpoints ---
 
@@ -67,40 +131,37 @@ async def query_post(request: Request, question: str = Form(...)):
         )
 
     # --- 1. Caching Check (User-Specific) ---
-    cache_key = f"answer:{user_id}:{question}"
+    cached, query_emb, llm_allowed = await lookup_cached_answer(user_id, question)
 
-    cached = redis_client.get(cache_key)
-    if cached:
-        # FIX: The cached object is already a string because the Redis client
-        # is configured with decode_responses=True. Removed .decode('utf-8').
-        answer = cached 
+    if cached is not None:
+        # The cached object is already a string because the Redis client
+        # is configured with decode_responses=True.
         return templates.TemplateResponse(
             "query.html",
             {
                 "request": request,
                 "question": question,
-                "answer": answer,
+                "answer": cached,
                 "cached": True,
             },
         )
 
     # --- 2. Cost Control Rate Limit ---
-    # Apply the strict, cost-specific limit here, BEFORE retrieving data for the LLM
-    try:
-        check_llm_rate_limit(user_id)
-    except HTTPException as e:
-        # Catch and render the specific rate limit error
+    # The strict, cost-specific limit (checked with the cache lookup), BEFORE retrieving data for the LLM
+    if not llm_allowed:
+        # Render the specific rate limit error
         return templates.TemplateResponse(
             "query.html",
-            {"request": request, "error": e.detail, "question": question},
+            {"request": request, "error": LLM_LIMIT_MESSAGE, "question": question},
         )
 
 
     # --- 3. Retrieval (User-Isolated Search) ---
     # This step retrieves context but does not incur LLM cost.
     # Note: user_id is passed for mandatory filtering (security)
-    query_emb = embedding_service.create_embedding(question)
-    results = faiss_store.search(query_emb, user_id=user_id, top_k=5) 
+    # Chunks below RETRIEVAL_MIN_SCORE or past the token budget are dropped here.
+    # The search is CPU-bound, so it runs on the blocking pool, not the event loop.
+    results = await run_blocking(retrieve_context, query_emb, user_id, question)
     
     if not results:
         return templates.TemplateResponse(
@@ -109,19 +170,9 @@ async def query_post(request: Request, question: str = Form(...)):
         )
 
     # --- 4. Context Construction & LLM Generation (The Costly Step) ---
-    context = "\n".join([r[0]["chunk"] for r in results])
-
-    prompt = f"""Answer the question based only on the context below.
-If the answer is not contained within the context, say 'I don't know.'
-
-Context:
-{context}
-
-Question:
-{question}
-"""
+    prompt = build_prompt(results, question)
     try:
-        answer = embedding_service.ask_openai(prompt)
+        answer = await embedding_service.ask_openai_async(prompt)
     except Exception as e:
         return templates.TemplateResponse(
             "query.html",
@@ -130,7 +181,7 @@ Question:
 
 
     # --- 5. Cache Result ---
-    redis_client.setex(cache_key, settings.REDIS_CACHE_TTL, answer)
+    await answer_cache.put(user_id, question, query_emb, answer)
 
     return templates.TemplateResponse(
         "query.html",
@@ -141,3 +192,48 @@ Question:
             "cached": False,
         },
     )
+
+
+@router.post("/stream")
+async def query_stream(request: Request, question: str = Form(...)):
+    """
+    Same pipeline as query_post, but the answer is sent as server-sent events while
+    the LLM generates it:
+      event: token  data: "<text>"            (repeated)
+      event: done   data: {"cached": bool}
+      event: error  data: "<message>"
+    """
+    user_id = get_current_user_id(request)
+    if not user_id:
+        return sse_response(sse_events(("error", "Not authenticated")), status_code=401)
+
+    # --- 1. Caching Check (User-Specific) ---
+    cached, query_emb, llm_allowed = await lookup_cached_answer(user_id, question)
+    if cached is not None:
+        return sse_response(sse_events(("token", cached), ("done", {"cached": True})))
+
+    # --- 2. Cost Control Rate Limit ---
+    if not llm_allowed:
+        return sse_response(sse_events(("error", LLM_LIMIT_MESSAGE)), status_code=429)
+
+    # --- 3. Retrieval (User-Isolated Search) ---
+    results = await run_blocking(retrieve_context, query_emb, user_id, question)
+    if not results:
+        return sse_response(sse_events(("error", "No relevant context found in your documents.")))
+
+    # --- 4. Streamed LLM Generation ---
+    async def generate():
+        parts = []
+        try:
+            async for token in embedding_service.ask_openai_stream(build_prompt(results, question)):
+                parts.append(token)
+                yield sse_event("token", token)
+        except Exception as e:
+            yield sse_event("error", f"LLM Generation failed: {str(e)}")
+            return
+
+        # --- 5. Cache Result (once the whole answer is known) ---
+        await answer_cache.put(user_id, question, query_emb, "".join(parts))
+        yield sse_event("done", {"cached": False})
+
+    return sse_response(generate())
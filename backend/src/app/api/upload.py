@@ -3,7 +3,12 @@ from fastapi import APIRouter, UploadFile, Depends, HTTPException, Request, Form
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
 from app.db.mongo import documents_collection
+from app.db.sharded_store import index_store, search_store
+from app.db.index_spool import index_spool
 from app.kafka_events.producer import publish_document_uploaded
+from app.services import storage_service
+from app.services.answer_cache import answer_cache
+from app.utils.blocking import run_blocking
 from bson import ObjectId
 from datetime import datetime, timezone
 from app.core.logging import logger
@@ -88,3 +93,42 @@ async def upload_pdf(request: Request, file: UploadFile, description: str = Form
             "upload.html",
             {"request": request, "error": f"Upload failed: {str(e)}"},
         )
+
+
+@router.delete("/{doc_id}")
+async def delete_document(request: Request, doc_id: str):
+    """
+    Delete one of the user's documents: its chunks disappear from search at once
+    (tombstoned in the FAISS shard), its stored files and record are removed, and
+    the user's cached answers, which may quote it, are invalidated. The shard is
+    compacted in the background once enough of it is deleted.
+    """
+    user = getattr(request.state, "user", None)
+    if not user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    user_id = str(user["_id"])
+
+    doc = await run_blocking(documents_collection.find_one, {"_id": doc_id, "user_id": user_id})
+    if not doc:
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    chunks = await run_blocking(search_store.delete_document, user_id, doc_id)
+    await run_blocking(answer_cache.invalidate_user, user_id)
+
+    await run_blocking(storage_service.delete_file, doc_id)
+    if doc.get("path") and os.path.exists(doc["path"]):
+        os.remove(doc["path"])
+    await run_blocking(documents_collection.delete_one, {"_id": doc_id})
+
+    try:
+        # Compaction rewrites the shard, so it is the index writer's job (see INDEX_WRITES)
+        if settings.INDEX_WRITES == "direct":
+            await run_blocking(index_store.reclaim_deleted, user_id, doc_id)
+        else:
+            await run_blocking(index_spool.request_compaction, user_id, doc_id)
+    except Exception as e:
+        # The rows stay hidden; they are reclaimed with the shard's next compaction
+        logger.warning(f"Could not request compaction after deleting {doc_id}: {e}")
+
+    logger.info(f"Document {doc_id} deleted by user {user_id} ({chunks} chunks)")
+    return {"deleted": doc_id, "chunks": chunks}
@@ -6,9 +6,55 @@ class Settings(BaseSettings):
     # General
     PROJECT_NAME: str = "FAISS PDF RAG"
     DEBUG: bool = True
+    BLOCKING_IO_WORKERS: int = 16  # threads for blocking calls made from async handlers
 
     # OpenAI
     OPENAI_API_KEY: str
+    OPENAI_BASE_URL: str | None = None  # e.g. a local stub server in tests
+    OPENAI_EMBEDDING_CONCURRENCY: int = 4  # max in-flight embedding requests
+    OPENAI_EMBEDDING_RPM: int = 3000  # provider requests-per-minute limit
+    OPENAI_EMBEDDING_TPM: int = 1_000_000  # provider tokens-per-minute limit
+
+    # FAISS (see app.db.ann_index.IndexConfig)
+    FAISS_INDEX_TYPE: str = "flat"  # flat | hnsw | ivf_flat | ivf_pq | opq_ivf_pq
+    FAISS_ANN_MIN_VECTORS: int = 10_000  # shards smaller than this stay exact (flat)
+    FAISS_TRAIN_SAMPLE: int = 100_000  # vectors sampled to train IVF/PQ codebooks
+    FAISS_IVF_NLIST: int = 1024  # IVF centroids (capped by the training sample size)
+    FAISS_PQ_M: int = 64  # PQ bytes per vector; must divide the embedding dimension
+    FAISS_HNSW_M: int = 32  # HNSW graph neighbours per node
+    FAISS_NPROBE: int = 16  # IVF lists scanned per query
+    FAISS_EF_SEARCH: int = 64  # HNSW candidate list size per query
+    FAISS_WARM_SHARDS: int = 64  # most recently written user shards loaded in the background at startup
+    FAISS_MMAP: bool = False  # map index files read-only, shared by all processes on the host instead of copied into each
+
+    # Index writes (see app.db.index_writer)
+    INDEX_WRITES: str = "spool"  # spool: batches go through the index writer | direct: this process writes FAISS
+    INDEX_SPOOL_DIR: str = "/data/spool"  # batches waiting for the index writer
+    INDEX_SPOOL_POLL_INTERVAL: float = 0.2  # seconds between the writer's scans of the spool
+    INDEX_SPOOL_WAIT_TIMEOUT: float = 120  # seconds process_pdf waits for its batches to become searchable
+
+    # Sharded search (see app.db.sharded_store)
+    SEARCH_SHARDS: int = 0  # 0 = one store under /data; else users/docs are hash-partitioned over N shard roots
+    SEARCH_SHARD_KEY: str = "user_id"  # user_id (a query hits one shard) | doc_id (a query scatters to all)
+    SEARCH_SHARD_ROOT: str = "/data/shards"  # shard i lives in {root}/shard-{i}
+    SEARCH_SHARD_ADDRESSES: list[str] = []  # host:port of each shard's search worker; empty = search in-process
+    SEARCH_SHARD_TIMEOUT: float = 2.0  # seconds to wait for shards; slower ones are left out of the results
+    SEARCH_SHARD_AUTHKEY: str = ""  # secret shared by the API and the search workers only (required with them)
+
+    # Retrieval
+    RETRIEVAL_TOP_K: int = 5  # chunks retrieved per question
+    RETRIEVAL_MIN_SCORE: float = 0.75  # min cosine similarity for a chunk to reach the prompt (ada-002 scale)
+    RETRIEVAL_MAX_CONTEXT_TOKENS: int = 2000  # budget for the chunks put in the prompt
+    RETRIEVAL_HYBRID: bool = True  # fuse BM25 keyword hits with the vector hits
+
+    # Document processing (see app.services.chunking)
+    CHUNKER: str = "tokens"  # tokens | words (the original fixed 200-word windows)
+    CHUNK_MAX_TOKENS: int = 400  # model tokens per chunk
+    CHUNK_OVERLAP_TOKENS: int = 50  # trailing tokens repeated at the start of the next chunk
+    CHUNK_EMBED_BATCH: int = 512  # chunks embedded and indexed at a time while a PDF streams in
+    PDF_EXTRACT_WORKERS: int = 0  # processes extracting PDF pages (0 = one per CPU)
+    PDF_PAGES_PER_TASK: int = 8  # pages a worker extracts per task
+    PDF_PAGE_TIMEOUT: float = 10.0  # seconds before a page's extraction is abandoned and the page skipped
 
     # Mongo
     MONGO_URI: str
@@ -17,12 +63,27 @@ class Settings(BaseSettings):
     # Redis
     REDIS_HOST: str
     REDIS_PORT: int
+    REDIS_MAX_CONNECTIONS: int = 50  # per connection pool (one per client in app.db.redis)
+    REDIS_POOL_TIMEOUT: float = 5.0  # seconds a caller waits for a free pooled connection
+    REDIS_SOCKET_TIMEOUT: float = 2.0  # seconds to connect / for a reply
+    REDIS_HEALTH_CHECK_INTERVAL: int = 30  # seconds a connection may sit idle before it is pinged on reuse
+    RATE_LIMIT_ALGORITHM: str = "sliding_window"  # sliding_window | token_bucket (see app.utils.rate_limiter)
+    RATE_LIMIT_MODE: str = "hybrid"  # general API limit: hybrid (counted in memory, synced to Redis) | strict
+    RATE_LIMIT_SYNC_INTERVAL: float = 0.25  # seconds between syncs of the in-memory counts to Redis
+    RATE_LIMIT_MAX_ERROR: int = 5  # requests per key a worker may let through before syncing
     REDIS_CACHE_TTL: int = 300  # seconds
+    SEMANTIC_CACHE_THRESHOLD: float = 0.95  # min cosine similarity to reuse a cached answer
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 500  # cached questions per user before the set is reset
+    EMBEDDING_CACHE_TTL: int = 30 * 24 * 3600  # seconds an embedding stays in Redis
+    EMBEDDING_CACHE_LOCAL_SIZE: int = 10_000  # embeddings kept in each process's LRU
 
     # JWT
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60
+    AUTH_CACHE_SIZE: int = 10_000  # decoded tokens / user records cached per process (0 disables the cache)
+    AUTH_CACHE_TTL: int = 60  # seconds a user record may be served from the cache
+    AUTH_CACHE_REDIS_INVALIDATION: bool = True  # broadcast invalidations to the other workers over Redis pub/sub
 
     # Celery
     CELERY_BROKER_URL: str
@@ -35,6 +96,18 @@ class Settings(BaseSettings):
     KAFKA_TOPIC_DOCUMENT_UPLOADED: str
     KAFKA_TOPIC_DOCUMENT_PROCESSED: str
     KAFKA_TOPIC_NOTIFICATION_READY: str
+    KAFKA_TOPIC_DOCUMENT_DLQ: str = "document_uploaded_dlq"  # uploads that failed every attempt
+
+    # Kafka - Consumers (see app.kafka_events.base_consumer)
+    KAFKA_UPLOADED_CONCURRENCY: int = 4  # documents processed at once by an uploaded-consumer
+    KAFKA_PROCESSED_CONCURRENCY: int = 4  # document_processed events handled at once
+    KAFKA_POLL_MAX_RECORDS: int = 100  # records fetched per poll
+    KAFKA_MAX_IN_FLIGHT_PER_WORKER: int = 4  # polled-but-unfinished records per worker before partitions are paused
+    KAFKA_REDELIVERY_DELAY: float = 1.0  # seconds a partition waits before a record whose handler raised is redelivered
+
+    # Kafka - Retries (see app.kafka_events.retry)
+    KAFKA_RETRY_DELAYS: list[int] = [30, 120, 480, 1920]  # seconds before each retry; one retry topic per delay
+    KAFKA_RETRY_CONCURRENCY: int = 2  # retries processed at once per delay tier
 
     # Uploads
     UPLOADS_DIR: str
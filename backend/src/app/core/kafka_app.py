@@ -16,13 +16,13 @@ def get_kafka_producer():
     return _producer
 
 
-def get_kafka_consumer(topic: str, group_id: str = "default"):
+def get_kafka_consumer(topic: str, group_id: str = "default", enable_auto_commit: bool = True):
     """Return a Kafka consumer subscribed to the given topic."""
     return KafkaConsumer(
         topic,
         bootstrap_servers=[settings.KAFKA_BROKER],
         auto_offset_reset="earliest",
-        enable_auto_commit=True,
+        enable_auto_commit=enable_auto_commit,
         group_id=group_id,
         value_deserializer=lambda v: json.loads(v.decode("utf-8"))
     )
@@ -1,10 +1,11 @@
 import logging
+import os
 import sys
 from pathlib import Path
 
-# Create logs directory if it doesn't exist
-LOG_DIR = Path(__file__).resolve().parent.parent.parent / "logs"
-LOG_DIR.mkdir(exist_ok=True)
+# Create logs directory if it doesn't exist (LOG_DIR overrides it, e.g. for tests)
+LOG_DIR = Path(os.environ.get("LOG_DIR") or Path(__file__).resolve().parent.parent.parent / "logs")
+LOG_DIR.mkdir(parents=True, exist_ok=True)
 
 # Path for the log file
 LOG_FILE_PATH = LOG_DIR / "app.log"
@@ -15,7 +16,7 @@ logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
     handlers=[
         logging.StreamHandler(sys.stdout), # Console output
-        logging.FileHandler(LOG_FILE_PATH, encoding="utf-8"), # File output
+        logging.FileHandler(LOG_FILE_PATH, encoding="utf-8", delay=True), # File output, opened on the first record
     ],
 )
 
@@ -1,8 +1,7 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from app.utils.rate_limiter import rate_limiter
-from app.core.security import decode_access_token
-from app.db.mongo import users_collection
+from app.services.auth_cache import auth_cache
 from bson import ObjectId
 from fastapi.responses import JSONResponse
 from app.core.logging import logger
@@ -50,7 +49,7 @@ def setup_middlewares(app: FastAPI):
                 return JSONResponse(status_code=401, content={"error": "Missing token"})
 
             try:
-                payload = decode_access_token(token)
+                payload = auth_cache.decode(token)
                 logger.debug(f"Decoded payload: {payload}")
                 if not payload:
                     logger.debug("Invalid or expired token")
@@ -61,7 +60,7 @@ def setup_middlewares(app: FastAPI):
                     logger.debug(f"Invalid user ID: {user_id}")
                     return JSONResponse(status_code=401, content={"error": "Invalid user ID in token"})
 
-                user = users_collection.find_one({"_id": ObjectId(user_id)})
+                user = await auth_cache.get_user(user_id, token)
                 if not user:
                     logger.debug(f"User not found: {user_id}")
                     return JSONResponse(status_code=401, content={"error": "User not found"})
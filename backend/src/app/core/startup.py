@@ -0,0 +1,33 @@
+"""
+Background warm-up of the API process. Everything heavy is created lazily (OpenAI
+clients, Mongo connections, FAISS shards), so importing app.main stays fast and the
+server answers liveness probes at once; this loads what the first queries would
+otherwise wait for, and readiness (GET /readyz) is reported once it is done.
+"""
+import threading
+import time
+from app.db.sharded_store import search_store
+from app.services import embedding_service
+from app.core.config import settings
+from app.core.logging import logger
+
+ready = threading.Event()
+
+
+def warm_up():
+    started = time.monotonic()
+    try:
+        embedding_service.get_client()
+        embedding_service.get_async_client()
+        search_store.warm_up(settings.FAISS_WARM_SHARDS)
+    except Exception as e:
+        # Everything is loaded on demand anyway: serve cold rather than never
+        logger.error(f"[startup] Warm-up failed: {e}", exc_info=True)
+    ready.set()
+    logger.info(f"[startup] Ready after {time.monotonic() - started:.2f}s of warm-up")
+
+
+def start_warm_up() -> threading.Thread:
+    thread = threading.Thread(target=warm_up, name="warm-up", daemon=True)
+    thread.start()
+    return thread
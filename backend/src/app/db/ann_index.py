@@ -0,0 +1,111 @@
+import faiss
+import numpy as np
+
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq", "opq_ivf_pq")
+
+# k-means wants about this many training points per centroid (FAISS warns below it)
+MIN_POINTS_PER_CENTROID = 39
+
+
+class IndexConfig:
+    """
+    Which FAISS index a shard builds over its vectors, and how it is searched.
+
+    All indexes use inner product over L2-normalised vectors, i.e. cosine similarity.
+
+    - flat: exact brute-force scan (IndexFlatIP)
+    - hnsw: HNSW graph over the full vectors; ef_search trades recall for latency
+    - ivf_flat: inverted lists over nlist k-means centroids, full vectors; nprobe lists are scanned
+    - ivf_pq: as ivf_flat, but vectors are product-quantised to pq_m bytes
+    - opq_ivf_pq: ivf_pq behind a learned rotation (OPQ), better recall at the same size
+
+    Shards with fewer than min_vectors vectors always stay flat: they are cheap to
+    scan exactly and too small to train centroids on.
+    """
+
+    def __init__(self, kind="flat", nlist=1024, pq_m=64, hnsw_m=32, nprobe=16, ef_search=64,
+                 train_sample=100_000, min_vectors=10_000):
+        if kind not in INDEX_TYPES:
+            raise ValueError(f"Unknown FAISS index type {kind!r}, expected one of {', '.join(INDEX_TYPES)}")
+        self.kind = kind
+        self.nlist = nlist
+        self.pq_m = pq_m
+        self.hnsw_m = hnsw_m
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self.train_sample = train_sample
+        self.min_vectors = min_vectors
+
+    @classmethod
+    def from_settings(cls, settings) -> "IndexConfig":
+        return cls(
+            kind=settings.FAISS_INDEX_TYPE,
+            nlist=settings.FAISS_IVF_NLIST,
+            pq_m=settings.FAISS_PQ_M,
+            hnsw_m=settings.FAISS_HNSW_M,
+            nprobe=settings.FAISS_NPROBE,
+            ef_search=settings.FAISS_EF_SEARCH,
+            train_sample=settings.FAISS_TRAIN_SAMPLE,
+            min_vectors=settings.FAISS_ANN_MIN_VECTORS,
+        )
+
+    @property
+    def approximate(self) -> bool:
+        return self.kind != "flat"
+
+    def factory_string(self, ntrain: int) -> str:
+        """faiss.index_factory description; nlist is capped by the training set size."""
+        nlist = max(1, min(self.nlist, ntrain // MIN_POINTS_PER_CENTROID))
+        return {
+            "flat": "Flat",
+            "hnsw": f"HNSW{self.hnsw_m}",
+            "ivf_flat": f"IVF{nlist},Flat",
+            "ivf_pq": f"IVF{nlist},PQ{self.pq_m}",
+            "opq_ivf_pq": f"OPQ{self.pq_m},IVF{nlist},PQ{self.pq_m}",
+        }[self.kind]
+
+    def build(self, vectors: np.ndarray) -> faiss.Index:
+        """Train an index of this type on a sample of vectors, then add all of them."""
+        sample = vectors
+        if len(vectors) > self.train_sample:
+            rows = np.random.default_rng(0).choice(len(vectors), self.train_sample, replace=False)
+            sample = vectors[np.sort(rows)]
+
+        index = faiss.index_factory(vectors.shape[1], self.factory_string(len(sample)), faiss.METRIC_INNER_PRODUCT)
+        if not index.is_trained:
+            index.train(sample)
+        index.add(vectors)
+        return index
+
+    def search_params(self, index: faiss.Index, nprobe=None, ef_search=None, sel=None):
+        """
+        Per-query search parameters for index (None when there is nothing to set).
+        Passing them to search() instead of setting index.nprobe keeps concurrent
+        searches independent. sel is an optional faiss.IDSelector restricting the ids searched.
+        """
+        nprobe = nprobe or self.nprobe
+        ef_search = ef_search or self.ef_search
+
+        if isinstance(index, faiss.IndexPreTransform):
+            inner = self.search_params(faiss.downcast_index(index.index), nprobe, ef_search, sel)
+            if inner is None:
+                return None
+            params = faiss.SearchParametersPreTransform(index_params=inner)
+            params.referenced_objects = [inner]  # keep the SWIG object alive
+            return params
+        if isinstance(index, faiss.IndexIVF):
+            params = faiss.SearchParametersIVF(nprobe=min(nprobe, index.nlist))
+        elif isinstance(index, faiss.IndexHNSW):
+            params = faiss.SearchParametersHNSW(efSearch=ef_search)
+        elif sel is not None:
+            params = faiss.SearchParameters()
+        else:
+            return None
+        if sel is not None:
+            params.sel = sel
+        return params
+
+
+def index_memory_bytes(index: faiss.Index) -> int:
+    """Approximate in-memory size of index (its serialised size)."""
+    return faiss.serialize_index(index).nbytes
@@ -0,0 +1,178 @@
+import os
+import numpy as np
+
+TEXT_FILE = "chunks.bin"
+OFFSETS_FILE = "offsets.bin"
+USER_CODES_FILE = "user_codes.bin"
+DOC_CODES_FILE = "doc_codes.bin"
+PAGES_FILE = "pages.bin"
+
+OFFSET_DTYPE = np.dtype("<i8")
+CODE_DTYPE = np.dtype("<i4")
+
+
+class ChunkMetadataStore:
+    """
+    Pickle-free, columnar chunk metadata for one shard.
+
+    - chunks.bin: every chunk's UTF-8 text, back to back
+    - offsets.bin: int64 end offset of each chunk in chunks.bin
+    - user_codes.bin / doc_codes.bin: int32 codes into the interned user_id / doc_id tables
+    - pages.bin: int32 (page_start, page_end) pairs, 0 when unknown; it starts at
+      row pages_from, as rows written before page numbers were recorded have none
+
+    All files are append-only and memory-mapped, so load time and RSS do not grow
+    with the amount of chunk text; rows are only materialised as dicts by row().
+    What is committed (row count, text length, string tables) lives in the caller's
+    manifest via state(); bytes past it are ignored on load and truncated on append.
+    rewrite() copies a subset of rows to a new set of files with a name prefix.
+    """
+
+    def __init__(self, shard_dir: str):
+        self.shard_dir = shard_dir
+        self.load({})
+
+    def load(self, state: dict):
+        """Map the files up to the committed state (as returned by state())."""
+        self.prefix = state.get("prefix", "")
+        self.rows = state.get("rows", 0)
+        self.text_bytes = state.get("text_bytes", 0)
+        self.pages_from = state.get("pages_from", self.rows)
+        self.users = list(state.get("users", []))
+        self.docs = [tuple(d) for d in state.get("docs", [])]
+        self._user_codes = {u: i for i, u in enumerate(self.users)}
+        self._doc_codes = {d[0]: i for i, d in enumerate(self.docs)}
+        self._map()
+
+    def state(self) -> dict:
+        return {
+            "prefix": self.prefix,
+            "rows": self.rows,
+            "text_bytes": self.text_bytes,
+            "pages_from": self.pages_from,
+            "users": self.users,
+            "docs": [list(d) for d in self.docs],
+        }
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.shard_dir, self.prefix + name)
+
+    def _map(self):
+        self._text = self._memmap(TEXT_FILE, np.uint8, self.text_bytes)
+        self._offsets = self._memmap(OFFSETS_FILE, OFFSET_DTYPE, self.rows)
+        self._user_col = self._memmap(USER_CODES_FILE, CODE_DTYPE, self.rows)
+        self._doc_col = self._memmap(DOC_CODES_FILE, CODE_DTYPE, self.rows)
+        self._pages_col = self._memmap(PAGES_FILE, CODE_DTYPE, 2 * (self.rows - self.pages_from)).reshape(-1, 2)
+
+    def _memmap(self, name: str, dtype, length: int):
+        if length == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(self._path(name), dtype=dtype, mode="r", shape=(length,))
+
+    def append(self, metadata: list[dict]):
+        """
+        Append rows to the column files and fsync them. The rows become visible to
+        other processes only once the caller commits the new state() in its manifest.
+        """
+        texts = [m["chunk"].encode("utf-8") for m in metadata]
+        user_codes = np.array([self._intern_user(m["user_id"]) for m in metadata], dtype=CODE_DTYPE)
+        doc_codes = np.array([self._intern_doc(m["doc_id"], m.get("filename")) for m in metadata], dtype=CODE_DTYPE)
+        pages = np.array([(m.get("page_start") or 0, m.get("page_end") or 0) for m in metadata], dtype=CODE_DTYPE)
+        self._append_columns(texts, user_codes, doc_codes, pages)
+
+    def _append_columns(self, texts: list[bytes], user_codes: np.ndarray, doc_codes: np.ndarray, pages: np.ndarray):
+        ends = self.text_bytes + np.cumsum([len(t) for t in texts], dtype=OFFSET_DTYPE)
+
+        self._append_file(TEXT_FILE, self.text_bytes, b"".join(texts))
+        self._append_file(OFFSETS_FILE, self.rows * OFFSET_DTYPE.itemsize, ends.tobytes())
+        self._append_file(USER_CODES_FILE, self.rows * CODE_DTYPE.itemsize, user_codes.tobytes())
+        self._append_file(DOC_CODES_FILE, self.rows * CODE_DTYPE.itemsize, doc_codes.tobytes())
+        self._append_file(PAGES_FILE, 2 * (self.rows - self.pages_from) * CODE_DTYPE.itemsize, pages.tobytes())
+
+        self.rows += len(texts)
+        self.text_bytes = int(ends[-1]) if len(texts) else self.text_bytes
+        self._map()
+
+    def rewrite(self, rows: np.ndarray, prefix: str) -> "ChunkMetadataStore":
+        """
+        Copy the given rows, in order, to a new set of column files named prefix + *
+        (used by compaction to drop deleted rows); the doc table keeps only the docs
+        still referenced. Like append(), the copy is visible once the caller commits its state().
+        """
+        copy = ChunkMetadataStore(self.shard_dir)
+        copy.prefix = prefix
+        copy.pages_from = 0
+        copy.users = list(self.users)
+        copy._user_codes = dict(self._user_codes)
+
+        rows = np.asarray(rows, dtype=np.int64)
+        docs, doc_codes = np.unique(self._doc_col[rows], return_inverse=True)
+        copy.docs = [self.docs[code] for code in docs]
+        copy._doc_codes = {d[0]: i for i, d in enumerate(copy.docs)}
+
+        texts = [self._chunk_bytes(row) for row in rows]
+        pages = np.array([self.pages(row) for row in rows], dtype=CODE_DTYPE).reshape(-1, 2)
+        copy._append_columns(texts, np.asarray(self._user_col[rows], dtype=CODE_DTYPE), doc_codes.astype(CODE_DTYPE), pages)
+        return copy
+
+    def files(self) -> list[str]:
+        """Names of this store's column files."""
+        return [self.prefix + name for name in (TEXT_FILE, OFFSETS_FILE, USER_CODES_FILE, DOC_CODES_FILE, PAGES_FILE)]
+
+    def _append_file(self, name: str, committed: int, data: bytes):
+        with open(self._path(name), "ab") as f:
+            # Drop anything past the committed length left by a crashed writer
+            f.truncate(committed)
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _intern_user(self, user_id: str) -> int:
+        code = self._user_codes.get(user_id)
+        if code is None:
+            code = self._user_codes[user_id] = len(self.users)
+            self.users.append(user_id)
+        return code
+
+    def _intern_doc(self, doc_id: str, filename: str | None) -> int:
+        code = self._doc_codes.get(doc_id)
+        if code is None:
+            code = self._doc_codes[doc_id] = len(self.docs)
+            self.docs.append((doc_id, filename))
+        return code
+
+    def _chunk_bytes(self, row: int) -> bytes:
+        start = int(self._offsets[row - 1]) if row > 0 else 0
+        return bytes(self._text[start:int(self._offsets[row])])
+
+    def chunk(self, row: int) -> str:
+        return self._chunk_bytes(row).decode("utf-8")
+
+    def pages(self, row: int) -> tuple[int, int]:
+        """(page_start, page_end) of a row, (0, 0) if unknown."""
+        if row < self.pages_from:
+            return 0, 0
+        start, end = self._pages_col[row - self.pages_from]
+        return int(start), int(end)
+
+    def rows_of_docs(self, doc_ids) -> np.ndarray:
+        """Row numbers of every chunk belonging to one of doc_ids."""
+        codes = [self._doc_codes[d] for d in doc_ids if d in self._doc_codes]
+        if not codes:
+            return np.empty(0, dtype=np.int64)
+        return np.flatnonzero(np.isin(self._doc_col, codes))
+
+    def row(self, row: int) -> dict:
+        doc_id, filename = self.docs[self._doc_col[row]]
+        page_start, page_end = self.pages(row)
+        return {
+            "user_id": self.users[self._user_col[row]],
+            "chunk": self.chunk(row),
+            "doc_id": doc_id,
+            "filename": filename,
+            "page_start": page_start or None,
+            "page_end": page_end or None,
+        }
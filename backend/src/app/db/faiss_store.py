@@ -1,74 +1,756 @@
 import faiss
+import hashlib
+import json
 import numpy as np
 import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from app.core.config import settings
 from app.core.logging import logger
+from app.db.ann_index import IndexConfig
+from app.db.chunk_metadata import ChunkMetadataStore
+from app.db.lexical_index import BM25Index, reciprocal_rank_fusion
+from app.utils.tokens import estimate_tokens
 
-FAISS_PATH = "/data/faiss.index"
-META_PATH = "/data/metadata.npy"
+DATA_DIR = "/data"
+USERS_DIR = "users"
+FAISS_FILE = "faiss.index"
+META_FILE = "metadata.npy"
+MANIFEST_FILE = "faiss.manifest.json"
+TOMBSTONES_FILE = "tombstones.log"
 
-class FaissStore:
-    def __init__(self, dim=1536):
+# Upper bound on per-user shards kept in memory by one process
+MAX_LOADED_USERS = 256
+
+# A shard with more on-disk segments than this is merged in the background
+COMPACT_MIN_SEGMENTS = 8
+
+# The approximate index is rebuilt once the exact tail outgrows this fraction of it
+ANN_REBUILD_RATIO = 0.2
+
+# Deleted rows are reclaimed once they make up this fraction of a shard
+COMPACT_DELETED_RATIO = 0.2
+
+# In hybrid search, keyword hits must also be among this many times top_k nearest
+# vectors clearing min_score, so BM25 cannot bring irrelevant chunks into the context
+HYBRID_CANDIDATES = 4
+
+# Ids of the most recent batches applied to a shard, kept in its manifest so a
+# batch re-submitted after a crash or a retry is not added twice
+RECENT_BATCHES = 256
+
+# Flags for reading index files in mmap mode: flat codes and IVF lists stay in the
+# page cache, shared by every process mapping them (older faiss only maps IVF lists)
+MMAP_FLAGS = faiss.IO_FLAG_READ_ONLY | getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+
+_SAFE_NAME = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def _shard_dirname(user_id: str) -> str:
+    """Directory name for a user's shard; ObjectId strings are used as-is."""
+    if _SAFE_NAME.match(user_id):
+        return user_id
+    return "h_" + hashlib.sha1(user_id.encode("utf-8")).hexdigest()
+
+
+def _normalized(vectors) -> np.ndarray:
+    """A float32 copy of vectors scaled to unit length, so inner product is cosine similarity."""
+    vectors = np.array(vectors, dtype="float32", ndmin=2)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def select_context(results: list, min_score=None, max_tokens=None) -> list:
+    """
+    Drop results scoring below min_score, then keep the best ones while their chunks
+    fit in max_tokens (estimated). results must be sorted best first.
+    """
+    selected, tokens = [], 0
+    for meta, score in results:
+        if min_score is not None and score < min_score:
+            break
+        tokens += estimate_tokens(meta["chunk"])
+        if max_tokens is not None and tokens > max_tokens and selected:
+            break
+        selected.append((meta, score))
+    return selected
+
+
+def _atomic_write(path: str, data: bytes):
+    """Write data to a temp file, fsync it and rename it over path."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _exclude(ids: np.ndarray):
+    """An IDSelector matching every id except ids, or None if ids is empty."""
+    if len(ids) == 0:
+        return None
+    batch = faiss.IDSelectorBatch(ids.astype("int64"))
+    sel = faiss.IDSelectorNot(batch)
+    sel.referenced_objects = [batch]  # keep the SWIG object alive
+    return sel
+
+
+class SegmentTail:
+    """
+    The exact part of a shard: the flat segments past its approximate index, each
+    searched as its own index. Segments read with MMAP_FLAGS are searched in place
+    from the page cache rather than copied into the process.
+    """
+
+    def __init__(self):
+        self.parts: list[tuple[int, faiss.Index]] = []  # (first row in the shard, flat index)
+        self.ntotal = 0
+
+    def add(self, start: int, index: faiss.Index):
+        self.parts.append((start, index))
+        self.ntotal += index.ntotal
+
+    def starts(self) -> tuple:
+        return tuple(start for start, _ in self.parts)
+
+    def selectors(self, deleted_rows: np.ndarray) -> list:
+        """One IDSelector (or None) per part, excluding the deleted shard rows."""
+        return [
+            _exclude(deleted_rows[(deleted_rows >= start) & (deleted_rows < start + index.ntotal)] - start)
+            for start, index in self.parts
+        ]
+
+    def search(self, query: np.ndarray, top_k: int, selectors: list) -> list:
+        """(cosine similarity, shard row) of the top_k rows of every part, unsorted."""
+        hits = []
+        for (start, index), sel in zip(self.parts, selectors):
+            k = min(top_k, index.ntotal)
+            if k == 0:
+                continue
+            params = faiss.SearchParameters(sel=sel) if sel is not None else None
+            D, I = index.search(query, k, params=params)
+            hits += [(float(d), int(idx) + start) for d, idx in zip(D[0], I[0]) if idx != -1]
+        return hits
+
+
+class UserShard:
+    """
+    The vectors and chunk metadata of a single user, persisted in its own directory.
+
+    On disk a shard is append-only:
+    - seg-NNNNNN.index: one flat FAISS segment per add() call (the normalised vectors)
+    - ann-NNNNNN.index: optional approximate index (HNSW/IVF/PQ, see IndexConfig)
+      over the first ann["ntotal"] rows, built by compact()
+    - columnar chunk metadata in the same row order as the vectors (see ChunkMetadataStore)
+    - faiss.manifest.json: the committed segment list, approximate index, metadata
+      lengths, recently applied batch ids and a generation counter. It is replaced atomically last, so anything a
+      crashed writer left behind (a stray segment, a torn column tail) is simply not visible.
+    - tombstones.log: ids of deleted documents, one per line. Any process may append
+      to it (see delete_document); it is not part of the manifest.
+
+    In memory, rows covered by the approximate index are only held in ann_index; the
+    rows added after it was built (the tail) are kept in exact flat segments, and a
+    search merges both, skipping deleted rows with an IDSelector. With mmap, index
+    files are mapped read-only instead of read, so processes opening the same shard
+    (e.g. uvicorn workers) share one copy through the page cache. Files are never
+    modified once written and a new set only becomes visible through the atomic
+    rename of the manifest, so a mapped snapshot stays valid until it is swapped out. compact() merges the
+    segments into one, drops deleted rows and rebuilds ann_index.
+    A BM25 index over the chunk text is built lazily from the committed metadata for
+    keyword search (lexical_search_rows) and kept up to date incrementally.
+    """
+
+    def __init__(self, dim: int, shard_dir: str, index_config: IndexConfig | None = None, mmap: bool = False):
         self.dim = dim
-        self.index = faiss.IndexFlatL2(dim)
-        self.vectors = []
+        self.shard_dir = shard_dir
+        self.index_config = index_config or IndexConfig()
+        self.mmap = mmap
+        self.manifest_path = os.path.join(shard_dir, MANIFEST_FILE)
+        self.tombstones_path = os.path.join(shard_dir, TOMBSTONES_FILE)
+        self.lock = threading.Lock()
+        self.deleted_docs: set[str] = set()
+        self._tombstone_bytes = 0
+        self._selector_key = None
+        self._bm25 = None
+        self._bm25_prefix = None
+        self._reset()
         self._load()
+        self._load_tombstones()
 
-    def add(self, vectors, metadata):
-        if not vectors:
-            return
-        self.index.add(np.array(vectors).astype("float32"))
-        self.vectors.extend(metadata)
-        self._save()
-        logger.info(f"[faiss_store] Added {len(vectors)} vectors, total={self.index.ntotal}")
+    def _reset(self):
+        self.index = SegmentTail()  # rows past the approximate index
+        self.ann_index = None
+        self.ann = None  # manifest entry of ann_index: {"file", "type", "ntotal"}
+        self.meta = ChunkMetadataStore(self.shard_dir)
+        self.segments = []
+        self.batches = []  # ids of the last RECENT_BATCHES batches added
+        self.next_segment = 1
+        self.generation = None
 
+    @property
+    def ann_ntotal(self) -> int:
+        return self.ann["ntotal"] if self.ann else 0
 
-    def search(self, query_vector, user_id, top_k=5):
+    @property
+    def ntotal(self) -> int:
+        return self.ann_ntotal + self.index.ntotal
 
-        self.reload()
-        
-        if self.index.ntotal == 0:
-            logger.warning("[faiss_store] No vectors available for search")
-            return []
-        
-        D, I = self.index.search(np.array([query_vector]).astype("float32"), top_k * 5)
+    def add(self, vectors: np.ndarray, metadata: list[dict], batch_id: str | None = None) -> bool:
+        """Append vectors and their metadata as a new segment; False if batch_id was already added."""
+        with self.lock:
+            # Another writer (e.g. an offline rebuild) may have committed since this shard was loaded
+            if self._disk_generation() != self.generation:
+                self._load()
+            if batch_id is not None and batch_id in self.batches:
+                return False
+            os.makedirs(self.shard_dir, exist_ok=True)
+            self._load_tombstones()
 
-        filtered_results = []
+            segment = faiss.IndexFlatIP(self.dim)
+            segment.add(vectors)
+            name = f"seg-{self.next_segment:06d}.index"
+            _atomic_write(os.path.join(self.shard_dir, name), faiss.serialize_index(segment).tobytes())
 
-        for i, idx in enumerate(I[0]):
-            if idx == -1 or idx >= len(self.vectors):
-                continue
+            self.meta.append(metadata)
+
+            self.index.add(self.ntotal, self._read_flat(name) if self.mmap else segment)
+            self.segments.append({"file": name, "ntotal": len(vectors)})
+            self.next_segment += 1
+            if batch_id is not None:
+                self.batches = (self.batches + [batch_id])[-RECENT_BATCHES:]
+            self._commit()
+            return True
+
+    def search(self, query: np.ndarray, top_k: int, nprobe=None, ef_search=None):
+        """Top_k (metadata, cosine similarity) pairs, best first; query must be normalised."""
+        return [(self.meta.row(row), score) for row, score in self.search_rows(query, top_k, nprobe, ef_search)]
+
+    def search_rows(self, query: np.ndarray, top_k: int, nprobe=None, ef_search=None):
+        """As search(), but returns (row, cosine similarity) pairs."""
+        ann_sel, tail_sels = self._selectors()
+        hits = []
+        if self.ann_index is not None:
+            params = self.index_config.search_params(self.ann_index, nprobe, ef_search, ann_sel)
+            D, I = self.ann_index.search(query, min(top_k, self.ann_ntotal), params=params)
+            hits += [(float(d), int(idx)) for d, idx in zip(D[0], I[0]) if idx != -1]
+
+        hits += self.index.search(query, top_k, tail_sels)
+        hits.sort(reverse=True)
+        return [(idx, d) for d, idx in hits[:top_k]]
+
+    def lexical_search_rows(self, text: str, top_k: int):
+        """Top_k (row, BM25 score) pairs for a keyword query, best first."""
+        return self._lexical_index().search(text, top_k, exclude=self._deleted_rows())
+
+    def _lexical_index(self) -> BM25Index:
+        # A metadata rewrite (compaction with deletes) renumbers the rows: start over
+        if self._bm25 is None or self._bm25_prefix != self.meta.prefix or self._bm25.rows > self.meta.rows:
+            self._bm25 = BM25Index()
+            self._bm25_prefix = self.meta.prefix
+        if self._bm25.rows < self.meta.rows:
+            self._bm25.add([self.meta.chunk(row) for row in range(self._bm25.rows, self.meta.rows)])
+        return self._bm25
+
+    def delete_document(self, doc_id: str) -> int:
+        """
+        Tombstone doc_id: its rows are excluded from searches at once (here and, on their
+        next refresh, in other processes) and reclaimed by compact(). Only appends one
+        line to the tombstone log, so it is safe from any process. Returns the rows hidden.
+        """
+        os.makedirs(self.shard_dir, exist_ok=True)
+        fd = os.open(self.tombstones_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, f"{doc_id}\n".encode("utf-8"))
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        self._load_tombstones()
+        return len(self.meta.rows_of_docs([doc_id]))
+
+    def _load_tombstones(self) -> bool:
+        """Read tombstones appended since the last call; returns True if there were any."""
+        try:
+            with open(self.tombstones_path, "rb") as f:
+                f.seek(self._tombstone_bytes)
+                data = f.read()
+        except FileNotFoundError:
+            return False
+        complete = data[:data.rfind(b"\n") + 1]
+        if not complete:
+            return False
+        self.deleted_docs.update(complete.decode("utf-8").split())
+        self._tombstone_bytes += len(complete)
+        return True
+
+    def _deleted_rows(self) -> np.ndarray:
+        self._selectors()
+        return self._deleted
+
+    def _selectors(self):
+        """
+        (ann_index selector, tail selectors per segment) excluding deleted rows, None
+        where nothing is deleted. Recomputed only when the rows or the tombstones change.
+        """
+        key = (self.meta.prefix, self.meta.rows, len(self.deleted_docs), self.ann_ntotal, self.index.starts())
+        if key != self._selector_key:
+            rows = self.meta.rows_of_docs(self.deleted_docs)
+            self._deleted = rows
+            self._sels = (_exclude(rows[rows < self.ann_ntotal]), self.index.selectors(rows))
+            self._selector_key = key
+        return self._sels
+
+    def needs_compaction(self) -> bool:
+        return (
+            len(self.segments) > COMPACT_MIN_SEGMENTS
+            or self._ann_outdated()
+            or len(self._deleted_rows()) > self.ntotal * COMPACT_DELETED_RATIO
+        )
+
+    def _ann_outdated(self) -> bool:
+        config = self.index_config
+        if not config.approximate:
+            return self.ann is not None
+        if self.ntotal < config.min_vectors:
+            return False
+        if self.ann is None or self.ann["type"] != config.kind:
+            return True
+        return self.index.ntotal > self.ann_ntotal * ANN_REBUILD_RATIO
+
+    def compact(self, force: bool = False):
+        """
+        Merge all segments into a single one without the deleted rows, (re)build the
+        approximate index over every vector when index_config calls for one, and delete
+        the old files. Reading the segments and training run outside the lock, so
+        searches and adds carry on meanwhile; rows added in between stay in the exact tail.
+        """
+        with self.lock:
+            self._load_tombstones()
+            segments = list(self.segments)
+            snapshot = sum(s["ntotal"] for s in segments)
+            deleted = self._deleted_rows()
+            deleted = deleted[deleted < snapshot]
+            if not segments or (len(segments) == 1 and not len(deleted) and not force and not self._ann_outdated()):
+                return
+
+        kept_rows = np.setdiff1d(np.arange(snapshot), deleted)
+        vectors = self._read_segments(segments)[kept_rows]
+        ntotal = len(vectors)
+        config = self.index_config
+        ann_index = config.build(vectors) if config.approximate and ntotal >= config.min_vectors else None
+
+        with self.lock:
+            # Another UserShard of this directory (e.g. loaded after this one was evicted) may have committed
+            if self._disk_generation() != self.generation:
+                logger.warning(f"[faiss_store] {self.shard_dir} was committed elsewhere during compaction, skipping")
+                self._load()
+                return
+            if self.segments[:len(segments)] != segments:
+                logger.warning(f"[faiss_store] Segments of {self.shard_dir} changed during compaction, skipping")
+                return
 
-            metadata = self.vectors[idx]
+            merged, flat = segments[0], None
+            if len(segments) > 1 or len(deleted):
+                merged = {"file": f"seg-{self.next_segment:06d}.index", "ntotal": ntotal}
+                self.next_segment += 1
+                flat = faiss.IndexFlatIP(self.dim)
+                flat.add(vectors)
+                _atomic_write(os.path.join(self.shard_dir, merged["file"]), faiss.serialize_index(flat).tobytes())
 
-            if metadata.get("user_id") == user_id:
-                filtered_results.append((metadata, float(D[0][i])))
+            ann = None
+            if ann_index is not None:
+                ann = {"file": f"ann-{self.next_segment:06d}.index", "type": config.kind, "ntotal": ntotal}
+                self.next_segment += 1
+                _atomic_write(os.path.join(self.shard_dir, ann["file"]), faiss.serialize_index(ann_index).tobytes())
+                if self.mmap:
+                    ann_index = self._read_index(ann["file"])
 
-            if len(filtered_results) >= top_k:
-                break
+            old_meta = self.meta
+            if len(deleted):
+                rows = np.concatenate([kept_rows, np.arange(snapshot, old_meta.rows)])
+                self.meta = old_meta.rewrite(rows, prefix=f"m{self.next_segment:06d}-")
+                self.next_segment += 1
 
-        return filtered_results
+            # Segments committed after the snapshot stay in the tail, moved up past the deleted rows
+            tail = SegmentTail()
+            if ann_index is None:
+                tail.add(0, flat if flat is not None and not self.mmap else self._read_flat(merged["file"]))
+            for start, index in self.index.parts:
+                if start >= snapshot:
+                    tail.add(start - len(deleted), index)
+            self.index = tail
+            self.ann_index, self.ann = ann_index, ann
+            self.segments = [merged] + self.segments[len(segments):]
+            self._commit()
 
+            # Old files plus any uncommitted ones a crashed writer left behind
+            keep = {s["file"] for s in self.segments} | ({ann["file"]} if ann else set())
+            stale = [f for f in os.listdir(self.shard_dir) if f.startswith(("seg-", "ann-")) and f not in keep]
+            if self.meta is not old_meta:
+                stale += old_meta.files()
 
-    def _save(self):
-        os.makedirs("/data", exist_ok=True)
-        faiss.write_index(self.index, FAISS_PATH)
-        np.save(META_PATH, self.vectors, allow_pickle=True)
-        logger.info(f"[faiss_store] Saved index to {FAISS_PATH} and metadata to {META_PATH}")
+        for file in stale:
+            try:
+                os.remove(os.path.join(self.shard_dir, file))
+            except FileNotFoundError:
+                pass
+        built = f", built {config.kind} index" if ann else ""
+        logger.info(f"[faiss_store] Compacted {len(segments)} segments in {self.shard_dir}, "
+                    f"reclaimed {len(deleted)} deleted rows{built}")
+
+    def _read_index(self, name: str) -> faiss.Index:
+        return faiss.read_index(os.path.join(self.shard_dir, name), MMAP_FLAGS if self.mmap else 0)
+
+    def _read_flat(self, name: str, skip: int = 0) -> faiss.Index:
+        """A flat inner-product index over a segment's vectors from row skip on."""
+        index = self._read_index(name)
+        if skip or index.metric_type != faiss.METRIC_INNER_PRODUCT:
+            # Segments written before cosine similarity hold raw (L2) vectors
+            vectors = _normalized(index.reconstruct_n(skip, index.ntotal - skip))
+            index = faiss.IndexFlatIP(self.dim)
+            index.add(vectors)
+        return index
+
+    def _read_segments(self, segments: list[dict]) -> np.ndarray:
+        """The normalised vectors of the given segment files, concatenated."""
+        vectors = [
+            faiss.read_index(os.path.join(self.shard_dir, s["file"])).reconstruct_n(0, s["ntotal"])
+            for s in segments
+        ]
+        return _normalized(np.concatenate(vectors)) if vectors else np.empty((0, self.dim), dtype="float32")
+
+    def _commit(self):
+        # Bump the on-disk generation last, so readers only pick up a complete write
+        generation = (self._read_manifest() or {}).get("generation", 0) + 1
+        manifest = {
+            "generation": generation,
+            "ntotal": self.ntotal,
+            "segments": self.segments,
+            "ann": self.ann,
+            "meta": self.meta.state(),
+            "batches": self.batches,
+            "next_segment": self.next_segment,
+        }
+        _atomic_write(self.manifest_path, json.dumps(manifest).encode("utf-8"))
+        self.generation = generation
+        logger.info(f"[faiss_store] Committed shard {self.shard_dir} (generation {generation}, {self.ntotal} vectors)")
 
     def _load(self):
-        if os.path.exists(FAISS_PATH) and os.path.exists(META_PATH):
-            self.index = faiss.read_index(FAISS_PATH)
-            self.vectors = np.load(META_PATH, allow_pickle=True).tolist()
-            logger.info(f"[faiss_store] Loaded {self.index.ntotal} vectors from {FAISS_PATH}")
-        else:
-            logger.info("[faiss_store] No previous FAISS index found")
+        """
+        Bring the in-memory shard up to the committed manifest. When the manifest only
+        appended segments since the last load, just the new segments are read.
+        """
+        for attempt in range(3):
+            manifest = self._read_manifest()
+            if not manifest or "meta" not in manifest:
+                return
+            loaded = [s["file"] for s in self.segments]
+            if [s["file"] for s in manifest["segments"][:len(loaded)]] != loaded or manifest.get("ann") != self.ann:
+                self._reset()
+            try:
+                self._load_tail(manifest)
+                return
+            except FileNotFoundError:
+                # A compaction removed segments between reading the manifest and the files
+                self._reset()
+        logger.warning(f"[faiss_store] Could not load shard {self.shard_dir}, will retry on next refresh")
+
+    def _load_tail(self, manifest: dict):
+        ann = manifest.get("ann")
+        ann_index = self.ann_index
+        if ann and ann_index is None:
+            ann_index = self._read_index(ann["file"])
+        ann_ntotal = ann["ntotal"] if ann else 0
+
+        # Only rows past the approximate index are read into the exact tail
+        start = sum(s["ntotal"] for s in self.segments)
+        new_segments = manifest["segments"][len(self.segments):]
+        parts = []
+        for s in new_segments:
+            if start + s["ntotal"] > ann_ntotal:
+                skip = max(0, ann_ntotal - start)
+                parts.append((start + skip, self._read_flat(s["file"], skip)))
+            start += s["ntotal"]
+        for part in parts:
+            self.index.add(*part)
+        self.ann_index, self.ann = ann_index, ann
+        self.meta.load(manifest["meta"])
+        self.segments = list(manifest["segments"])
+        self.batches = list(manifest.get("batches", []))
+        self.next_segment = manifest["next_segment"]
+        self.generation = manifest["generation"]
+        if new_segments:
+            logger.info(f"[faiss_store] Loaded {len(new_segments)} segments from {self.shard_dir} (now {self.ntotal} vectors)")
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _disk_generation(self):
+        """Return the generation stamp of the shard on disk, or None if there is none."""
+        manifest = self._read_manifest()
+        if manifest and "generation" in manifest:
+            return manifest["generation"]
+        return None
+
+    def refresh(self) -> bool:
+        """
+        Pick up writes committed and documents deleted by another process since the
+        last load. Cheap enough to call on every query (two small file reads).
+        Returns True if anything was loaded.
+        """
+        deleted = self._load_tombstones()
+        generation = self._disk_generation()
+        if generation is None or generation == self.generation:
+            return deleted
+        self._load()
+        return True
+
+
+class FaissStore:
+    """
+    Tenant-partitioned vector store: one FAISS index per user_id, so a search only
+    scans the caller's own vectors. Shards are loaded lazily and the least recently
+    used ones are evicted once more than max_loaded_users are in memory.
+    index_config selects the index type large shards are built with (flat by default).
+    With mmap, shards are memory-mapped read-only and shared between processes (see UserShard).
+    """
+
+    def __init__(self, dim=1536, data_dir=DATA_DIR, max_loaded_users=MAX_LOADED_USERS, index_config=None,
+                 mmap=False):
+        self.dim = dim
+        self.data_dir = data_dir
+        self.index_config = index_config or IndexConfig()
+        self.mmap = mmap
+        self.users_dir = os.path.join(data_dir, USERS_DIR)
+        self.max_loaded_users = max_loaded_users
+        self._shards: OrderedDict[str, UserShard] = OrderedDict()
+        self._shards_lock = threading.Lock()
+        self._loading: dict[str, threading.Lock] = {}  # user_id -> lock held while its shard is read
+        self._compactor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="faiss-compact")
+        self._compacting: set[str] = set()
+
+    def _loaded(self, user_id: str) -> UserShard | None:
+        with self._shards_lock:
+            shard = self._shards.get(user_id)
+            if shard is not None:
+                self._shards.move_to_end(user_id)
+            return shard
+
+    def _shard(self, user_id: str) -> UserShard:
+        shard = self._loaded(user_id)
+        if shard is not None:
+            return shard
+
+        # Read from disk outside _shards_lock, so a cold load only holds up requests for
+        # this user; the per-user lock makes concurrent first requests load it once
+        with self._shards_lock:
+            loading = self._loading.setdefault(user_id, threading.Lock())
+        with loading:
+            shard = self._loaded(user_id)
+            if shard is None:
+                shard = UserShard(self.dim, os.path.join(self.users_dir, _shard_dirname(user_id)), self.index_config,
+                                  self.mmap)
+                with self._shards_lock:
+                    shard = self._shards.setdefault(user_id, shard)
+                    self._shards.move_to_end(user_id)
+                    self._evict()
+            with self._shards_lock:
+                self._loading.pop(user_id, None)
+        return shard
+
+    def _evict(self):
+        """Drop least recently used shards past max_loaded_users; must hold _shards_lock."""
+        # A shard with a pending compaction stays pinned, so no second UserShard of its directory is loaded meanwhile
+        while len(self._shards) > self.max_loaded_users:
+            evicted = next((u for u, s in self._shards.items() if s.shard_dir not in self._compacting), None)
+            if evicted is None:
+                return
+            del self._shards[evicted]
+            logger.debug(f"[faiss_store] Evicted shard for user {evicted}")
+
+    def warm_up(self, limit: int | None = None) -> int:
+        """
+        Load the shards written most recently, up to limit (and max_loaded_users), so
+        the first searches of active users do not pay for reading them. Returns the
+        number of shards loaded.
+        """
+        limit = min(limit if limit is not None else self.max_loaded_users, self.max_loaded_users)
+        if limit <= 0 or not os.path.isdir(self.users_dir):
+            return 0
+        shard_dirs = [os.path.join(self.users_dir, name) for name in os.listdir(self.users_dir)]
+        shard_dirs = [d for d in shard_dirs if os.path.exists(os.path.join(d, MANIFEST_FILE))]
+        shard_dirs.sort(key=lambda d: os.path.getmtime(os.path.join(d, MANIFEST_FILE)), reverse=True)
+
+        loaded = 0
+        # Oldest first, so the most recently written shards end up the most recently used
+        for shard_dir in reversed(shard_dirs[:limit]):
+            # Directory names of unusual user ids are hashed; the manifest knows the shard's user
+            try:
+                with open(os.path.join(shard_dir, MANIFEST_FILE)) as f:
+                    users = json.load(f).get("meta", {}).get("users")
+            except (OSError, ValueError):
+                continue
+            if not users:
+                continue
+            # Through _shard, so a search for the same user meanwhile does not load it twice
+            self._shard(users[0])
+            loaded += 1
+        logger.info(f"[faiss_store] Warmed up {loaded} shards from {self.users_dir}")
+        return loaded
+
+    def add(self, vectors, metadata, batch_id: str | None = None):
+        """
+        Add vectors with their chunk metadata to their users' shards. Only the index
+        writer calls this (see app.db.index_writer). With a batch_id, a batch that was
+        already added is skipped, which makes re-applying a batch harmless.
+        """
+        if len(vectors) == 0:
+            return
+        vectors = _normalized(vectors)
+
+        by_user: dict[str, list[int]] = {}
+        for i, meta in enumerate(metadata[:len(vectors)]):
+            by_user.setdefault(meta["user_id"], []).append(i)
+
+        for user_id, rows in by_user.items():
+            shard = self._shard(user_id)
+            if not shard.add(vectors[rows], [metadata[i] for i in rows], batch_id):
+                logger.info(f"[faiss_store] Batch {batch_id} already added for user {user_id}, skipped")
+                continue
+            logger.info(f"[faiss_store] Added {len(rows)} vectors for user {user_id}, total={shard.ntotal}")
+            if shard.needs_compaction():
+                self._schedule_compaction(shard)
+
+    def _schedule_compaction(self, shard: UserShard):
+        """Merge a shard's segments on the background compaction thread."""
+        if shard.shard_dir in self._compacting:
+            return
+        self._compacting.add(shard.shard_dir)
+
+        def run():
+            try:
+                shard.compact()
+            except Exception as e:
+                logger.error(f"[faiss_store] Compaction of {shard.shard_dir} failed: {e}", exc_info=True)
+            finally:
+                self._compacting.discard(shard.shard_dir)
+
+        self._compactor.submit(run)
+
+    def search(self, query_vector, user_id, top_k=5, min_score=None, max_tokens=None, nprobe=None, ef_search=None,
+               query_text=None):
+        """
+        Blocking (CPU-bound) search of the user's shard. Safe to call from several
+        threads; async callers should offload it (see app.utils.blocking).
+
+        Returns up to top_k (metadata, cosine similarity) pairs, best first, without
+        the ones below min_score or past the max_tokens context budget (see select_context).
+        nprobe / ef_search override the configured IVF / HNSW search effort for this query.
+
+        With query_text, BM25 keyword hits are fused with the vector hits by reciprocal
+        rank and the scores are fused RRF scores. With min_score, only keyword hits whose
+        vector also clears it are fused. query_vector may be None for a keyword-only
+        search (no embedding needed).
+        """
+        shard = self._shard(user_id)
+        with shard.lock:
+            shard.refresh()
+
+            if shard.ntotal == 0:
+                logger.warning(f"[faiss_store] No vectors available for user {user_id}")
+                return []
+
+            rankings = []
+            filter_lexical = query_text and query_vector is not None and min_score is not None
+            if query_vector is not None:
+                candidates = top_k * HYBRID_CANDIDATES if filter_lexical else top_k
+                hits = shard.search_rows(_normalized(query_vector), candidates, nprobe, ef_search)
+                relevant = [(row, score) for row, score in hits if min_score is None or score >= min_score]
+                rankings.append(relevant[:top_k])
+            if query_text:
+                lexical = shard.lexical_search_rows(query_text, candidates if filter_lexical else top_k)
+                if filter_lexical:
+                    relevant_rows = {row for row, _ in relevant}
+                    lexical = [(row, score) for row, score in lexical if row in relevant_rows]
+                rankings.append(lexical[:top_k])
+            rows = rankings[0] if len(rankings) == 1 else reciprocal_rank_fusion(rankings, top_k)
+            results = [(shard.meta.row(row), score) for row, score in rows]
+
+        selected = select_context(results, max_tokens=max_tokens)
+        if len(selected) < len(results):
+            logger.info(f"[faiss_store] Kept {len(selected)} of {len(results)} chunks for user {user_id} (max_tokens={max_tokens})")
+        return selected
+
+    def delete_document(self, user_id: str, doc_id: str) -> int:
+        """
+        Remove a document's chunks from the user's search results immediately (see
+        UserShard.delete_document); the writer reclaims the space once asked to (see
+        reclaim_deleted). Returns the number of chunks hidden.
+        """
+        shard = self._shard(user_id)
+        with shard.lock:
+            shard.refresh()
+            removed = shard.delete_document(doc_id)
+        logger.info(f"[faiss_store] Deleted document {doc_id} of user {user_id} ({removed} chunks)")
+        return removed
+
+    def reclaim_deleted(self, user_id: str, doc_id: str):
+        """
+        Compact the user's shard in the background once deleted rows make up
+        COMPACT_DELETED_RATIO of it (or it needs compacting anyway). Only the index
+        writer calls this, after doc_id was deleted; doc_id only routes the request.
+        """
+        shard = self._shard(user_id)
+        with shard.lock:
+            shard.refresh()
+            needed = shard.needs_compaction()
+        if needed:
+            logger.info(f"[faiss_store] Compacting the shard of user {user_id} after deleting {doc_id}")
+            self._schedule_compaction(shard)
 
     def reload(self):
-        """Force reload FAISS index from disk (used by FastAPI query endpoint)."""
-        if os.path.exists(FAISS_PATH):
-            self._load()
-            logger.info(f"[faiss_store] Reloaded FAISS index (now {self.index.ntotal} vectors)")
-        else:
-            logger.warning("[faiss_store] No FAISS index found on disk to reload")
-
-faiss_store = FaissStore()
+        """Force reload every loaded shard from disk, regardless of generation."""
+        for shard in self._shards.values():
+            shard._reset()
+            shard._load()
+
+    def rebuild_indexes(self, force: bool = False):
+        """
+        Offline migration to the configured index type: compact every shard on disk,
+        building (or dropping) its approximate index. Shards already matching
+        index_config are skipped unless force is set (e.g. after changing nlist).
+        """
+        if not os.path.isdir(self.users_dir):
+            return
+        for name in sorted(os.listdir(self.users_dir)):
+            shard = UserShard(self.dim, os.path.join(self.users_dir, name), self.index_config, self.mmap)
+            shard.compact(force=force)
+
+    def migrate_legacy_index(self, target=None):
+        """
+        Split a pre-partitioning global index (faiss.index + metadata.npy in data_dir)
+        into per-user shards, of this store or of target (e.g. a ShardedFaissStore).
+        Run once by the index writer; a no-op afterwards.
+        """
+        legacy_index = os.path.join(self.data_dir, FAISS_FILE)
+        legacy_meta = os.path.join(self.data_dir, META_FILE)
+        if not (os.path.exists(legacy_index) and os.path.exists(legacy_meta)):
+            return
+
+        index = faiss.read_index(legacy_index)
+        metadata = np.load(legacy_meta, allow_pickle=True).tolist()
+        vectors = index.reconstruct_n(0, index.ntotal)
+        (target or self).add(vectors, metadata)
+
+        for path in (legacy_index, legacy_meta, os.path.join(self.data_dir, MANIFEST_FILE)):
+            if os.path.exists(path):
+                os.replace(path, f"{path}.migrated")
+        logger.info(f"[faiss_store] Migrated {index.ntotal} legacy vectors into per-user shards")
+
+faiss_store = FaissStore(index_config=IndexConfig.from_settings(settings), mmap=settings.FAISS_MMAP)
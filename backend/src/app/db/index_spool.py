@@ -0,0 +1,120 @@
+import json
+import os
+import time
+import uuid
+import numpy as np
+from app.core.config import settings
+from app.core.logging import logger
+
+PENDING_DIR = "pending"
+FAILED_DIR = "failed"
+TMP_DIR = "tmp"
+COMPACTION_SUFFIX = ".compact.json"
+
+
+class IndexSpool:
+    """
+    A directory of vector batches waiting for the index writer, so any number of
+    ingest processes can submit vectors while a single process writes FAISS.
+
+    Each batch is one .npz file (float32 vectors plus the metadata as JSON, no
+    pickles). It is written under tmp/ and renamed into pending/ only once complete,
+    named by submission time, so the writer sees whole batches in FIFO order. The
+    writer deletes a batch once it is committed to its shards. Compaction requests
+    (a small JSON file each) queue up with the batches the same way.
+    """
+
+    def __init__(self, spool_dir: str):
+        self.spool_dir = spool_dir
+        self.pending_dir = os.path.join(spool_dir, PENDING_DIR)
+
+    def submit(self, vectors, metadata: list[dict], batch_id: str | None = None) -> str:
+        """Queue a batch for the writer; returns its path. batch_id makes re-submissions idempotent."""
+        batch_id = batch_id or uuid.uuid4().hex
+        return self._enqueue(".npz", lambda f: np.savez(
+            f,
+            vectors=np.asarray(vectors, dtype="float32"),
+            metadata=np.frombuffer(json.dumps(metadata).encode("utf-8"), dtype=np.uint8),
+            batch_id=np.frombuffer(batch_id.encode("utf-8"), dtype=np.uint8),
+        ))
+
+    def request_compaction(self, user_id: str, doc_id: str) -> str:
+        """
+        Ask the writer to reclaim the rows of a deleted document (see
+        FaissStore.reclaim_deleted); returns the request's path.
+        """
+        request = json.dumps({"user_id": user_id, "doc_id": doc_id}).encode("utf-8")
+        return self._enqueue(COMPACTION_SUFFIX, lambda f: f.write(request))
+
+    def _enqueue(self, suffix: str, write) -> str:
+        name = f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}{suffix}"
+        tmp_path = os.path.join(self.spool_dir, TMP_DIR, name)
+        path = os.path.join(self.pending_dir, name)
+        os.makedirs(os.path.dirname(tmp_path), exist_ok=True)
+        os.makedirs(self.pending_dir, exist_ok=True)
+
+        with open(tmp_path, "wb") as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        return path
+
+    def pending(self) -> list[str]:
+        """Paths of the batches and compaction requests not applied yet, oldest first."""
+        try:
+            names = sorted(n for n in os.listdir(self.pending_dir) if n.endswith((".npz", COMPACTION_SUFFIX)))
+        except FileNotFoundError:
+            return []
+        return [os.path.join(self.pending_dir, n) for n in names]
+
+    @staticmethod
+    def load(path: str) -> tuple[str, np.ndarray, list[dict]]:
+        """(batch_id, vectors, metadata) of a spooled batch."""
+        with np.load(path, allow_pickle=False) as batch:
+            return (
+                batch["batch_id"].tobytes().decode("utf-8"),
+                batch["vectors"],
+                json.loads(batch["metadata"].tobytes().decode("utf-8")),
+            )
+
+    @staticmethod
+    def is_compaction(path: str) -> bool:
+        return path.endswith(COMPACTION_SUFFIX)
+
+    @staticmethod
+    def load_compaction(path: str) -> dict:
+        """The user_id and doc_id of a compaction request."""
+        with open(path, "rb") as f:
+            return json.loads(f.read().decode("utf-8"))
+
+    def done(self, path: str):
+        os.remove(path)
+
+    def fail(self, path: str):
+        """Set a batch that cannot be applied aside, so it does not block the ones behind it."""
+        failed = os.path.join(self.spool_dir, FAILED_DIR)
+        os.makedirs(failed, exist_ok=True)
+        os.replace(path, os.path.join(failed, os.path.basename(path)))
+
+    def wait_applied(self, paths: list[str], timeout: float) -> bool:
+        """
+        Wait until the writer has applied the given batches. False on timeout, or if
+        the writer set any of them aside as failed.
+        """
+        deadline = time.monotonic() + timeout
+        remaining = [p for p in paths if os.path.exists(p)]
+        while remaining:
+            if time.monotonic() > deadline:
+                logger.warning(f"[index_spool] {len(remaining)} batches still pending after {timeout}s")
+                return False
+            time.sleep(settings.INDEX_SPOOL_POLL_INTERVAL / 2)
+            remaining = [p for p in remaining if os.path.exists(p)]
+        failed = [p for p in paths if os.path.exists(os.path.join(self.spool_dir, FAILED_DIR, os.path.basename(p)))]
+        if failed:
+            logger.error(f"[index_spool] {len(failed)} batches were set aside by the writer")
+            return False
+        return True
+
+
+index_spool = IndexSpool(settings.INDEX_SPOOL_DIR)
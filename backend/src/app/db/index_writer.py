@@ -0,0 +1,75 @@
+import fcntl
+import os
+import threading
+from contextlib import contextmanager
+from app.db.faiss_store import FaissStore
+from app.db.index_spool import IndexSpool
+from app.core.config import settings
+from app.core.logging import logger
+
+LOCK_FILE = "index-writer.lock"
+
+
+@contextmanager
+def writer_lock(data_dir: str, blocking: bool = True):
+    """
+    Hold the exclusive right to mutate the FAISS shards under data_dir. Every process
+    that writes shards (the index writer, offline rebuilds) takes it, so there is
+    only ever one writer. The lock is released when its holder exits, even on a crash.
+    Raises BlockingIOError if blocking is False and another process holds it.
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    with open(os.path.join(data_dir, LOCK_FILE), "a") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            if not blocking:
+                raise
+            logger.info(f"[index_writer] Waiting for the writer lock on {data_dir}")
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class IndexWriter:
+    """
+    The single process that applies spooled batches to the FAISS store. Shards commit
+    each batch with a new manifest generation, which readers (the API) pick up
+    atomically on their next refresh. Batch ids are recorded in the shard manifests,
+    so a batch re-applied after a crash is skipped.
+    """
+
+    def __init__(self, store: FaissStore, spool: IndexSpool):
+        self.store = store
+        self.spool = spool
+        self._stopping = threading.Event()
+
+    def apply_pending(self) -> int:
+        """Apply every batch (or compaction request) in the spool, oldest first; returns the number applied."""
+        applied = 0
+        for path in self.spool.pending():
+            try:
+                if self.spool.is_compaction(path):
+                    self.store.reclaim_deleted(**self.spool.load_compaction(path))
+                else:
+                    batch_id, vectors, metadata = self.spool.load(path)
+                    self.store.add(vectors, metadata, batch_id=batch_id)
+            except Exception as e:
+                logger.error(f"[index_writer] Could not apply {path}, set aside: {e}", exc_info=True)
+                self.spool.fail(path)
+                continue
+            self.spool.done(path)
+            applied += 1
+        return applied
+
+    def stop(self):
+        self._stopping.set()
+
+    def run(self):
+        """Apply batches as they arrive until stop(); must run under writer_lock."""
+        logger.info(f"[index_writer] Applying batches from {self.spool.pending_dir}")
+        while not self._stopping.is_set():
+            if not self.apply_pending():
+                self._stopping.wait(settings.INDEX_SPOOL_POLL_INTERVAL)
@@ -0,0 +1,132 @@
+import math
+import re
+from collections import Counter, defaultdict
+
+import numpy as np
+
+# Words, keeping identifiers such as "xj-4500", "v2.1" or "inv/2023/17" in one piece
+TOKEN_RE = re.compile(r"\w+(?:[-./]\w+)*")
+PART_SEPARATORS = re.compile(r"[-./]")
+
+STOPWORDS = frozenset("""
+a about an and are as at be but by can did do does for from has have how i if in into is it its
+me my of on or our so than that the their them then there these they this those to was we were
+what when where which who why will with you your
+""".split())
+
+# Rank constant of reciprocal-rank fusion (the value from the original RRF paper)
+RRF_K = 60
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercased terms without stopwords; compound identifiers also yield their parts."""
+    tokens = []
+    for token in TOKEN_RE.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        tokens.append(token)
+        parts = PART_SEPARATORS.split(token)
+        if len(parts) > 1:
+            tokens.extend(p for p in parts if p not in STOPWORDS)
+    return tokens
+
+
+def is_identifier(term: str) -> bool:
+    """
+    A code, part number or version: digits joined to other parts by an internal
+    "-", "/", "_" or "." ("XJ-4500", "inv/2023/17", "v2.1", "2023-117"). Plain
+    numbers ("2020", "3.5") and words with a digit ("v2") are not.
+    """
+    parts = re.split(r"[-./_]", term.strip("_"))
+    if len(parts) < 2 or not any(c.isdigit() for c in term):
+        return False
+    return any(c.isalpha() for c in term) or bool(re.search(r"[-/_]", term.strip("_")))
+
+
+def is_lexical_query(question: str) -> bool:
+    """
+    True for lookups that keyword search answers on its own: a quoted phrase, or at
+    most three terms of which one is an identifier (see is_identifier).
+    """
+    question = question.strip().rstrip("?").strip()
+    if len(question) > 2 and question[0] == question[-1] and question[0] in "\"'":
+        return True
+    terms = [t for t in TOKEN_RE.findall(question) if t.lower() not in STOPWORDS]
+    return 0 < len(terms) <= 3 and any(is_identifier(t) for t in terms)
+
+
+def reciprocal_rank_fusion(rankings: list[list[tuple[int, float]]], top_k: int, k: int = RRF_K):
+    """Fuse ranked (id, score) lists: each id scores sum(1 / (k + rank)). Returns the top_k (id, fused score)."""
+    fused = defaultdict(float)
+    for ranking in rankings:
+        for rank, (row, _) in enumerate(ranking, start=1):
+            fused[row] += 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)[:top_k]
+
+
+class BM25Index:
+    """
+    In-memory BM25 over one shard's chunks, keyed by the shard's row numbers.
+
+    Each term's postings are two compact arrays (int32 rows, uint16 term frequencies).
+    add() only appends to small per-term lists; they are folded into the arrays on
+    the next search, so ingesting many small batches stays cheap.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.rows = 0
+        self.total_length = 0
+        self._lengths = np.empty(0, dtype=np.uint32)
+        self._postings: dict[str, tuple[np.ndarray, np.ndarray]] = {}
+        self._pending: dict[str, tuple[list, list]] = defaultdict(lambda: ([], []))
+
+    def add(self, texts: list[str]):
+        """Index texts as the next rows (self.rows, self.rows + 1, ...)."""
+        lengths = []
+        for row, text in enumerate(texts, start=self.rows):
+            counts = Counter(tokenize(text))
+            for term, tf in counts.items():
+                rows, tfs = self._pending[term]
+                rows.append(row)
+                tfs.append(min(tf, 65535))
+            lengths.append(sum(counts.values()))
+
+        self._lengths = np.concatenate([self._lengths, np.array(lengths, dtype=np.uint32)])
+        self.rows += len(texts)
+        self.total_length += sum(lengths)
+
+    def _flush(self):
+        for term, (rows, tfs) in self._pending.items():
+            new = (np.array(rows, dtype=np.int32), np.array(tfs, dtype=np.uint16))
+            old = self._postings.get(term)
+            self._postings[term] = new if old is None else (np.concatenate([old[0], new[0]]), np.concatenate([old[1], new[1]]))
+        self._pending.clear()
+
+    def search(self, query: str, top_k: int, exclude: np.ndarray | None = None) -> list[tuple[int, float]]:
+        """Top_k (row, BM25 score) pairs, best first; only rows matching a query term, minus exclude."""
+        self._flush()
+        terms = set(tokenize(query))
+        if not terms or self.rows == 0:
+            return []
+
+        avg_length = self.total_length / self.rows or 1.0
+        scores = np.zeros(self.rows, dtype=np.float32)
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            rows, tfs = postings
+            idf = math.log(1 + (self.rows - len(rows) + 0.5) / (len(rows) + 0.5))
+            tf = tfs.astype(np.float32)
+            norm = self.k1 * (1 - self.b + self.b * self._lengths[rows] / avg_length)
+            scores[rows] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        if exclude is not None and len(exclude):
+            scores[exclude] = 0
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > top_k:
+            candidates = candidates[np.argpartition(-scores[candidates], top_k)[:top_k]]
+        ranked = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(int(row), float(scores[row])) for row in ranked]
@@ -3,7 +3,8 @@ from app.core.config import settings
 import gridfs
 import os
 
-client = MongoClient(settings.MONGO_URI)
+# connect=False: the first operation connects, not the import
+client = MongoClient(settings.MONGO_URI, connect=False)
 db = client[settings.MONGO_DB]
 
 users_collection = db["users"]
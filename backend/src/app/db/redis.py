@@ -1,8 +1,36 @@
 import redis
+import redis.asyncio
 from app.core.config import settings
 
-redis_client = redis.Redis(
-    host=settings.REDIS_HOST,
-    port=settings.REDIS_PORT,
-    decode_responses=True
+
+def _pool_options(decode_responses: bool) -> dict:
+    """Connection settings shared by every pool of the process."""
+    return {
+        "host": settings.REDIS_HOST,
+        "port": settings.REDIS_PORT,
+        "decode_responses": decode_responses,
+        # Bounded: past max_connections callers wait up to pool_timeout for a free
+        # connection instead of opening ever more sockets under load
+        "max_connections": settings.REDIS_MAX_CONNECTIONS,
+        "timeout": settings.REDIS_POOL_TIMEOUT,
+        "socket_timeout": settings.REDIS_SOCKET_TIMEOUT,
+        "socket_connect_timeout": settings.REDIS_SOCKET_TIMEOUT,
+        "socket_keepalive": True,
+        "health_check_interval": settings.REDIS_HEALTH_CHECK_INTERVAL,
+    }
+
+
+# One pool per client below; every module uses these clients rather than its own
+redis_client = redis.Redis(connection_pool=redis.BlockingConnectionPool(**_pool_options(True)))
+
+# For binary values (e.g. float32 embedding bytes) that must not be decoded as UTF-8
+redis_binary_client = redis.Redis(connection_pool=redis.BlockingConnectionPool(**_pool_options(False)))
+
+# asyncio clients for the API request path, so Redis calls never block the event loop
+async_redis_client = redis.asyncio.Redis(
+    connection_pool=redis.asyncio.BlockingConnectionPool(**_pool_options(True))
+)
+
+async_redis_binary_client = redis.asyncio.Redis(
+    connection_pool=redis.asyncio.BlockingConnectionPool(**_pool_options(False))
 )
@@ -0,0 +1,296 @@
+"""
+Hash-partitioned vector search over several shard roots, each served by its own
+search worker process (main_search_worker), so the corpus is spread over the RAM
+of several processes or machines instead of being loaded into every API worker.
+
+- ShardedFaissStore is the write side: the index writer adds and compacts shard
+  roots in-process, routing every row by the hash of its user_id or doc_id.
+- ShardSearchClient is the read side used by the API: a search is sent to the
+  shards that can hold the user's chunks (one when sharding by user_id, all when
+  sharding by doc_id) over multiprocessing.connection, and their top_k lists are
+  merged. Shards that fail or miss the timeout are left out of the results.
+
+With SEARCH_SHARDS = 0 both index_store and search_store are the plain faiss_store.
+"""
+import hashlib
+import heapq
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import Client, Listener, wait
+import numpy as np
+from app.db.ann_index import IndexConfig
+from app.db.faiss_store import FaissStore, faiss_store, select_context
+from app.core.config import settings
+from app.core.logging import logger
+
+SHARD_KEYS = ("user_id", "doc_id")
+
+
+def shard_for(key: str, shards: int) -> int:
+    """Stable shard number of a user_id / doc_id (the same in every process, unlike hash())."""
+    return int.from_bytes(hashlib.blake2b(str(key).encode("utf-8"), digest_size=8).digest(), "little") % shards
+
+
+def shard_roots(root: str, shards: int) -> list[str]:
+    return [os.path.join(root, f"shard-{i}") for i in range(shards)]
+
+
+def _merge(result_lists, top_k: int) -> list:
+    """Merge per-shard (metadata, score) lists, each best first, into the overall top_k."""
+    return list(heapq.merge(*result_lists, key=lambda result: -result[1]))[:top_k]
+
+
+def _check_key(key: str):
+    if key not in SHARD_KEYS:
+        raise ValueError(f"Unknown shard key {key!r}, expected one of {', '.join(SHARD_KEYS)}")
+
+
+class ShardedFaissStore:
+    """
+    One FaissStore per shard root, with rows routed by the hash of their `key`
+    field. Used in-process by the index writer; searches here gather in-process too.
+    """
+
+    def __init__(self, roots: list[str], key: str = "user_id", dim=1536, index_config=None, **store_kwargs):
+        _check_key(key)
+        self.key = key
+        self.data_dir = os.path.commonpath(roots) if len(roots) > 1 else roots[0]
+        self.stores = [FaissStore(dim=dim, data_dir=root, index_config=index_config, **store_kwargs) for root in roots]
+
+    @classmethod
+    def from_settings(cls, settings) -> "ShardedFaissStore":
+        return cls(shard_roots(settings.SEARCH_SHARD_ROOT, settings.SEARCH_SHARDS), settings.SEARCH_SHARD_KEY,
+                   index_config=IndexConfig.from_settings(settings), mmap=settings.FAISS_MMAP)
+
+    def _store(self, key: str) -> FaissStore:
+        return self.stores[shard_for(key, len(self.stores))]
+
+    def add(self, vectors, metadata, batch_id: str | None = None):
+        by_shard: dict[int, list[int]] = {}
+        for i, meta in enumerate(metadata[:len(vectors)]):
+            by_shard.setdefault(shard_for(meta[self.key], len(self.stores)), []).append(i)
+        for shard, rows in by_shard.items():
+            self.stores[shard].add([vectors[i] for i in rows], [metadata[i] for i in rows], batch_id=batch_id)
+
+    def search(self, query_vector, user_id, top_k=5, min_score=None, max_tokens=None, **kwargs):
+        stores = [self._store(user_id)] if self.key == "user_id" else self.stores
+        results = [store.search(query_vector, user_id, top_k, min_score, **kwargs) for store in stores]
+        return select_context(_merge(results, top_k), max_tokens=max_tokens)
+
+    def delete_document(self, user_id: str, doc_id: str) -> int:
+        return self._store(user_id if self.key == "user_id" else doc_id).delete_document(user_id, doc_id)
+
+    def reclaim_deleted(self, user_id: str, doc_id: str):
+        self._store(user_id if self.key == "user_id" else doc_id).reclaim_deleted(user_id, doc_id)
+
+    def warm_up(self, limit: int | None = None) -> int:
+        return sum(store.warm_up(limit) for store in self.stores)
+
+    def rebuild_indexes(self, force: bool = False):
+        for store in self.stores:
+            store.rebuild_indexes(force=force)
+
+    def migrate_legacy_index(self):
+        """Route a pre-partitioning global index under DATA_DIR into the shards."""
+        FaissStore(dim=self.stores[0].dim, data_dir=faiss_store.data_dir).migrate_legacy_index(target=self)
+
+
+def shard_authkey(settings) -> bytes:
+    """
+    The key authenticating the API and the search workers to each other. Requests
+    are pickled, so it must be a secret of its own, not shared with anything else.
+    """
+    if not settings.SEARCH_SHARD_AUTHKEY:
+        raise ValueError("SEARCH_SHARD_AUTHKEY must be set to use search workers")
+    return settings.SEARCH_SHARD_AUTHKEY.encode()
+
+
+def parse_address(address: str) -> tuple[str, int]:
+    host, port = address.rsplit(":", 1)
+    return host, int(port)
+
+
+class ShardSearchClient:
+    """
+    Scatter-gather client of the shard search workers. Safe to call from several
+    threads: each call checks out its own connection per shard.
+    """
+
+    def __init__(self, addresses: list[tuple[str, int]], authkey: bytes, key: str = "user_id", timeout: float = 2.0):
+        _check_key(key)
+        self.addresses = addresses
+        self.authkey = authkey
+        self.key = key
+        self.timeout = timeout
+        self._idle = [queue.LifoQueue() for _ in addresses]  # open connections per shard
+        self._connector = ThreadPoolExecutor(max_workers=max(4, len(addresses)), thread_name_prefix="shard-connect")
+
+    @classmethod
+    def from_settings(cls, settings) -> "ShardSearchClient":
+        if len(settings.SEARCH_SHARD_ADDRESSES) != settings.SEARCH_SHARDS:
+            raise ValueError("SEARCH_SHARD_ADDRESSES needs one address per shard (SEARCH_SHARDS)")
+        return cls([parse_address(a) for a in settings.SEARCH_SHARD_ADDRESSES], shard_authkey(settings),
+                   settings.SEARCH_SHARD_KEY, settings.SEARCH_SHARD_TIMEOUT)
+
+    def _connect(self, shard: int):
+        """A new connection to shard. Client() blocks until the worker completes the auth handshake: bound it."""
+        future = self._connector.submit(Client, self.addresses[shard], authkey=self.authkey)
+        try:
+            return future.result(self.timeout)
+        except TimeoutError:
+            # Close the connection should it still complete, rather than leak it
+            future.add_done_callback(lambda done: done.exception() is None and done.result().close())
+            raise
+
+    def warm_up(self, limit: int | None = None) -> int:
+        """Open a connection to every shard (the workers warm up their own stores); returns those reached."""
+        reached = 0
+        for shard, address in enumerate(self.addresses):
+            try:
+                conn = self._connect(shard)
+            except (OSError, EOFError) as e:
+                logger.warning(f"[sharded_store] Shard {shard} unavailable: {e}")
+                continue
+            self._idle[shard].put(conn)
+            reached += 1
+        return reached
+
+    def _send(self, shard: int, request):
+        """Send request on an idle connection to shard, or a new one if there is none (or it broke)."""
+        try:
+            conn = self._idle[shard].get_nowait()
+        except queue.Empty:
+            conn = None
+        if conn is not None:
+            try:
+                conn.send(request)
+                return conn
+            except OSError:
+                conn.close()  # e.g. the worker restarted
+        conn = self._connect(shard)
+        conn.send(request)
+        return conn
+
+    def _scatter(self, requests: dict[int, tuple], timeout: float) -> dict:
+        """Send {shard: (op, kwargs)} and gather {shard: result} from the shards answering in time."""
+        sent = {}
+        for shard, request in requests.items():
+            try:
+                sent[self._send(shard, request)] = shard
+            except (OSError, EOFError) as e:
+                logger.warning(f"[sharded_store] Shard {shard} unavailable: {e}")
+
+        results = {}
+        deadline = time.monotonic() + timeout
+        while sent and (remaining := deadline - time.monotonic()) > 0:
+            for conn in wait(list(sent), remaining):
+                shard = sent.pop(conn)
+                try:
+                    status, value = conn.recv()
+                except (OSError, EOFError) as e:
+                    logger.warning(f"[sharded_store] Shard {shard} dropped the connection: {e}")
+                    conn.close()
+                    continue
+                self._idle[shard].put(conn)
+                if status == "ok":
+                    results[shard] = value
+                else:
+                    logger.error(f"[sharded_store] Shard {shard} failed: {value}")
+
+        for conn, shard in sent.items():
+            # A late reply would be read by the next request on this connection
+            conn.close()
+            logger.warning(f"[sharded_store] Shard {shard} timed out after {timeout}s")
+        return results
+
+    def search(self, query_vector, user_id, top_k=5, min_score=None, max_tokens=None, nprobe=None, ef_search=None,
+               query_text=None):
+        """As FaissStore.search, gathered from the shards holding the user's chunks."""
+        shards = [shard_for(user_id, len(self.addresses))] if self.key == "user_id" else range(len(self.addresses))
+        kwargs = {
+            "query_vector": None if query_vector is None else np.asarray(query_vector, dtype="float32"),
+            "user_id": user_id, "top_k": top_k, "min_score": min_score,
+            "nprobe": nprobe, "ef_search": ef_search, "query_text": query_text,
+        }
+        results = self._scatter({shard: ("search", kwargs) for shard in shards}, self.timeout)
+        return select_context(_merge(results.values(), top_k), max_tokens=max_tokens)
+
+    def delete_document(self, user_id: str, doc_id: str) -> int:
+        shard = shard_for(user_id if self.key == "user_id" else doc_id, len(self.addresses))
+        results = self._scatter({shard: ("delete_document", {"user_id": user_id, "doc_id": doc_id})}, self.timeout)
+        if shard not in results:
+            raise ConnectionError(f"Shard {shard} did not confirm deleting {doc_id}")
+        return results[shard]
+
+
+# Operations a search worker serves
+_OPERATIONS = ("search", "delete_document")
+
+
+def serve(store: FaissStore, listener: Listener):
+    """Answer requests from ShardSearchClients on listener, one thread per connection, forever."""
+    logger.info(f"[sharded_store] Serving {store.data_dir} on {listener.address}")
+    while True:
+        try:
+            conn = listener.accept()
+        except (OSError, EOFError) as e:
+            # e.g. a client with the wrong authkey
+            logger.warning(f"[sharded_store] Rejected connection: {e}")
+            continue
+        threading.Thread(target=_serve_connection, args=(store, conn), daemon=True).start()
+
+
+def _serve_connection(store: FaissStore, conn):
+    with conn:
+        while True:
+            try:
+                op, kwargs = conn.recv()
+            except (OSError, EOFError):
+                return
+            try:
+                if op not in _OPERATIONS:
+                    raise ValueError(f"unknown operation {op!r}")
+                reply = ("ok", getattr(store, op)(**kwargs))
+            except Exception as e:
+                logger.error(f"[sharded_store] {op} failed: {e}", exc_info=True)
+                reply = ("error", str(e))
+            try:
+                conn.send(reply)
+            except (OSError, EOFError):
+                return
+
+
+def _local_worker(root: str, authkey: bytes, dim: int, index_config, ready):
+    listener = Listener(("127.0.0.1", 0), authkey=authkey)
+    ready.send(listener.address)
+    ready.close()
+    serve(FaissStore(dim=dim, data_dir=root, index_config=index_config), listener)
+
+
+def start_local_workers(roots: list[str], authkey: bytes, dim=1536, index_config=None):
+    """
+    Start one search worker process per shard root on localhost (for development,
+    tests and benchmarks). Returns ([(host, port)], [process]); terminate the
+    processes when done.
+    """
+    context = multiprocessing.get_context("spawn")
+    addresses, processes = [], []
+    for root in roots:
+        receiver, sender = context.Pipe(duplex=False)
+        process = context.Process(target=_local_worker, args=(root, authkey, dim, index_config, sender), daemon=True)
+        process.start()
+        addresses.append(receiver.recv())
+        processes.append(process)
+    return addresses, processes
+
+
+# The store the index writer mutates, and the one the API searches
+if settings.SEARCH_SHARDS:
+    index_store = ShardedFaissStore.from_settings(settings)
+    search_store = ShardSearchClient.from_settings(settings) if settings.SEARCH_SHARD_ADDRESSES else index_store
+else:
+    index_store = search_store = faiss_store
@@ -1,29 +1,218 @@
+import functools
+import threading
+import time
 from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from kafka.errors import KafkaError
+from kafka.structs import OffsetAndMetadata
 from app.core.kafka_app import get_kafka_consumer
+from app.core.config import settings
 from app.core.logging import logger
 
+POLL_TIMEOUT_MS = 500
+
 
 class KafkaEventConsumer(ABC):
     """
     Abstract base class for Kafka event consumers.
     Subclasses implement handle_event().
+
+    Records are polled in batches and handled by a pool of `concurrency` threads.
+    Events with the same event_key() (the doc_id by default) are handled one at a
+    time in offset order; others run in parallel. Offsets are committed by hand, and
+    only up to the first record of each partition that is not finished yet, so a
+    crash re-delivers unfinished work instead of dropping it (handlers must tolerate
+    seeing an event twice). A record whose handler raises is not committed either:
+    the rest of its partition is skipped, and once nothing of it is in flight the
+    partition is rewound to that record and redelivered after KAFKA_REDELIVERY_DELAY.
+    Once max_in_flight records are polled but unfinished, the partitions are paused
+    until the workers catch up.
     """
 
-    def __init__(self, topic: str, group_id: str):
+    def __init__(self, topic: str, group_id: str, concurrency: int = 1, consumer=None):
         self.topic = topic
         self.group_id = group_id
-        self.consumer = get_kafka_consumer(topic=topic, group_id=group_id)
+        self.concurrency = max(1, concurrency)
+        self.max_in_flight = self.concurrency * settings.KAFKA_MAX_IN_FLIGHT_PER_WORKER
+        self.consumer = consumer or get_kafka_consumer(topic=topic, group_id=group_id, enable_auto_commit=False)
+        self._stopping = threading.Event()
 
     @abstractmethod
     def handle_event(self, event: dict):
         """Process a single Kafka event."""
         pass
 
+    def event_key(self, event: dict):
+        """Events with the same key are handled in order; None means no ordering."""
+        return event.get("doc_id") if isinstance(event, dict) else None
+
+    def stop(self):
+        """Make run() return once the records already polled are handled and committed."""
+        self._stopping.set()
+
     def run(self):
-        logger.info(f"[KafkaConsumer] Listening on topic: {self.topic}, group: {self.group_id}")
-        for message in self.consumer:
-            try:
-                event = message.value
-                self.handle_event(event)
-            except Exception as e:
-                logger.error(f"[KafkaConsumer] Error handling event: {e}", exc_info=True)
+        logger.info(f"[KafkaConsumer] Listening on topic: {self.topic}, group: {self.group_id}, "
+                    f"concurrency: {self.concurrency}")
+        offsets = _OffsetTracker()
+        dispatcher = _KeyedDispatcher(self.concurrency)
+        backoff: dict = {}  # tp -> monotonic time its redelivery may start
+        try:
+            while not self._stopping.is_set():
+                room = self.max_in_flight - offsets.in_flight
+                self._pause(room <= 0, backoff)
+
+                # Paused partitions return nothing, but polling keeps the consumer in its group
+                batch = self.consumer.poll(timeout_ms=POLL_TIMEOUT_MS,
+                                           max_records=max(1, min(room, settings.KAFKA_POLL_MAX_RECORDS)))
+                for tp, messages in batch.items():
+                    for message in messages:
+                        offsets.started(tp, message.offset)
+                        key = self.event_key(message.value)
+                        dispatcher.submit(
+                            (tp, message.offset) if key is None else key,
+                            functools.partial(self._handle, message, tp, offsets),
+                        )
+                self._commit(offsets)
+                for tp, offset in offsets.rewind().items():
+                    logger.warning(f"[KafkaConsumer] Redelivering {tp.topic}[{tp.partition}] from offset {offset}")
+                    self.consumer.seek(tp, offset)
+                    backoff[tp] = time.monotonic() + settings.KAFKA_REDELIVERY_DELAY
+        finally:
+            dispatcher.shutdown()
+            self._commit(offsets)
+
+    def _pause(self, saturated: bool, backoff: dict):
+        """Pause every partition while saturated, else only those waiting to be redelivered."""
+        now = time.monotonic()
+        for tp in [tp for tp, until in backoff.items() if until <= now]:
+            del backoff[tp]
+        assignment = set(self.consumer.assignment())
+        wanted = assignment if saturated else assignment & backoff.keys()
+        paused = set(self.consumer.paused())
+        if wanted - paused:
+            self.consumer.pause(*(wanted - paused))
+        if paused - wanted:
+            self.consumer.resume(*(paused - wanted))
+
+    def _handle(self, message, tp, offsets: "_OffsetTracker"):
+        if offsets.failing(tp):
+            # An earlier record of the partition failed; this one is redelivered after it
+            offsets.released(tp, message.offset)
+            return
+        try:
+            self.handle_event(message.value)
+        except Exception as e:
+            logger.error(f"[KafkaConsumer] Error handling event at offset {message.offset}, "
+                         f"will be redelivered: {e}", exc_info=True)
+            offsets.released(tp, message.offset, failed=True)
+            return
+        offsets.finished(tp, message.offset)
+
+    def _commit(self, offsets: "_OffsetTracker"):
+        positions = offsets.committable()
+        if not positions:
+            return
+        try:
+            self.consumer.commit({tp: OffsetAndMetadata(offset, None) for tp, offset in positions.items()})
+        except KafkaError as e:
+            # e.g. the partitions were reassigned; their records will be re-delivered
+            logger.warning(f"[KafkaConsumer] Offset commit failed: {e}")
+
+
+class _OffsetTracker:
+    """
+    Per partition, which polled offsets are finished and how far it is safe to
+    commit, and where to rewind a partition whose handler failed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: dict = {}  # tp -> deque of offsets in poll order
+        self._finished: dict = {}  # tp -> set of finished offsets still behind an unfinished one
+        self._released: dict = {}  # tp -> offsets given up on (failed or skipped), to be redelivered
+        self._failing: set = set()  # partitions with a failed record
+        self.in_flight = 0
+
+    def started(self, tp, offset: int):
+        with self._lock:
+            self._pending.setdefault(tp, deque()).append(offset)
+            self._finished.setdefault(tp, set())
+            self.in_flight += 1
+
+    def finished(self, tp, offset: int):
+        with self._lock:
+            self._finished[tp].add(offset)
+            self.in_flight -= 1
+
+    def released(self, tp, offset: int, failed: bool = False):
+        """Give up on a record without committing it; failed marks its partition for a rewind."""
+        with self._lock:
+            self._released.setdefault(tp, set()).add(offset)
+            if failed:
+                self._failing.add(tp)
+            self.in_flight -= 1
+
+    def failing(self, tp) -> bool:
+        with self._lock:
+            return tp in self._failing
+
+    def rewind(self) -> dict:
+        """
+        {tp: offset to seek to} for failing partitions with nothing in flight, i.e.
+        their first record not finished; they are forgotten until polled again.
+        """
+        positions = {}
+        with self._lock:
+            for tp in list(self._failing):
+                pending, finished, released = self._pending[tp], self._finished[tp], self._released.get(tp, set())
+                if any(o not in finished and o not in released for o in pending):
+                    continue
+                positions[tp] = next(o for o in pending if o not in finished)
+                pending.clear()
+                finished.clear()
+                released.clear()
+                self._failing.discard(tp)
+        return positions
+
+    def committable(self) -> dict:
+        """{tp: offset to commit} for partitions whose finished prefix grew since the last call."""
+        positions = {}
+        with self._lock:
+            for tp, pending in self._pending.items():
+                finished = self._finished[tp]
+                while pending and pending[0] in finished:
+                    finished.discard(pending[0])
+                    positions[tp] = pending.popleft() + 1
+        return positions
+
+
+class _KeyedDispatcher:
+    """Runs jobs on a thread pool, one at a time and in submission order per key."""
+
+    def __init__(self, workers: int):
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="kafka-worker")
+        self._lock = threading.Lock()
+        self._queues: dict = {}  # key -> jobs waiting behind the one running for that key
+
+    def submit(self, key, job):
+        with self._lock:
+            if key in self._queues:
+                self._queues[key].append(job)
+                return
+            self._queues[key] = deque()
+        self._pool.submit(self._run, key, job)
+
+    def _run(self, key, job):
+        while True:
+            job()
+            with self._lock:
+                waiting = self._queues[key]
+                if not waiting:
+                    del self._queues[key]
+                    return
+                job = waiting.popleft()
+
+    def shutdown(self):
+        """Wait for every submitted job to finish."""
+        self._pool.shutdown(wait=True)
@@ -1,15 +1,17 @@
 from datetime import datetime, timezone
 from app.kafka_events.base_consumer import KafkaEventConsumer
 from app.db.mongo import documents_collection
-from app.db.redis import redis_client # <--- NEW IMPORT
+from app.services.answer_cache import answer_cache
 from app.core.logging import logger
 from app.core.config import settings
 
 class DocumentProcessedConsumer(KafkaEventConsumer):
-    def __init__(self):
+    def __init__(self, consumer=None):
         super().__init__(
             topic=settings.KAFKA_TOPIC_DOCUMENT_PROCESSED,
-            group_id="document-processed"
+            group_id="document-processed",
+            concurrency=settings.KAFKA_PROCESSED_CONCURRENCY,
+            consumer=consumer,
         )
 
     def handle_event(self, event: dict):
@@ -42,20 +44,8 @@ class DocumentProcessedConsumer(KafkaEventConsumer):
         self._invalidate_user_cache(user_id)
         
     def _invalidate_user_cache(self, user_id: str):
-        """Deletes all cached RAG answers for a specific user."""
+        """Deletes all cached RAG answers (exact and semantic) for a specific user."""
         try:
-            # The cache key pattern is "answer:{user_id}:{question}"
-            cache_pattern = f"answer:{user_id}:*"
-            
-            # Find all keys matching the pattern
-            keys_to_delete = redis_client.keys(cache_pattern)
-            
-            if keys_to_delete:
-                # Delete all matching keys
-                deleted_count = redis_client.delete(*keys_to_delete)
-                logger.info(f"[CacheInvalidator] Cleared {deleted_count} cache entries for user {user_id}")
-            else:
-                logger.debug(f"[CacheInvalidator] No cache entries found for user {user_id}")
-                
+            answer_cache.invalidate_user(user_id)
         except Exception as e:
             logger.error(f"[CacheInvalidator] Failed to invalidate cache for user {user_id}: {e}", exc_info=True)
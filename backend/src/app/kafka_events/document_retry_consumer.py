@@ -0,0 +1,33 @@
+import time
+from app.kafka_events.base_consumer import KafkaEventConsumer
+from app.kafka_events.document_uploaded_consumer import DocumentUploadedConsumer
+from app.kafka_events.producer import publish_event
+from app.kafka_events.retry import retry_topic
+from app.core.logging import logger
+from app.core.config import settings
+
+
+class DocumentRetryConsumer(DocumentUploadedConsumer):
+    """
+    Re-processes failed uploads from one retry tier's topic. Every event in a tier
+    waits the same delay, so events become due in offset order and each one is
+    simply held until its retry_at.
+    """
+
+    def __init__(self, delay: int, consumer=None):
+        KafkaEventConsumer.__init__(
+            self,
+            topic=retry_topic(delay),
+            group_id=f"document-retry-{delay}s",
+            concurrency=settings.KAFKA_RETRY_CONCURRENCY,
+            consumer=consumer,
+        )
+
+    def handle_event(self, event: dict):
+        wait = event.get("retry_at", 0) - time.time()
+        if wait > 0 and self._stopping.wait(wait):
+            # Shutting down before the retry is due: put it back rather than drop it
+            publish_event(self.topic, event)
+            logger.info(f"[DocumentRetryConsumer] Re-queued {event.get('doc_id')} on shutdown")
+            return
+        super().handle_event(event)
@@ -3,15 +3,18 @@ from app.kafka_events.base_consumer import KafkaEventConsumer
 from app.db.mongo import documents_collection
 from app.services.document_service import process_pdf
 from app.kafka_events.producer import publish_document_processed
+from app.kafka_events.retry import schedule_retry
 from app.core.logging import logger
 from app.core.config import settings
 
 
 class DocumentUploadedConsumer(KafkaEventConsumer):
-    def __init__(self):
+    def __init__(self, consumer=None):
         super().__init__(
             topic=settings.KAFKA_TOPIC_DOCUMENT_UPLOADED,
-            group_id="document-processor"
+            group_id="document-processor",
+            concurrency=settings.KAFKA_UPLOADED_CONCURRENCY,
+            consumer=consumer,
         )
 
     def handle_event(self, event: dict):
@@ -55,10 +58,26 @@ class DocumentUploadedConsumer(KafkaEventConsumer):
 
         except Exception as e:
             logger.error(f"[DocumentUploadedConsumer] Failed to process {doc_id}: {e}", exc_info=True)
-            documents_collection.update_one(
-                {"_id": doc_id},
-                {"$set": {"status": "failed", "error": str(e)}}
-            )
+
+            # Retry later on a retry topic, or dead-letter once out of attempts
+            try:
+                retry = schedule_retry(event, e)
+            except Exception as publish_error:
+                # e.g. Kafka is down: raised so the consumer redelivers the event
+                # instead of committing it (see KafkaEventConsumer)
+                logger.error(f"[DocumentUploadedConsumer] Could not schedule a retry of {doc_id}: {publish_error}")
+                documents_collection.update_one({"_id": doc_id}, {"$set": {"status": "failed", "error": str(e)}})
+                raise
+            if retry is None:
+                update = {"status": "failed", "error": str(e)}
+            else:
+                update = {
+                    "status": "retrying",
+                    "error": str(e),
+                    "attempts": retry["attempt"] - 1,
+                    "next_attempt_at": datetime.fromtimestamp(retry["retry_at"], timezone.utc),
+                }
+            documents_collection.update_one({"_id": doc_id}, {"$set": update})
 
         # Future observability: send processing metrics to Elastic/Grafana
         # Example: processing duration, chunk count, errors
@@ -32,3 +32,10 @@ def publish_document_processed(doc_id, filename, user_id, chunks_count):
     }
     producer.send(settings.KAFKA_TOPIC_DOCUMENT_PROCESSED, value=event)
     producer.flush()
+
+
+def publish_event(topic: str, event: dict):
+    """Send an event as-is (retries, dead letters, replays)."""
+    producer = get_kafka_producer()
+    producer.send(topic, value=event)
+    producer.flush()
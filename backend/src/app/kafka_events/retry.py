@@ -0,0 +1,55 @@
+"""
+Retry scheduling for failed document_uploaded events.
+
+A failed event is re-published to a retry topic, one per entry of
+KAFKA_RETRY_DELAYS (document_uploaded-retry-30s, ...-retry-120s, ...), with its
+attempt number and the time it is due. The retry consumers started by
+main_uploaded_consumer process it once it is due, away from the main topic, so
+retries never hold up fresh uploads. After the last tier, or straight away for errors that retrying
+cannot fix, the event goes to the dead-letter topic, from where main_replay_dlq
+can re-drive it.
+"""
+import time
+from datetime import datetime, timezone
+import PyPDF2
+from app.kafka_events.producer import publish_event
+from app.core.config import settings
+from app.core.logging import logger
+
+# Fields added to an event while it is retried; stripped again when it is replayed
+RETRY_FIELDS = ("attempt", "retry_at", "last_error", "failed_at")
+
+# Errors that fail the same way on every attempt
+PERMANENT_ERRORS = (FileNotFoundError, PyPDF2.errors.PdfReadError)
+
+
+def retry_topic(delay: int) -> str:
+    return f"{settings.KAFKA_TOPIC_DOCUMENT_UPLOADED}-retry-{delay}s"
+
+
+def retry_topics() -> list[tuple[int, str]]:
+    """(delay, topic) of every retry tier, shortest delay first."""
+    return [(delay, retry_topic(delay)) for delay in settings.KAFKA_RETRY_DELAYS]
+
+
+def schedule_retry(event: dict, error: Exception) -> dict | None:
+    """
+    Publish a failed event to its next retry tier, or to the dead-letter topic when
+    it has no attempts left or error is permanent. Returns the retry event, or None
+    if the event was dead-lettered.
+    """
+    attempt = event.get("attempt", 1)
+    delays = settings.KAFKA_RETRY_DELAYS
+
+    if isinstance(error, PERMANENT_ERRORS) or attempt > len(delays):
+        dead = {**event, "attempt": attempt, "last_error": str(error),
+                "failed_at": datetime.now(timezone.utc).isoformat()}
+        publish_event(settings.KAFKA_TOPIC_DOCUMENT_DLQ, dead)
+        logger.warning(f"[retry] {event.get('doc_id')} dead-lettered after {attempt} attempt(s): {error}")
+        return None
+
+    delay = delays[attempt - 1]
+    retry = {**event, "attempt": attempt + 1, "retry_at": time.time() + delay, "last_error": str(error)}
+    publish_event(retry_topic(delay), retry)
+    logger.info(f"[retry] {event.get('doc_id')} attempt {attempt} failed, retrying in {delay}s")
+    return retry
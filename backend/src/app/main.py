@@ -1,3 +1,4 @@
+from contextlib import asynccontextmanager
 from pathlib import Path
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
@@ -6,9 +7,22 @@ from fastapi.security import OAuth2PasswordBearer
 from app.core.config import settings
 from app.api import api_router
 from app.core.middleware import setup_middlewares
+from app.core.startup import start_warm_up
+from app.utils.rate_limiter import HybridRateLimiter, general_limiter
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm up in the background: /healthz answers at once, /readyz once warm
+    start_warm_up()
+    yield
+    # Count in Redis what this worker let through since the last sync
+    if isinstance(general_limiter, HybridRateLimiter):
+        await general_limiter.flush()
+
 
 BASE_DIR = Path(__file__).resolve().parent.parent
-app = FastAPI(title=settings.PROJECT_NAME)
+app = FastAPI(title=settings.PROJECT_NAME, lifespan=lifespan)
 
 # Templates & static files
 templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
@@ -22,6 +36,3 @@ setup_middlewares(app)
 
 # Routers
 app.include_router(api_router)
-
-
-# To create - app.on_event ("startup")(create_start_app_handler(app))
\ No newline at end of file
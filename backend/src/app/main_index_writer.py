@@ -0,0 +1,20 @@
+"""
+The index writer: the only process that mutates the FAISS shards. Ingest processes
+spool vector batches (app.db.index_spool); this applies them in order, builds ANN
+indexes and compacts shards. Extra replicas wait on the writer lock as hot standbys.
+
+    python -m app.main_index_writer
+"""
+import signal
+from app.db.sharded_store import index_store
+from app.db.index_spool import index_spool
+from app.db.index_writer import IndexWriter, writer_lock
+
+if __name__ == "__main__":
+    writer = IndexWriter(index_store, index_spool)
+    signal.signal(signal.SIGTERM, lambda signum, frame: writer.stop())
+    signal.signal(signal.SIGINT, lambda signum, frame: writer.stop())
+
+    with writer_lock(index_store.data_dir):
+        index_store.migrate_legacy_index()
+        writer.run()
@@ -0,0 +1,25 @@
+"""
+Offline migration of every user shard to the configured FAISS index type, e.g.
+
+    FAISS_INDEX_TYPE=ivf_pq python -m app.main_rebuild_index
+
+Stop the index writer first: the rebuild takes the writer lock, and refuses to
+start while a writer holds it. Uploads keep spooling and are applied once the
+writer is back.
+"""
+import argparse
+import sys
+from app.db.sharded_store import index_store
+from app.db.index_writer import writer_lock
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--force", action="store_true", help="rebuild shards that already match the configured type")
+    args = parser.parse_args()
+
+    try:
+        with writer_lock(index_store.data_dir, blocking=False):
+            index_store.migrate_legacy_index()
+            index_store.rebuild_indexes(force=args.force)
+    except BlockingIOError:
+        sys.exit("The index writer is running; stop it before rebuilding")
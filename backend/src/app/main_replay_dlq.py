@@ -0,0 +1,56 @@
+"""
+Re-drive dead-lettered uploads: every event on the dead-letter topic whose document
+is still marked failed goes back to the document_uploaded topic as a fresh upload.
+
+    python -m app.main_replay_dlq --dry-run
+    python -m app.main_replay_dlq --doc-id 6650c1... --doc-id 6650c2...
+
+The topic is read from the start each time and nothing is committed; documents that
+were replayed already (status no longer "failed") or deleted are skipped, so running
+it twice is harmless.
+"""
+import argparse
+from datetime import datetime, timezone
+from app.core.kafka_app import get_kafka_consumer
+from app.db.mongo import documents_collection
+from app.kafka_events.producer import publish_event
+from app.kafka_events.retry import RETRY_FIELDS
+from app.core.config import settings
+from app.core.logging import logger
+
+
+def replay_dead_letters(consumer, doc_ids=None, dry_run: bool = False, idle_timeout_ms: int = 5000) -> list[str]:
+    """Replay the dead letters consumer yields until it is idle; returns the replayed doc_ids."""
+    replayed = []
+    while batch := consumer.poll(timeout_ms=idle_timeout_ms):
+        for messages in batch.values():
+            for message in messages:
+                event = message.value
+                doc_id = event.get("doc_id")
+                if doc_ids and doc_id not in doc_ids or doc_id in replayed:
+                    continue
+                doc = documents_collection.find_one({"_id": doc_id}, {"status": 1})
+                if doc is None or doc.get("status") != "failed":
+                    continue
+
+                logger.info(f"[replay_dlq] {'Would replay' if dry_run else 'Replaying'} {doc_id} "
+                            f"(failed after {event.get('attempt')} attempt(s): {event.get('last_error')})")
+                if not dry_run:
+                    fresh = {k: v for k, v in event.items() if k not in RETRY_FIELDS}
+                    fresh["timestamp"] = datetime.now(timezone.utc).isoformat()
+                    publish_event(settings.KAFKA_TOPIC_DOCUMENT_UPLOADED, fresh)
+                    documents_collection.update_one({"_id": doc_id}, {"$set": {"status": "queued"}})
+                replayed.append(doc_id)
+    return replayed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--doc-id", action="append", help="only replay this document (repeatable)")
+    parser.add_argument("--dry-run", action="store_true", help="list what would be replayed")
+    args = parser.parse_args()
+
+    consumer = get_kafka_consumer(topic=settings.KAFKA_TOPIC_DOCUMENT_DLQ, group_id=None, enable_auto_commit=False)
+    replayed = replay_dead_letters(consumer, doc_ids=set(args.doc_id or ()), dry_run=args.dry_run)
+    consumer.close()
+    print(f"{'Would replay' if args.dry_run else 'Replayed'} {len(replayed)} document(s)")
@@ -0,0 +1,28 @@
+"""
+Search worker for one shard root of a sharded store (see app.db.sharded_store):
+loads only that shard's users and answers the API's scatter-gather searches.
+
+    SEARCH_SHARDS=4 SEARCH_SHARD_AUTHKEY=... python -m app.main_search_worker --shard 0 --listen 10.0.0.5:7000
+
+The API then lists every worker in SEARCH_SHARD_ADDRESSES, in shard order. Requests
+are pickled: listen on localhost (the default) or a private network interface only.
+"""
+import argparse
+import threading
+from multiprocessing.connection import Listener
+from app.db.ann_index import IndexConfig
+from app.db.faiss_store import FaissStore
+from app.db.sharded_store import parse_address, serve, shard_authkey, shard_roots
+from app.core.config import settings
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shard", type=int, required=True, help="shard number, 0 to SEARCH_SHARDS - 1")
+    parser.add_argument("--listen", default="127.0.0.1:7000", help="host:port to serve on")
+    args = parser.parse_args()
+
+    authkey = shard_authkey(settings)
+    root = shard_roots(settings.SEARCH_SHARD_ROOT, settings.SEARCH_SHARDS)[args.shard]
+    store = FaissStore(data_dir=root, index_config=IndexConfig.from_settings(settings), mmap=settings.FAISS_MMAP)
+    threading.Thread(target=store.warm_up, args=(settings.FAISS_WARM_SHARDS,), daemon=True).start()
+    serve(store, Listener(parse_address(args.listen), authkey=authkey))
@@ -1,5 +1,33 @@
+import signal
+import threading
+from contextlib import nullcontext
 from app.kafka_events.document_uploaded_consumer import DocumentUploadedConsumer
+from app.kafka_events.document_retry_consumer import DocumentRetryConsumer
+from app.kafka_events.retry import retry_topics
+from app.db.sharded_store import index_store
+from app.db.index_writer import writer_lock
+from app.core.config import settings
 
 if __name__ == "__main__":
-    consumer = DocumentUploadedConsumer()
-    consumer.run()
+    # Retry tiers run next to the main consumer, each with its own workers, so
+    # retries never hold up fresh uploads
+    consumers = [DocumentUploadedConsumer()] + [DocumentRetryConsumer(delay) for delay, _ in retry_topics()]
+    threads = [threading.Thread(target=c.run, name=c.topic) for c in consumers]
+
+    def stop(signum, frame):
+        for consumer in consumers:
+            consumer.stop()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    # Vectors normally go through the index writer's spool, so any number of replicas
+    # can run; writing FAISS directly makes this process the writer
+    direct = settings.INDEX_WRITES == "direct"
+    with writer_lock(index_store.data_dir) if direct else nullcontext():
+        if direct:
+            index_store.migrate_legacy_index()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
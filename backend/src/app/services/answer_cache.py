@@ -0,0 +1,145 @@
+import hashlib
+import threading
+import numpy as np
+from app.core.config import settings
+from app.core.logging import logger
+from app.db.redis import async_redis_binary_client, async_redis_client, redis_client
+from app.services.embedding_cache import normalize_text
+
+
+def answer_key(user_id: str, question: str) -> str:
+    digest = hashlib.sha1(normalize_text(question).lower().encode("utf-8")).hexdigest()
+    return f"answer:{user_id}:{digest}"
+
+
+def questions_key(user_id: str) -> str:
+    return f"semcache:{user_id}"
+
+
+class SemanticAnswerCache:
+    """
+    Per-user cache of RAG answers, looked up in two steps:
+    1. exact match on the normalised question (case/whitespace-insensitive), no embedding needed
+    2. semantic match: the question embedding is compared with the user's previously
+       answered questions and a cached answer is reused above the similarity threshold.
+
+    Answers live under answer:{user_id}:{hash} with the usual TTL; the question
+    embeddings of a user live in one Redis hash, semcache:{user_id}, keyed by the same hash.
+
+    Lookups and writes happen on the API request path and use the asyncio clients;
+    invalidate_user() is called from Kafka consumers and uses the sync client.
+    """
+
+    def __init__(self, redis_text, async_redis_text, async_redis_binary,
+                 threshold: float, ttl: int, max_entries: int):
+        self.redis = redis_text
+        self.async_redis = async_redis_text
+        self.async_redis_binary = async_redis_binary
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    def _count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    async def get_exact(self, user_id: str, question: str) -> str | None:
+        answer = await self.async_redis.get(answer_key(user_id, question))
+        if answer is not None:
+            self._count("exact_hits")
+        return answer
+
+    async def get_exact_or_take(self, user_id: str, question: str, limiter, limit_key: str) -> tuple[str | None, bool]:
+        """
+        get_exact() and limiter.take(limit_key) in one round-trip (see
+        RedisRateLimiter.take_unless_cached): nothing is counted against the limit
+        when the answer is cached. Returns (cached answer or None, allowed).
+        """
+        answer, allowed, _ = await limiter.take_unless_cached(limit_key, answer_key(user_id, question))
+        if answer is not None:
+            self._count("exact_hits")
+        return answer, allowed
+
+    async def get_similar(self, user_id: str, embedding) -> str | None:
+        """Return the answer of the most similar cached question above the threshold."""
+        entries = await self.async_redis_binary.hgetall(questions_key(user_id))
+        if not entries:
+            self._count("misses")
+            return None
+
+        fields = list(entries)
+        matrix = np.frombuffer(b"".join(entries[f] for f in fields), dtype="<f4").reshape(len(fields), -1)
+        query = np.asarray(embedding, dtype="float32")
+        scores = matrix @ (query / np.linalg.norm(query))
+        best = int(np.argmax(scores))
+
+        if scores[best] >= self.threshold:
+            field = fields[best].decode("ascii")
+            answer = await self.async_redis.get(f"answer:{user_id}:{field}")
+            if answer is not None:
+                self._count("semantic_hits")
+                return answer
+            # The answer expired; forget the question too
+            await self.async_redis_binary.hdel(questions_key(user_id), field)
+
+        self._count("misses")
+        return None
+
+    async def put(self, user_id: str, question: str, embedding, answer: str):
+        """Cache answer; without an embedding it is only found by exact match."""
+        key = answer_key(user_id, question)
+        if embedding is None:
+            await self.async_redis_binary.set(key, answer.encode("utf-8"), ex=self.ttl)
+            return
+
+        vector = np.asarray(embedding, dtype="float32")
+        vector = (vector / np.linalg.norm(vector)).astype("<f4")
+
+        qkey, field = questions_key(user_id), key.rsplit(":", 1)[1]
+        pipe = self.async_redis_binary.pipeline(transaction=False)
+        pipe.hlen(qkey)
+        pipe.set(key, answer.encode("utf-8"), ex=self.ttl)
+        pipe.hset(qkey, field, vector.tobytes())
+        pipe.expire(qkey, self.ttl)
+        entries = (await pipe.execute())[0]
+
+        if entries >= self.max_entries:
+            # The set was full: start it over with just this question
+            pipe = self.async_redis_binary.pipeline(transaction=False)
+            pipe.delete(qkey)
+            pipe.hset(qkey, field, vector.tobytes())
+            pipe.expire(qkey, self.ttl)
+            await pipe.execute()
+
+    def invalidate_user(self, user_id: str) -> int:
+        """Drop every cached answer and question of a user (their document set changed)."""
+        keys = list(self.redis.scan_iter(match=f"answer:{user_id}:*", count=500))
+        keys.append(questions_key(user_id))
+        deleted = self.redis.delete(*keys)
+        logger.info(f"[answer_cache] Cleared {deleted} cache entries for user {user_id}")
+        return deleted
+
+    def stats(self) -> dict:
+        hits = self.exact_hits + self.semantic_hits
+        lookups = hits + self.misses
+        return {
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "saved_llm_calls": hits,
+        }
+
+
+answer_cache = SemanticAnswerCache(
+    redis_client,
+    async_redis_client,
+    async_redis_binary_client,
+    threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+    ttl=settings.REDIS_CACHE_TTL,
+    max_entries=settings.SEMANTIC_CACHE_MAX_ENTRIES,
+)
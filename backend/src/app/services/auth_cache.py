@@ -0,0 +1,164 @@
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from bson import ObjectId
+from app.core.config import settings
+from app.core.logging import logger
+from app.core.security import decode_access_token
+from app.db.mongo import users_collection
+from app.db.redis import async_redis_client
+from app.utils.blocking import run_blocking
+
+INVALIDATION_CHANNEL = "auth:invalidate"
+
+
+def token_digest(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def find_user(user_id: str) -> dict | None:
+    return users_collection.find_one({"_id": ObjectId(user_id)})
+
+
+class _TTLCache:
+    """Thread-safe LRU of at most size entries, each dropped once its deadline (epoch seconds) passes."""
+
+    def __init__(self, size: int, clock=time.time):
+        self.size = size
+        self.clock = clock
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires <= self.clock():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value, expires: float):
+        if self.size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def discard(self, match):
+        """Drop every entry whose key satisfies match(key)."""
+        with self._lock:
+            for key in [k for k in self._entries if match(k)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class AuthCache:
+    """
+    Per-process cache of what auth_middleware needs for each request:
+    - decoded JWTs by token, so a repeated token skips signature verification;
+      kept until the token expires (or ttl, whichever is first)
+    - user records by (user id, token), so a request skips the Mongo lookup; kept
+      for ttl seconds, which bounds how stale a record can get.
+
+    invalidate() must be called when a user logs out or their record changes. It
+    drops the entries locally and, with a Redis client, publishes the invalidation
+    on INVALIDATION_CHANNEL to the other workers (each listens once it serves
+    requests). A worker that loses the subscription clears its cache on reconnecting,
+    as it may have missed invalidations. A size of 0 disables the cache.
+    """
+
+    def __init__(self, size: int, ttl: float, redis_client=None, find_user=find_user, clock=time.time):
+        self.ttl = ttl
+        self.redis = redis_client
+        self.find_user = find_user
+        self.clock = clock
+        self._tokens = _TTLCache(size, clock)
+        self._users = _TTLCache(size, clock)
+        self._listener: asyncio.Task | None = None
+
+    def decode(self, token: str) -> dict | None:
+        """decode_access_token, cached; None for an invalid or expired token."""
+        digest = token_digest(token)
+        payload = self._tokens.get(digest)
+        if payload is None:
+            payload = decode_access_token(token)
+            if payload:
+                self._tokens.put(digest, payload, min(payload.get("exp", float("inf")), self.clock() + self.ttl))
+        return payload
+
+    async def get_user(self, user_id: str, token: str) -> dict | None:
+        """The user record of user_id, authenticated by token; None if there is no such user."""
+        self._ensure_listening()
+        key = (user_id, token_digest(token))
+        user = self._users.get(key)
+        if user is None:
+            user = await run_blocking(self.find_user, user_id)
+            if user:
+                self._users.put(key, user, self.clock() + self.ttl)
+        # A copy, so a request cannot change the record the next ones get
+        return dict(user) if user else None
+
+    async def invalidate(self, user_id: str, token: str | None = None):
+        """Forget user_id's record (only the one cached for token, if given) in every worker."""
+        digest = token_digest(token) if token else ""
+        self._drop(user_id, digest)
+        if self.redis is None:
+            return
+        try:
+            await self.redis.publish(INVALIDATION_CHANNEL, f"{user_id} {digest}")
+        except Exception as e:
+            # The other workers drop it within ttl anyway
+            logger.warning(f"[auth_cache] Could not publish the invalidation of {user_id}: {e}")
+
+    def _drop(self, user_id: str, digest: str = ""):
+        if digest:
+            self._tokens.pop(digest)
+            self._users.pop((user_id, digest))
+        else:
+            self._users.discard(lambda key: key[0] == user_id)
+
+    def _ensure_listening(self):
+        if self.redis is None:
+            return
+        loop = asyncio.get_running_loop()
+        if self._listener is None or self._listener.done() or self._listener.get_loop() is not loop:
+            self._listener = loop.create_task(self._listen())
+
+    async def _listen(self):
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(INVALIDATION_CHANNEL)
+                    # Invalidations sent while not subscribed are lost
+                    self._tokens.clear()
+                    self._users.clear()
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            data = message["data"]
+                            user_id, _, digest = (data.decode() if isinstance(data, bytes) else data).partition(" ")
+                            self._drop(user_id, digest)
+            except Exception as e:
+                logger.warning(f"[auth_cache] Invalidation channel lost, resubscribing: {e}")
+                await asyncio.sleep(1)
+
+
+auth_cache = AuthCache(
+    settings.AUTH_CACHE_SIZE,
+    settings.AUTH_CACHE_TTL,
+    redis_client=async_redis_client if settings.AUTH_CACHE_REDIS_INVALIDATION else None,
+)
@@ -0,0 +1,121 @@
+"""
+Chunkers turn a document's pages into retrieval chunks.
+
+A chunker is any callable taking an iterable of (page_number, page_text) pairs and
+yielding chunk dicts {"text", "tokens", "page_start", "page_end"}. Pages are consumed
+one at a time, so a document is never held in memory as one string.
+"""
+import math
+import re
+from collections.abc import Callable, Iterable, Iterator
+from app.core.config import settings
+from app.utils.tokens import count_tokens
+
+Pages = Iterable[tuple[int, str]]
+Chunker = Callable[[Pages], Iterator[dict]]
+
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+class TokenChunker:
+    """
+    Packs whole sentences into chunks of at most max_tokens model tokens. Chunks
+    break between sentences, paragraphs or pages, never inside a sentence (unless the
+    sentence alone is longer than max_tokens), and each chunk starts with up to
+    overlap_tokens of the previous chunk's trailing sentences.
+    """
+
+    def __init__(self, max_tokens: int = 400, overlap_tokens: int = 50):
+        self.max_tokens = max_tokens
+        self.overlap_tokens = min(overlap_tokens, max_tokens // 2)
+
+    def __call__(self, pages: Pages) -> Iterator[dict]:
+        current, tokens = [], 0  # [(separator, text, tokens, page)]
+        for separator, text, n, page in self._sentences(pages):
+            if current and tokens + n > self.max_tokens:
+                yield self._chunk(current)
+                current = self._overlap(current, self.max_tokens - n)
+                tokens = sum(u[2] for u in current)
+            current.append((separator, text, n, page))
+            tokens += n
+        if current:
+            yield self._chunk(current)
+
+    def _sentences(self, pages: Pages):
+        """(separator, sentence, tokens, page) units; over-long sentences are split by words."""
+        for page, text in pages:
+            separator = "\n\n"  # a page break counts as a paragraph break
+            for paragraph in PARAGRAPH_BREAK.split(text or ""):
+                paragraph = " ".join(paragraph.split())  # undo PDF line wrapping
+                for sentence in SENTENCE_END.split(paragraph) if paragraph else ():
+                    n = count_tokens(sentence)
+                    for piece, piece_tokens in self._split_long(sentence, n):
+                        yield separator, piece, piece_tokens, page
+                        separator = " "
+                separator = "\n\n"
+
+    def _split_long(self, sentence: str, n: int):
+        """Split a sentence longer than max_tokens into even word runs, each within the limit."""
+        words = sentence.split()
+        if n <= self.max_tokens or len(words) == 1:
+            yield sentence, n
+            return
+        per_piece = max(1, min(len(words) - 1, len(words) // math.ceil(n / self.max_tokens)))
+        for i in range(0, len(words), per_piece):
+            piece = " ".join(words[i:i + per_piece])
+            yield from self._split_long(piece, count_tokens(piece))
+
+    def _overlap(self, units: list, room: int) -> list:
+        """The trailing units to repeat at the start of the next chunk."""
+        budget = min(self.overlap_tokens, room)
+        carried, tokens = [], 0
+        for unit in reversed(units[1:]):
+            if tokens + unit[2] > budget:
+                break
+            carried.insert(0, unit)
+            tokens += unit[2]
+        return carried
+
+    @staticmethod
+    def _chunk(units: list) -> dict:
+        text = units[0][1] + "".join(sep + text for sep, text, _, _ in units[1:])
+        return {
+            "text": text,
+            "tokens": sum(u[2] for u in units),
+            "page_start": units[0][3],
+            "page_end": units[-1][3],
+        }
+
+
+class WordChunker:
+    """The original splitter: fixed windows of max_words words, ignoring structure."""
+
+    def __init__(self, max_words: int = 200):
+        self.max_words = max_words
+
+    def __call__(self, pages: Pages) -> Iterator[dict]:
+        words, page_start = [], None
+        for page, text in pages:
+            for word in (text or "").split():
+                if not words:
+                    page_start = page
+                words.append(word)
+                if len(words) == self.max_words:
+                    yield self._chunk(words, page_start, page)
+                    words = []
+            last_page = page
+        if words:
+            yield self._chunk(words, page_start, last_page)
+
+    @staticmethod
+    def _chunk(words: list[str], page_start: int, page_end: int) -> dict:
+        text = " ".join(words)
+        return {"text": text, "tokens": count_tokens(text), "page_start": page_start, "page_end": page_end}
+
+
+def default_chunker() -> Chunker:
+    """The chunker selected by settings.CHUNKER."""
+    if settings.CHUNKER == "words":
+        return WordChunker()
+    return TokenChunker(settings.CHUNK_MAX_TOKENS, settings.CHUNK_OVERLAP_TOKENS)
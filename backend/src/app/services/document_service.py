@@ -1,57 +1,88 @@
-import tempfile
-import PyPDF2
+from itertools import islice
 from app.services import embedding_service
+from app.services.chunking import Chunker, WordChunker, default_chunker
+from app.services.pdf_extraction import extract_pages
 from app.db.mongo import documents_collection
-from app.db.faiss_store import faiss_store
+from app.db.sharded_store import index_store
+from app.db.index_spool import index_spool
+from app.core.config import settings
 from app.core.logging import logger
 
-def process_pdf(file_path: str, user_id: str, doc_id: str, filename: str) -> int:
+def process_pdf(file_path: str, user_id: str, doc_id: str, filename: str, chunker: Chunker | None = None) -> int:
     """
-    Process a PDF: extract text, split into chunks, create embeddings,
+    Process a PDF: extract text page by page, split into chunks, create embeddings,
     store in FAISS, and update Mongo.
+    Pages stream from the extractor through the chunker and chunks are embedded in
+    batches of CHUNK_EMBED_BATCH, so memory stays flat however long the document is.
+    Batches go to the index writer's spool (see INDEX_WRITES); this returns once the
+    writer has applied them, i.e. when the document is searchable, and raises if it
+    does not in time.
     Returns: number of chunks processed.
     """
 
     logger.info(f"Processing PDF: {filename} for user: {user_id}")
 
-    # extract text
-    reader = PyPDF2.PdfReader(file_path)
-    text = "\n".join([p.extract_text() or "" for p in reader.pages])
+    chunks = (chunker or default_chunker())(extract_pages(file_path))
 
-    logger.info(f"[process_pdf] Extracted {len(text.split())} words")
+    total, added, spooled = 0, 0, []
+    while batch := list(islice(chunks, settings.CHUNK_EMBED_BATCH)):
+        # Batch ids are stable across retries, so a re-processed batch is not indexed twice
+        batch_id = f"{doc_id}-{total}"
+        total += len(batch)
+        count, path = _index_chunks(batch, user_id, doc_id, filename, batch_id)
+        added += count
+        if path:
+            spooled.append(path)
+    if not index_spool.wait_applied(spooled, settings.INDEX_SPOOL_WAIT_TIMEOUT):
+        # Retried (see app.kafka_events.retry); batch ids make re-spooling the applied ones harmless
+        raise RuntimeError(f"Index writer did not apply the batches of {doc_id} "
+                           f"within {settings.INDEX_SPOOL_WAIT_TIMEOUT}s")
 
-    # create chunks + embeddings
-    chunks = chunk_text(text)
-    logger.info(f"[process_pdf] Created {len(chunks)} chunks")
-
-    embeddings = []
-    for i, c in enumerate(chunks):
-        try:
-            emb = embedding_service.create_embedding(c)
-            embeddings.append(emb)
-        except Exception as e:
-            logger.error(f"[process_pdf] Embedding failed on chunk {i}: {e}")
-
-    metadata = [{"user_id": user_id, "chunk": c, "doc_id": doc_id, "filename": filename} for c in chunks]
-
-    # store in FAISS
-    if embeddings:
-        faiss_store.add(embeddings, metadata)
-        logger.info(f"[process_pdf] Added {len(embeddings)} vectors to FAISS")
+    logger.info(f"[process_pdf] Created {total} chunks")
+    logger.info(f"[process_pdf] Embedding cache: {embedding_service.embedding_cache.stats()}")
+    if added:
+        logger.info(f"[process_pdf] Added {added} vectors to FAISS")
     else:
         logger.warning(f"[process_pdf] No embeddings to add to FAISS")
-    
 
     # update Mongo with chunk count
     documents_collection.update_one(
         {"_id": doc_id},
-        {"$set": {"chunks_count": len(chunks)}}
+        {"$set": {"chunks_count": total}}
     )
 
-    return len(chunks)
+    return total
+
+
+def _index_chunks(chunks: list[dict], user_id: str, doc_id: str, filename: str, batch_id: str):
+    """
+    Embed one batch of chunks and add it to FAISS, through the spool unless
+    INDEX_WRITES is "direct". Returns (vectors added, spooled batch path or None).
+    """
+    texts = [c["text"] for c in chunks]
+
+    embeddings = embedding_service.create_embeddings(texts)
+    failed = sum(emb is None for emb in embeddings)
+    if failed:
+        # Raised rather than indexing the document without them, so it is retried
+        # (see app.kafka_events.retry); batches already spooled are skipped then
+        raise RuntimeError(f"Could not embed {failed} of {len(texts)} chunks of {doc_id} (batch {batch_id})")
+    embedded = list(zip(chunks, embeddings))
+    if not embedded:
+        return 0, None
+
+    metadata = [
+        {"user_id": user_id, "chunk": c["text"], "doc_id": doc_id, "filename": filename,
+         "page_start": c["page_start"], "page_end": c["page_end"]}
+        for c, _ in embedded
+    ]
+    vectors = [emb for _, emb in embedded]
+    if settings.INDEX_WRITES == "direct":
+        index_store.add(vectors, metadata, batch_id=batch_id)
+        return len(embedded), None
+    return len(embedded), index_spool.submit(vectors, metadata, batch_id=batch_id)
 
 
 def chunk_text(text: str, max_words=200) -> list[str]:
     """Split text into shorter chunks."""
-    words = text.split()
-    return [" ".join(words[i:i + max_words]) for i in range(0, len(words), max_words)]
+    return [c["text"] for c in WordChunker(max_words)([(0, text)])]
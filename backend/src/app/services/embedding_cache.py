@@ -0,0 +1,138 @@
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+import numpy as np
+from app.core.config import settings
+from app.core.logging import logger
+from app.db.redis import async_redis_binary_client, redis_binary_client
+
+KEY_PREFIX = "emb:"
+
+
+def normalize_text(text: str) -> str:
+    """Canonical form used for cache keys: NFC, whitespace runs collapsed, trimmed."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def cache_key(model: str, text: str) -> str:
+    digest = hashlib.sha256(f"{model}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+    return f"{KEY_PREFIX}{model}:{digest}"
+
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding cache: a per-process LRU in front of Redis.
+    Vectors are stored as little-endian float32 bytes. Redis errors are logged and
+    treated as misses, so the cache can never fail an embedding request.
+    The *_async methods use the asyncio Redis client and share the local tier.
+    """
+
+    def __init__(self, redis_client, local_size: int, ttl: int, async_redis_client=None):
+        self.redis = redis_client
+        self.async_redis = async_redis_client
+        self.local_size = local_size
+        self.ttl = ttl
+        self._local: OrderedDict[str, bytes] = OrderedDict()
+        self._lock = threading.Lock()
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    def _local_get(self, key: str) -> bytes | None:
+        with self._lock:
+            value = self._local.get(key)
+            if value is not None:
+                self._local.move_to_end(key)
+            return value
+
+    def _local_put(self, key: str, value: bytes):
+        with self._lock:
+            self._local[key] = value
+            self._local.move_to_end(key)
+            while len(self._local) > self.local_size:
+                self._local.popitem(last=False)
+
+    def _lookup_local(self, keys: list[str]) -> tuple[list[bytes | None], list[int]]:
+        found: list[bytes | None] = [self._local_get(k) for k in keys]
+        self.local_hits += sum(v is not None for v in found)
+        return found, [i for i, v in enumerate(found) if v is None]
+
+    def _merge_remote(self, keys: list[str], found: list, missing: list[int], values: list) -> list[list[float] | None]:
+        for i, value in zip(missing, values):
+            if value is not None:
+                found[i] = value
+                self._local_put(keys[i], value)
+                self.redis_hits += 1
+            else:
+                self.misses += 1
+        return [np.frombuffer(v, dtype="<f4").tolist() if v is not None else None for v in found]
+
+    def _encode(self, items: list[tuple[str, list[float]]]) -> list[tuple[str, bytes]]:
+        encoded = [(key, np.asarray(emb, dtype="<f4").tobytes()) for key, emb in items]
+        for key, value in encoded:
+            self._local_put(key, value)
+        return encoded
+
+    def get_many(self, keys: list[str]) -> list[list[float] | None]:
+        """Look keys up locally, then fetch the rest from Redis in one MGET."""
+        found, missing = self._lookup_local(keys)
+        values = [None] * len(missing)
+        if missing:
+            try:
+                values = self.redis.mget([keys[i] for i in missing])
+            except Exception as e:
+                logger.warning(f"[embedding_cache] Redis lookup failed: {e}")
+        return self._merge_remote(keys, found, missing, values)
+
+    async def get_many_async(self, keys: list[str]) -> list[list[float] | None]:
+        """get_many() over the asyncio Redis client, for the API request path."""
+        found, missing = self._lookup_local(keys)
+        values = [None] * len(missing)
+        if missing:
+            try:
+                values = await self.async_redis.mget([keys[i] for i in missing])
+            except Exception as e:
+                logger.warning(f"[embedding_cache] Redis lookup failed: {e}")
+        return self._merge_remote(keys, found, missing, values)
+
+    def put_many(self, items: list[tuple[str, list[float]]]):
+        """Store embeddings in both tiers (one pipelined round-trip to Redis)."""
+        if not items:
+            return
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for key, value in self._encode(items):
+                pipe.set(key, value, ex=self.ttl)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"[embedding_cache] Redis store failed: {e}")
+
+    async def put_many_async(self, items: list[tuple[str, list[float]]]):
+        """put_many() over the asyncio Redis client, for the API request path."""
+        if not items:
+            return
+        try:
+            pipe = self.async_redis.pipeline(transaction=False)
+            for key, value in self._encode(items):
+                pipe.set(key, value, ex=self.ttl)
+            await pipe.execute()
+        except Exception as e:
+            logger.warning(f"[embedding_cache] Redis store failed: {e}")
+
+    def stats(self) -> dict:
+        lookups = self.local_hits + self.redis_hits + self.misses
+        return {
+            "local_hits": self.local_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "hit_rate": (self.local_hits + self.redis_hits) / lookups if lookups else 0.0,
+        }
+
+
+embedding_cache = EmbeddingCache(
+    redis_binary_client,
+    local_size=settings.EMBEDDING_CACHE_LOCAL_SIZE,
+    ttl=settings.EMBEDDING_CACHE_TTL,
+    async_redis_client=async_redis_binary_client,
+)
@@ -1,23 +1,220 @@
-from openai import OpenAI
+import random
+import time
+from collections.abc import AsyncIterator
+from concurrent.futures import ThreadPoolExecutor
 from app.core.config import settings
+from app.core.logging import logger
+from app.services.embedding_cache import cache_key, embedding_cache
+from app.utils.token_bucket import TokenBucket
+from app.utils.tokens import estimate_tokens
 
 
-client = OpenAI(api_key=settings.OPENAI_API_KEY)
+EMBEDDING_MODEL = "text-embedding-ada-002"
+
+# Request packing limits for create_embeddings (the API allows 2048 inputs per request)
+EMBEDDING_BATCH_MAX_INPUTS = 256
+EMBEDDING_BATCH_MAX_TOKENS = 100_000
+
+# Exponential backoff on 429 responses: base * 2**attempt seconds (plus jitter), capped
+EMBEDDING_MAX_RETRIES = 5
+EMBEDDING_BACKOFF_BASE = 0.5
+EMBEDDING_BACKOFF_MAX = 20.0
+
+# OpenAI clients, created on first use: importing openai alone takes a few hundred
+# ms, which would otherwise be paid by every process importing this module
+client = None
+# Used by the API request path so LLM round-trips never block the event loop
+async_client = None
+
+
+def get_client():
+    """Singleton OpenAI client."""
+    global client
+    if client is None:
+        from openai import OpenAI
+        client = OpenAI(api_key=settings.OPENAI_API_KEY, base_url=settings.OPENAI_BASE_URL)
+    return client
+
+
+def get_async_client():
+    """Singleton AsyncOpenAI client."""
+    global async_client
+    if async_client is None:
+        from openai import AsyncOpenAI
+        async_client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY, base_url=settings.OPENAI_BASE_URL)
+    return async_client
+
+# Shared by every create_embeddings call in the process, so concurrent documents
+# together stay under the provider's per-minute limits
+request_bucket = TokenBucket(settings.OPENAI_EMBEDDING_RPM)
+token_bucket = TokenBucket(settings.OPENAI_EMBEDDING_TPM)
 
 
 def create_embedding(text: str):
-    """Create an embedding for the given text using OpenAI's API."""
-    response = client.embeddings.create(
+    """Create an embedding for the given text using OpenAI's API (or the embedding cache)."""
+    key = cache_key(EMBEDDING_MODEL, text)
+    cached = embedding_cache.get_many([key])[0]
+    if cached is not None:
+        return cached
+
+    response = get_client().embeddings.create(
+        input=text,
+        model=EMBEDDING_MODEL
+    )
+    embedding = response.data[0].embedding
+    embedding_cache.put_many([(key, embedding)])
+    return embedding
+
+
+async def create_embedding_async(text: str):
+    """create_embedding() for async callers: asyncio OpenAI and Redis clients."""
+    key = cache_key(EMBEDDING_MODEL, text)
+    cached = (await embedding_cache.get_many_async([key]))[0]
+    if cached is not None:
+        return cached
+
+    response = await get_async_client().embeddings.create(
         input=text,
-        model="text-embedding-ada-002"
+        model=EMBEDDING_MODEL
     )
-    return response.data[0].embedding
+    embedding = response.data[0].embedding
+    await embedding_cache.put_many_async([(key, embedding)])
+    return embedding
+
+
+def pack_batches(texts: list[str], max_inputs: int = EMBEDDING_BATCH_MAX_INPUTS,
+                 max_tokens: int = EMBEDDING_BATCH_MAX_TOKENS) -> list[list[int]]:
+    """Group text indices into consecutive batches within the input-count and token budgets."""
+    batches, current, current_tokens = [], [], 0
+    for i, text in enumerate(texts):
+        tokens = estimate_tokens(text)
+        if current and (len(current) >= max_inputs or current_tokens + tokens > max_tokens):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(i)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _embed_batch(texts: list[str]) -> list[list[float]]:
+    """
+    Embed one batch, paced by the shared RPM/TPM buckets. 429s are retried with
+    exponential backoff here (the client's own retries are disabled for this call).
+    """
+    from openai import RateLimitError
+
+    tokens = sum(estimate_tokens(t) for t in texts)
+    for attempt in range(EMBEDDING_MAX_RETRIES + 1):
+        request_bucket.acquire()
+        token_bucket.acquire(tokens)
+        try:
+            response = get_client().with_options(max_retries=0).embeddings.create(input=texts, model=EMBEDDING_MODEL)
+            # The API returns one item per input, tagged with its position
+            return [item.embedding for item in sorted(response.data, key=lambda d: d.index)]
+        except RateLimitError as e:
+            if attempt == EMBEDDING_MAX_RETRIES:
+                raise
+            delay = min(EMBEDDING_BACKOFF_MAX, EMBEDDING_BACKOFF_BASE * 2 ** attempt)
+            retry_after = e.response.headers.get("retry-after")
+            if retry_after:
+                try:
+                    delay = max(delay, float(retry_after))
+                except ValueError:
+                    pass
+            delay *= 1 + random.random() * 0.1
+            logger.warning(f"[embedding_service] Rate limited, retrying batch of {len(texts)} in {delay:.2f}s")
+            time.sleep(delay)
+
+
+def _embed_batch_or_singles(texts: list[str]) -> list[list[float] | None]:
+    """Embed a batch; if it fails, retry its texts one by one (None where that fails too)."""
+    try:
+        return _embed_batch(texts)
+    except Exception as e:
+        logger.warning(f"[embedding_service] Batch of {len(texts)} failed, retrying individually: {e}")
+
+    embeddings = []
+    for text in texts:
+        try:
+            embeddings.append(_embed_batch([text])[0])
+        except Exception as e:
+            logger.error(f"[embedding_service] Embedding failed on a single text: {e}")
+            embeddings.append(None)
+    return embeddings
+
+
+def create_embeddings(texts: list[str], max_concurrency: int | None = None) -> list[list[float] | None]:
+    """
+    Create embeddings for many texts with as few API requests as possible.
+    Texts already in the embedding cache (or repeated within texts) are not sent.
+    Batches are sent concurrently (at most max_concurrency in flight, default
+    settings.OPENAI_EMBEDDING_CONCURRENCY). The result always lines up with the
+    input; texts whose embedding failed even when retried alone get None.
+    """
+    keys = [cache_key(EMBEDDING_MODEL, t) for t in texts]
+    embeddings = embedding_cache.get_many(keys)
+
+    # One request slot per distinct missing text
+    to_embed: dict[str, int] = {}
+    for i, emb in enumerate(embeddings):
+        if emb is None:
+            to_embed.setdefault(keys[i], i)
+    if not to_embed:
+        return embeddings
+
+    fresh = _embed_uncached([texts[i] for i in to_embed.values()], max_concurrency)
+    embedding_cache.put_many([(key, emb) for key, emb in zip(to_embed, fresh) if emb is not None])
+
+    by_key = dict(zip(to_embed, fresh))
+    return [emb if emb is not None else by_key[key] for key, emb in zip(keys, embeddings)]
+
+
+def _embed_uncached(texts: list[str], max_concurrency: int | None) -> list[list[float] | None]:
+    batches = pack_batches(texts, EMBEDDING_BATCH_MAX_INPUTS, EMBEDDING_BATCH_MAX_TOKENS)
+    workers = min(max_concurrency or settings.OPENAI_EMBEDDING_CONCURRENCY, len(batches))
+    if workers <= 1:
+        results = [_embed_batch_or_singles([texts[i] for i in b]) for b in batches]
+    else:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="embed") as pool:
+            results = list(pool.map(_embed_batch_or_singles, [[texts[i] for i in b] for b in batches]))
+
+    embeddings: list[list[float] | None] = [None] * len(texts)
+    for batch, batch_embeddings in zip(batches, results):
+        for i, emb in zip(batch, batch_embeddings):
+            embeddings[i] = emb
+    return embeddings
+
+
+CHAT_MODEL = "gpt-4o-mini"
 
 
 def ask_openai(prompt: str) -> str:
     """Send a request to OpenAI and receive a response."""
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
+    response = get_client().chat.completions.create(
+        model=CHAT_MODEL,
+        messages=[{"role": "user", "content": prompt}]
+    )
+    return response.choices[0].message.content
+
+
+async def ask_openai_async(prompt: str) -> str:
+    """ask_openai() on the asyncio client."""
+    response = await get_async_client().chat.completions.create(
+        model=CHAT_MODEL,
         messages=[{"role": "user", "content": prompt}]
     )
     return response.choices[0].message.content
+
+
+async def ask_openai_stream(prompt: str) -> AsyncIterator[str]:
+    """Send a request to OpenAI and yield the response text as it is generated."""
+    stream = await get_async_client().chat.completions.create(
+        model=CHAT_MODEL,
+        messages=[{"role": "user", "content": prompt}],
+        stream=True,
+    )
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
@@ -0,0 +1,178 @@
+"""
+Streaming PDF text extraction.
+
+extract_pages() yields (page_number, text) one page at a time, ready for a chunker.
+PDFs are split into page ranges that a process pool extracts in parallel; at most
+two ranges per worker are in flight, so memory stays bounded and pages still come
+out in order. A page whose extraction fails or runs past PDF_PAGE_TIMEOUT is
+skipped (yielded as empty text) instead of failing the whole document.
+
+Extraction always runs in the pool, never on the caller's thread: a worker's main
+thread can time a page out with SIGALRM, and a page stuck where the alarm cannot
+interrupt it (or that crashes the worker) is cut short by killing the pool, which
+a thread could not be.
+"""
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from collections import deque
+from collections.abc import Iterator
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+import PyPDF2
+from app.core.config import settings
+from app.core.logging import logger
+
+# Start method of the pool: spawn, not fork, as the consumer process runs Kafka and OpenMP threads
+MP_CONTEXT = "spawn"
+
+# Slack on top of the page timeouts of a range before the pool is presumed stuck
+# (covers starting the workers, and a range queued right behind another one)
+POOL_GRACE = 5.0
+
+_executor: ProcessPoolExecutor | None = None
+_executor_workers = 0
+_executor_lock = threading.Lock()
+
+# The PdfReader a worker process last opened, reused across its page ranges
+_reader: tuple[str, PyPDF2.PdfReader] | None = None
+
+
+class PageTimeout(Exception):
+    pass
+
+
+def _raise_timeout(signum, frame):
+    raise PageTimeout()
+
+
+def _page_text(reader: PyPDF2.PdfReader, index: int, timeout: float) -> str | None:
+    """
+    The text of page index, or None if extraction fails or takes longer than timeout
+    seconds. Runs on a pool worker's main thread, where the timeout is a SIGALRM.
+    """
+    if timeout > 0:
+        previous = signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return reader.pages[index].extract_text() or ""
+    except PageTimeout:
+        logger.warning(f"[pdf_extraction] Page {index + 1} took over {timeout}s, skipped")
+    except Exception as e:
+        logger.warning(f"[pdf_extraction] Page {index + 1} could not be extracted, skipped: {e}")
+    finally:
+        if timeout > 0:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+    return None
+
+
+def _extract_range(file_path: str, start: int, stop: int, timeout: float) -> list[str | None]:
+    """Pool task: the texts of pages [start, stop)."""
+    global _reader
+    if _reader is None or _reader[0] != file_path:
+        _reader = (file_path, PyPDF2.PdfReader(file_path))
+    return [_page_text(_reader[1], i, timeout) for i in range(start, stop)]
+
+
+def _pool(workers: int) -> ProcessPoolExecutor:
+    """The shared extraction pool, started on first use."""
+    global _executor, _executor_workers
+    with _executor_lock:
+        if _executor is None or _executor_workers != workers:
+            if _executor is not None:
+                _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(MP_CONTEXT))
+            _executor_workers = workers
+        return _executor
+
+
+def _discard_pool(pool: ProcessPoolExecutor):
+    """Kill pool's workers (a stuck page never returns) and have the next _pool() start a new one."""
+    global _executor
+    with _executor_lock:
+        if _executor is not pool:
+            return  # already replaced, e.g. by another document's extraction
+        _executor = None
+    for process in list((pool._processes or {}).values()):
+        process.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def extract_pages(file_path: str, workers: int | None = None, pages_per_task: int | None = None,
+                  page_timeout: float | None = None) -> Iterator[tuple[int, str]]:
+    """
+    Yield (page_number, text) for every page of a PDF, page numbers starting at 1.
+    Arguments default to the PDF_* settings.
+    """
+    workers = settings.PDF_EXTRACT_WORKERS if workers is None else workers
+    workers = workers or os.cpu_count() or 1
+    pages_per_task = pages_per_task or settings.PDF_PAGES_PER_TASK
+    page_timeout = settings.PDF_PAGE_TIMEOUT if page_timeout is None else page_timeout
+
+    started = time.perf_counter()
+    count = len(PyPDF2.PdfReader(file_path).pages)
+    skipped = 0
+
+    for number, text in enumerate(_extract_parallel(file_path, count, workers, pages_per_task, page_timeout), start=1):
+        skipped += text is None
+        yield number, text or ""
+
+    logger.info(f"[pdf_extraction] Extracted {count} pages ({skipped} skipped) from {file_path} "
+                f"in {time.perf_counter() - started:.1f}s")
+
+
+def _result(future, budget: float | None):
+    """future's result, waiting at most budget seconds once it is running (the pool is shared)."""
+    while not future.running() and not future.done():
+        wait([future], timeout=0.05, return_when=FIRST_COMPLETED)
+    return future.result(timeout=budget)
+
+
+def _extract_parallel(file_path: str, count: int, workers: int, pages_per_task: int, timeout: float):
+    """
+    Page texts in order, extracted by the pool. When a range times out or its worker
+    dies, the pool is replaced and the range is retried one page per task, so only
+    the page at fault is skipped.
+    """
+    ranges = deque((start, min(start + pages_per_task, count)) for start in range(0, count, pages_per_task))
+    pending = deque()  # (start, stop, future), in page order
+    pool = _pool(workers)
+
+    def submit():
+        while ranges and len(pending) < 2 * workers:
+            start, stop = ranges.popleft()
+            pending.append((start, stop, pool.submit(_extract_range, file_path, start, stop, timeout)))
+
+    try:
+        submit()
+        while pending:
+            start, stop, future = pending[0]
+            budget = 2 * timeout * (stop - start) + POOL_GRACE if timeout > 0 else None
+            try:
+                texts = _result(future, budget)
+            except (TimeoutError, BrokenProcessPool) as e:
+                replaced = _executor is not pool  # another extraction's failure, not this range's
+                _discard_pool(pool)
+                pool = _pool(workers)
+                # Everything in flight died with the pool: run it again
+                ranges.extendleft(reversed([(begin, end) for begin, end, _ in pending]))
+                pending.clear()
+                if not replaced:
+                    ranges.popleft()
+                    if stop - start > 1:
+                        ranges.extendleft(reversed([(i, i + 1) for i in range(start, stop)]))
+                    else:
+                        reason = "timed out" if isinstance(e, TimeoutError) else "crashed its worker"
+                        logger.warning(f"[pdf_extraction] Page {start + 1} {reason}, skipped")
+                        yield None
+                submit()
+                continue
+            pending.popleft()
+            submit()
+            yield from texts
+    finally:
+        for _, _, future in pending:
+            future.cancel()
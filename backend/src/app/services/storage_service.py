@@ -37,6 +37,15 @@ def unlink_file(doc_id: str) -> None:
         {"$unset": {"file_id": "", "file_stored": ""}}
     )
 
+def delete_file(doc_id: str) -> None:
+    """
+    Delete the document's file from GridFS (if it was archived) and unlink it.
+    """
+    doc = documents_collection.find_one({"_id": doc_id}, {"file_id": 1})
+    if doc and doc.get("file_id"):
+        fs.delete(ObjectId(doc["file_id"]))
+    unlink_file(doc_id)
+
 
 # ---- IGNORE ---
 
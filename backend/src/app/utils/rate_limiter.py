@@ -1,11 +1,268 @@
-from fastapi import Request, HTTPException
-from app.db.redis import redis_client
+import asyncio
+import time
+from dataclasses import dataclass
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from redis.exceptions import NoScriptError
+from app.core.config import settings
+from app.db.redis import async_redis_client
+from app.core.logging import logger
 from typing import Optional
 
 # --- Configuration ---
 GENERAL_LIMIT_COUNT = 20  # General API limit (e.g., for template views, general endpoints)
 GENERAL_LIMIT_WINDOW = 60 # Time window in seconds (1 minute)
 
+# Liveness / readiness probes (see app.api.health) are never limited
+EXEMPT_PATHS = ("/healthz", "/readyz")
+
+# Each limiter is one Lua script, so a check is a single atomic round-trip (the old
+# INCR + EXPIRE pair could leave a key without a TTL, and took two).
+# KEYS[1]: limiter state (a hash); KEYS[2], optional: a cached value, returned
+# instead of taking from the limit when it exists (see RedisRateLimiter.take_unless_cached).
+# ARGV: limit, window (ms), now (ms), cost (negative to give requests back), and
+# optionally forced: requests already let through (see HybridRateLimiter), counted
+# even when cost is rejected.
+# Returns {allowed (0/1), remaining, retry after (ms), cached value or false}.
+
+# Sliding window, approximated from two fixed windows: the previous window's count
+# weighted by how much of it still overlaps the sliding window, plus the current one
+SLIDING_WINDOW_SCRIPT = """
+if KEYS[2] then
+  local cached = redis.call('GET', KEYS[2])
+  if cached then return {1, 0, 0, cached} end
+end
+local limit, window, now, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+local forced = tonumber(ARGV[5]) or 0
+local start = now - now % window
+local state = redis.call('HMGET', KEYS[1], 'start', 'current', 'previous')
+local last, current, previous = tonumber(state[1]), tonumber(state[2]) or 0, tonumber(state[3]) or 0
+if last == nil or last < start - window then
+  current, previous = 0, 0
+elseif last < start then
+  current, previous = 0, current
+end
+local used = previous * (window - (now - start)) / window + current
+local allowed = used + forced + cost <= limit
+if not allowed then
+  if forced == 0 then return {0, 0, window - (now - start), false} end
+  cost = 0
+end
+current = math.max(0, current + forced + cost)
+redis.call('HSET', KEYS[1], 'start', start, 'current', current, 'previous', previous)
+redis.call('PEXPIRE', KEYS[1], 2 * window)
+if not allowed then return {0, 0, window - (now - start), false} end
+return {1, math.floor(limit - used - forced - cost), 0, false}
+"""
+
+# Token bucket: holds up to limit tokens, refilled at limit per window
+TOKEN_BUCKET_SCRIPT = """
+if KEYS[2] then
+  local cached = redis.call('GET', KEYS[2])
+  if cached then return {1, 0, 0, cached} end
+end
+local limit, window, now, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+local forced = tonumber(ARGV[5]) or 0
+local rate = limit / window
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'at')
+local tokens, at = tonumber(state[1]) or limit, tonumber(state[2]) or now
+tokens = math.min(limit, tokens + math.max(0, now - at) * rate)
+local wanted = cost
+local allowed = tokens >= forced + cost
+if not allowed then
+  if forced == 0 then return {0, 0, math.ceil((cost - tokens) / rate), false} end
+  cost = 0
+end
+tokens = math.min(limit, tokens - forced - cost)
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'at', now)
+redis.call('PEXPIRE', KEYS[1], window)
+if not allowed then return {0, 0, math.ceil((wanted - tokens) / rate), false} end
+return {1, math.floor(tokens), 0, false}
+"""
+
+SCRIPTS = {"sliding_window": SLIDING_WINDOW_SCRIPT, "token_bucket": TOKEN_BUCKET_SCRIPT}
+
+
+class RedisRateLimiter:
+    """
+    Allows `limit` requests per `window` seconds per key, across every worker
+    sharing the Redis instance. Each check runs one server-side script: atomic, and
+    a single round-trip (take_unless_cached folds a cache lookup into it too).
+    Rejected requests do not count against the limit. The state of key lives under
+    "{key}:{algorithm}", so it never collides with the old INCR counters or with
+    the other algorithm's state.
+    """
+
+    def __init__(self, redis_client, limit: int, window: int, algorithm: str = "sliding_window", clock=time.time):
+        if algorithm not in SCRIPTS:
+            raise ValueError(f"Unknown rate limit algorithm {algorithm!r}, expected one of {', '.join(SCRIPTS)}")
+        self.redis = redis_client
+        self.algorithm = algorithm
+        self.limit = limit
+        self.window = window
+        self.clock = clock
+        self.script = redis_client.register_script(SCRIPTS[algorithm])
+
+    def _args(self, cost: int, forced: int = 0) -> list:
+        return [self.limit, self.window * 1000, int(self.clock() * 1000), cost, forced]
+
+    async def take(self, key: str, cost: int = 1) -> tuple[bool, int, float]:
+        """Count a request against key; returns (allowed, remaining, seconds until allowed)."""
+        allowed, remaining, retry_ms, _ = await self._run([key], cost)
+        return bool(allowed), remaining, retry_ms / 1000
+
+    async def take_unless_cached(self, key: str, cached_key: str, cost: int = 1):
+        """
+        The value of cached_key if it exists, without counting a request; otherwise
+        take(key). One round-trip for the cache lookup and the limit check.
+        Returns (cached value or None, allowed, seconds until allowed).
+        """
+        allowed, _, retry_ms, cached = await self._run([key, cached_key], cost)
+        return cached or None, bool(allowed), retry_ms / 1000
+
+    async def give_back(self, key: str, cost: int = 1):
+        """Return a request taken from key that turned out not to be needed."""
+        await self._run([key], -cost)
+
+    async def count(self, admitted: dict[str, int], cost: int = 0) -> dict[str, tuple[bool, int, float]]:
+        """
+        Count requests already let through elsewhere ({key: number}, all in one
+        pipeline), and take cost from each key if still within the limit.
+        Returns {key: (allowed, remaining, seconds until allowed)}.
+        """
+        keys = list(admitted)
+        for attempt in range(2):
+            pipe = self.redis.pipeline(transaction=False)
+            for key in keys:
+                pipe.evalsha(self.script.sha, 1, f"{key}:{self.algorithm}", *self._args(cost, admitted[key]))
+            try:
+                results = await pipe.execute()
+                break
+            except NoScriptError:
+                if attempt:
+                    raise
+                await self.redis.script_load(self.script.script)
+        return {key: (bool(allowed), remaining, retry_ms / 1000)
+                for key, (allowed, remaining, retry_ms, _) in zip(keys, results)}
+
+    async def _run(self, keys: list[str], cost: int):
+        keys = [f"{keys[0]}:{self.algorithm}", *keys[1:]]
+        # EVALSHA, and the script text only the first time a server sees it
+        try:
+            return await self.redis.evalsha(self.script.sha, len(keys), *keys, *self._args(cost))
+        except NoScriptError:
+            return await self.script(keys=keys, args=self._args(cost))
+
+
+@dataclass
+class _LocalCount:
+    used: float = 0  # requests counted in Redis as of the last sync
+    pending: int = 0  # requests let through here since, not yet in Redis
+    blocked_until: float = 0.0  # rejected by Redis until then
+    synced: float = 0.0
+
+
+class HybridRateLimiter:
+    """
+    RedisRateLimiter answered from memory: each worker lets requests through
+    against its last known count of the key, and adds what it let through to Redis
+    in one pipeline every sync_interval seconds. A key only costs a round-trip when
+    it is rejected locally, or once max_error requests are waiting to be synced, so
+    the overall count can exceed the limit by at most max_error per worker.
+    Rejections are cached until Redis says the key may retry.
+
+    For limits that must hold exactly (e.g. the LLM limit), use RedisRateLimiter.
+    """
+
+    def __init__(self, limiter: RedisRateLimiter, sync_interval: float = 0.25, max_error: int = 5):
+        self.limiter = limiter
+        self.limit = limiter.limit
+        self.sync_interval = sync_interval
+        self.max_error = max(1, max_error)
+        self._counts: dict[str, _LocalCount] = {}
+        self._syncer: asyncio.Task | None = None
+
+    async def take(self, key: str, cost: int = 1) -> tuple[bool, int, float]:
+        """As RedisRateLimiter.take, without I/O for most requests."""
+        self._ensure_syncing()
+        now = self.limiter.clock()
+        count = self._counts.setdefault(key, _LocalCount(synced=now))
+        if count.blocked_until > now:
+            return False, 0, count.blocked_until - now
+        if count.used + count.pending + cost <= self.limit and count.pending + cost <= self.max_error:
+            count.pending += cost
+            return True, int(self.limit - count.used - count.pending), 0.0
+
+        # Over the local view or the error bound: ask Redis, syncing this key's requests
+        admitted = self._send(count)
+        try:
+            allowed, remaining, retry_after = (await self.limiter.count({key: admitted}, cost))[key]
+        except Exception:
+            self._unsent(count, admitted)
+            raise
+        self._synced(count, allowed, remaining, retry_after)
+        return allowed, remaining, retry_after
+
+    async def flush(self):
+        """Add every key's pending requests to Redis (one pipeline), and refresh their counts."""
+        now = self.limiter.clock()
+        # Forget keys idle for a window, so the map stays as small as the active set
+        for key in [k for k, c in self._counts.items() if not c.pending and now - c.synced > self.limiter.window]:
+            del self._counts[key]
+        counts = {key: count for key, count in self._counts.items() if count.pending}
+        if not counts:
+            return
+        admitted = {key: self._send(count) for key, count in counts.items()}
+        try:
+            results = await self.limiter.count(admitted)
+        except Exception:
+            for key, count in counts.items():
+                self._unsent(count, admitted[key])
+            raise
+        for key, (allowed, remaining, retry_after) in results.items():
+            self._synced(counts[key], allowed, remaining, retry_after)
+
+    def _send(self, count: _LocalCount) -> int:
+        """Move count's pending requests to the Redis count (so concurrent syncs do not send them twice)."""
+        admitted, count.pending = count.pending, 0
+        count.used += admitted
+        count.synced = self.limiter.clock()
+        return admitted
+
+    @staticmethod
+    def _unsent(count: _LocalCount, admitted: int):
+        count.pending += admitted
+        count.used -= admitted
+
+    def _synced(self, count: _LocalCount, allowed: bool, remaining: int, retry_after: float):
+        count.used = self.limit - remaining if allowed else self.limit
+        count.synced = self.limiter.clock()
+        count.blocked_until = count.synced + retry_after if not allowed else 0.0
+
+    def _ensure_syncing(self):
+        loop = asyncio.get_running_loop()
+        if self._syncer is None or self._syncer.done() or self._syncer.get_loop() is not loop:
+            self._syncer = loop.create_task(self._sync_forever())
+
+    async def _sync_forever(self):
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                # Pending requests stay pending and are retried next time
+                logger.warning(f"[rate_limiter] Sync with Redis failed: {e}")
+
+
+general_limiter = RedisRateLimiter(async_redis_client, GENERAL_LIMIT_COUNT, GENERAL_LIMIT_WINDOW,
+                                   settings.RATE_LIMIT_ALGORITHM)
+if settings.RATE_LIMIT_MODE == "hybrid":
+    general_limiter = HybridRateLimiter(general_limiter, settings.RATE_LIMIT_SYNC_INTERVAL,
+                                        settings.RATE_LIMIT_MAX_ERROR)
+elif settings.RATE_LIMIT_MODE != "strict":
+    raise ValueError(f"Unknown RATE_LIMIT_MODE {settings.RATE_LIMIT_MODE!r}, expected hybrid or strict")
+
+
 def get_rate_limit_key(request: Request) -> Optional[str]:
     """
     Determines the unique key for rate limiting, prioritizing user ID.
@@ -15,11 +272,11 @@ def get_rate_limit_key(request: Request) -> Optional[str]:
     user = getattr(request.state, "user", None)
     if user and user.get("_id"):
         return f"ratelimit:user:{user['_id']}"
-    
+
     # 2. Fallback to IP address for unauthenticated requests
     if request.client:
         return f"ratelimit:ip:{request.client.host}"
-    
+
     return None
 
 
@@ -27,22 +284,23 @@ async def rate_limiter(request: Request, call_next):
     """
     Enforces a general rate limit based on user ID (if authenticated) or IP (if anonymous).
     """
+    if request.url.path in EXEMPT_PATHS:
+        return await call_next(request)
+
     key = get_rate_limit_key(request)
 
     # If key cannot be determined (very rare), allow request but log warning
     if not key:
         return await call_next(request)
 
-    count = redis_client.incr(key)
-    
-    # Set expiration only on the first increment (start of the window)
-    if count == 1:
-        # Use SETEX or check TTL for better safety, but incr/expire pattern works for simplicity
-        redis_client.expire(key, GENERAL_LIMIT_WINDOW)
-
-    if count > GENERAL_LIMIT_COUNT:
-        # 429: Too Many Requests
-        raise HTTPException(status_code=429, detail="General API rate limit exceeded. Try again in 60 seconds.")
+    allowed, _, retry_after = await general_limiter.take(key)
+    if not allowed:
+        # 429: Too Many Requests (a response, as exceptions raised in middleware are not handled)
+        return JSONResponse(
+            status_code=429,
+            content={"detail": "General API rate limit exceeded. Try again later."},
+            headers={"Retry-After": str(max(1, round(retry_after)))},
+        )
 
     response = await call_next(request)
     return response
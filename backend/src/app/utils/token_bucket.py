@@ -0,0 +1,38 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: refills at rate_per_minute, holds at most capacity
+    tokens (defaults to one minute's worth).
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: float | None = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, amount: float = 1) -> float:
+        """Take amount tokens if available and return 0, else return the seconds to wait."""
+        with self._lock:
+            self._refill(time.monotonic())
+            # A request larger than the bucket can never fit; let it through once full
+            if self.tokens >= min(amount, self.capacity):
+                self.tokens -= amount
+                return 0.0
+            return (min(amount, self.capacity) - self.tokens) / self.rate
+
+    def acquire(self, amount: float = 1):
+        """Block until amount tokens have been taken."""
+        while True:
+            wait = self.try_acquire(amount)
+            if wait <= 0:
+                return
+            time.sleep(wait)
@@ -0,0 +1,28 @@
+import functools
+from app.core.logging import logger
+
+# Tokenizer of the embedding and chat models
+ENCODING_NAME = "cl100k_base"
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token), good enough for request packing and prompt budgets."""
+    return len(text) // 4 + 1
+
+
+@functools.lru_cache(maxsize=1)
+def _encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(ENCODING_NAME)
+    except Exception as e:  # not installed, or the encoding file cannot be downloaded
+        logger.warning(f"[tokens] tiktoken unavailable ({e}), falling back to estimated token counts")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Model token count of text (estimated when tiktoken is unavailable)."""
+    encoding = _encoding()
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
@@ -0,0 +1,28 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# The app is imported as the top-level "app" package (see docker-compose working_dir)
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+sys.path.insert(0, str(SRC_DIR))
+
+# Settings() is built at import time; give unit tests harmless defaults
+for key, value in {
+    "OPENAI_API_KEY": "test",
+    "MONGO_URI": "mongodb://localhost:27017",
+    "MONGO_DB": "test",
+    "REDIS_HOST": "localhost",
+    "REDIS_PORT": "6379",
+    "SECRET_KEY": "test",
+    "CELERY_BROKER_URL": "redis://localhost:6379/0",
+    "CELERY_RESULT_BACKEND": "redis://localhost:6379/0",
+    "KAFKA_BROKER": "localhost:9092",
+    "KAFKA_TOPIC_DOCUMENT_UPLOADED": "document_uploaded",
+    "KAFKA_TOPIC_DOCUMENT_PROCESSED": "document_processed",
+    "KAFKA_TOPIC_NOTIFICATION_READY": "notification_ready",
+    "UPLOADS_DIR": "/tmp/uploads",
+    # Keep test and benchmark logs out of src/logs
+    "LOG_DIR": os.path.join(tempfile.gettempdir(), "mini-rag-test-logs"),
+}.items():
+    os.environ.setdefault(key, value)
@@ -0,0 +1,108 @@
+"""
+An in-memory stand-in for a Kafka broker, for tests: partitioned topics, consumer
+groups with committed offsets, and the KafkaConsumer / KafkaProducer methods the
+app uses (poll, commit, seek, pause/resume, send/flush).
+
+    broker = FakeBroker(partitions=2)
+    broker.send("document_uploaded", {"doc_id": "d1"}, key="d1")
+    consumer = broker.consumer("document_uploaded", group_id="document-processor")
+"""
+import threading
+import time
+import zlib
+from collections import defaultdict, namedtuple
+from kafka.structs import TopicPartition
+
+FakeRecord = namedtuple("FakeRecord", "topic partition offset key value headers")
+
+
+class FakeBroker:
+    def __init__(self, partitions: int = 2):
+        self.partitions = partitions
+        self.lock = threading.Lock()
+        self.logs = defaultdict(lambda: [[] for _ in range(self.partitions)])  # topic -> partition -> records
+        self.committed = {}  # (group_id, TopicPartition) -> next offset
+
+    def send(self, topic: str, value, key=None, headers=None) -> FakeRecord:
+        with self.lock:
+            partition = zlib.crc32(str(key).encode()) % self.partitions if key is not None else 0
+            log = self.logs[topic][partition]
+            record = FakeRecord(topic, partition, len(log), key, value, list(headers or []))
+            log.append(record)
+            return record
+
+    def records(self, topic: str) -> list[FakeRecord]:
+        with self.lock:
+            return [r for log in self.logs[topic] for r in log]
+
+    def committed_offset(self, group_id: str, topic: str, partition: int) -> int:
+        with self.lock:
+            return self.committed.get((group_id, TopicPartition(topic, partition)), 0)
+
+    def consumer(self, topic: str, group_id: str) -> "FakeConsumer":
+        return FakeConsumer(self, topic, group_id)
+
+    def producer(self) -> "FakeProducer":
+        return FakeProducer(self)
+
+
+class FakeConsumer:
+    """Assigned every partition of its topic; starts at the group's committed offsets."""
+
+    def __init__(self, broker: FakeBroker, topic: str, group_id: str):
+        self.broker = broker
+        self.group_id = group_id
+        self._assignment = {TopicPartition(topic, p) for p in range(broker.partitions)}
+        self._positions = {tp: broker.committed_offset(group_id, tp.topic, tp.partition) for tp in self._assignment}
+        self._paused = set()
+        self.pause_count = 0
+
+    def poll(self, timeout_ms: int = 0, max_records: int | None = None) -> dict:
+        batch, remaining = {}, max_records or float("inf")
+        with self.broker.lock:
+            for tp in sorted(self._assignment - self._paused):
+                records = self.broker.logs[tp.topic][tp.partition][self._positions[tp]:]
+                records = records[:int(min(len(records), remaining))]
+                if records:
+                    batch[tp] = records
+                    self._positions[tp] += len(records)
+                    remaining -= len(records)
+        if not batch:
+            time.sleep(min(timeout_ms, 10) / 1000)
+        return batch
+
+    def commit(self, offsets: dict):
+        with self.broker.lock:
+            for tp, meta in offsets.items():
+                self.broker.committed[(self.group_id, tp)] = meta.offset
+
+    def assignment(self) -> set:
+        return set(self._assignment)
+
+    def seek(self, tp, offset: int):
+        with self.broker.lock:
+            self._positions[tp] = offset
+
+    def pause(self, *partitions):
+        self._paused.update(partitions)
+        self.pause_count += 1
+
+    def resume(self, *partitions):
+        self._paused.difference_update(partitions)
+
+    def paused(self) -> set:
+        return set(self._paused)
+
+    def close(self):
+        pass
+
+
+class FakeProducer:
+    def __init__(self, broker: FakeBroker):
+        self.broker = broker
+
+    def send(self, topic: str, value=None, key=None, headers=None):
+        self.broker.send(topic, value, key=key, headers=headers)
+
+    def flush(self):
+        pass
@@ -0,0 +1,160 @@
+"""
+A local stand-in for the OpenAI HTTP API, for tests and benchmarks.
+
+    server = FakeOpenAIServer(latency=0.02).start()
+    client = OpenAI(api_key="test", base_url=server.base_url, max_retries=0)
+    ...
+    server.stop()
+"""
+import base64
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+
+def fake_embedding(text: str, dim: int) -> np.ndarray:
+    """Deterministic pseudo-embedding for text."""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    return np.random.default_rng(seed).random(dim, dtype="float32")
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # Room for benchmark-level concurrency (the default backlog of 5 drops connections)
+    request_queue_size = 128
+
+
+class FakeOpenAIServer:
+    """
+    Serves POST /v1/embeddings and POST /v1/chat/completions (plain or streamed).
+    - latency: seconds slept before answering each request
+    - chat_reply / token_delay: the completion text, streamed word by word with
+      token_delay seconds between words
+    - fail_texts: any request containing one of these inputs gets a 500
+    - rate_limit_first: the first N requests get a 429
+    max_in_flight records the highest number of concurrent requests seen.
+    """
+
+    def __init__(self, dim: int = 1536, latency: float = 0.0, fail_texts=(), rate_limit_first: int = 0,
+                 chat_reply: str = "This is a fake answer.", token_delay: float = 0.0):
+        self.dim = dim
+        self.chat_reply = chat_reply
+        self.token_delay = token_delay
+        self.latency = latency
+        self.fail_texts = set(fail_texts)
+        self.rate_limit_first = rate_limit_first
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._httpd = _Server(("127.0.0.1", 0), self._handler())
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._httpd.server_port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def _enter(self, path: str, body: dict) -> int:
+        """Record a request; returns how many requests came before it."""
+        with self._lock:
+            self.requests.append((path, body))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            return len(self.requests) - 1
+
+    def _exit(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, status: int, payload: dict):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                seq = server._enter(self.path, body)
+                try:
+                    if server.latency:
+                        time.sleep(server.latency)
+                    if seq < server.rate_limit_first:
+                        return self._send_json(429, {"error": {"message": "rate limited", "type": "rate_limit_exceeded"}})
+                    if self.path.endswith("/embeddings"):
+                        return self._embeddings(body)
+                    if self.path.endswith("/chat/completions"):
+                        return self._chat(body)
+                    self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+                finally:
+                    server._exit()
+
+            def _embeddings(self, body: dict):
+                inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+                if server.fail_texts.intersection(inputs):
+                    return self._send_json(500, {"error": {"message": "injected failure", "type": "server_error"}})
+
+                data = []
+                for i, text in enumerate(inputs):
+                    vector = fake_embedding(text, server.dim)
+                    if body.get("encoding_format") == "base64":
+                        embedding = base64.b64encode(vector.astype("<f4").tobytes()).decode("ascii")
+                    else:
+                        embedding = vector.tolist()
+                    data.append({"object": "embedding", "index": i, "embedding": embedding})
+
+                tokens = sum(len(t) // 4 + 1 for t in inputs)
+                self._send_json(200, {
+                    "object": "list",
+                    "data": data,
+                    "model": body.get("model"),
+                    "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+                })
+
+            def _chat(self, body: dict):
+                if not body.get("stream"):
+                    return self._send_json(200, {
+                        "id": "chatcmpl-fake", "object": "chat.completion", "created": 0, "model": body.get("model"),
+                        "choices": [{"index": 0, "finish_reason": "stop",
+                                     "message": {"role": "assistant", "content": server.chat_reply}}],
+                    })
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.end_headers()
+                words = server.chat_reply.split(" ")
+                for i, word in enumerate(words):
+                    if i and server.token_delay:
+                        time.sleep(server.token_delay)
+                    token = word if i == 0 else " " + word
+                    chunk = {
+                        "id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": 0,
+                        "model": body.get("model"),
+                        "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+                    }
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                self.wfile.write(b"data: [DONE]\n\n")
+
+        return Handler
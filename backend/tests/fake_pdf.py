@@ -0,0 +1,63 @@
+"""
+Minimal PDF writer for tests and benchmarks: one page per list of text lines, in
+Helvetica, readable by PyPDF2.
+
+    write_pdf(path, [["First page.", "More text."], ["Second page."]])
+    write_pdf(path, generated_pages(500))
+"""
+import random
+
+WORDS = """
+retrieval document vector index chunk token embedding query answer context model page
+section report invoice contract policy customer order shipment warranty battery sensor
+firmware module network server latency memory storage budget schedule review quarter
+""".split()
+
+
+def _escape(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path, pages):
+    """Write pages (an iterable of lists of text lines) to path as a PDF."""
+    objects = {1: b"<< /Type /Catalog /Pages 2 0 R >>", 3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"}
+    page_ids = []
+    next_id = 4
+    for lines in pages:
+        ops = ["BT", "/F1 10 Tf", "12 TL", "40 800 Td"]
+        ops += [f"({_escape(line)}) Tj T*" for line in lines]
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1")
+        content_id, page_id = next_id, next_id + 1
+        next_id += 2
+        objects[content_id] = b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream)
+        objects[page_id] = (b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id)
+        page_ids.append(page_id)
+    kids = b" ".join(b"%d 0 R" % i for i in page_ids)
+    objects[2] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = {}
+        for obj_id in sorted(objects):
+            offsets[obj_id] = f.tell()
+            f.write(b"%d 0 obj\n%s\nendobj\n" % (obj_id, objects[obj_id]))
+        xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for obj_id in sorted(objects):
+            f.write(b"%010d 00000 n \n" % offsets[obj_id])
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+
+
+def generated_pages(count: int, lines_per_page: int = 50, seed: int = 0):
+    """count pages of pseudo-random sentences, with a paragraph break every few lines."""
+    rng = random.Random(seed)
+    for page in range(count):
+        lines = []
+        for line in range(lines_per_page):
+            if line and line % 12 == 0:
+                lines.append("")
+            words = rng.choices(WORDS, k=rng.randint(6, 14))
+            lines.append(f"{' '.join(words).capitalize()} on page {page + 1}.")
+        yield lines
@@ -0,0 +1,55 @@
+import asyncio
+
+import fakeredis
+import numpy as np
+import pytest
+from app.services.answer_cache import SemanticAnswerCache
+
+
+@pytest.fixture
+def cache():
+    server = fakeredis.FakeServer()
+    return SemanticAnswerCache(
+        fakeredis.FakeRedis(server=server, decode_responses=True),
+        fakeredis.FakeAsyncRedis(server=server, decode_responses=True),
+        fakeredis.FakeAsyncRedis(server=server),
+        threshold=0.95, ttl=60, max_entries=10,
+    )
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def _unit(v):
+    v = np.asarray(v, dtype="float32")
+    return v / np.linalg.norm(v)
+
+
+def test_exact_hit_ignores_case_and_whitespace(cache):
+    run(cache.put("u1", "What is the  deadline?", _unit([1, 0, 0]), "Friday"))
+    assert run(cache.get_exact("u1", "what is the deadline? ")) == "Friday"
+    assert run(cache.get_exact("u2", "what is the deadline?")) is None
+
+
+def test_semantic_hit_above_threshold_only(cache):
+    run(cache.put("u1", "When is the deadline?", _unit([1, 0, 0]), "Friday"))
+
+    assert run(cache.get_similar("u1", _unit([1, 0.1, 0]))) == "Friday"
+    assert run(cache.get_similar("u1", _unit([0, 1, 0]))) is None
+    assert run(cache.get_similar("u2", _unit([1, 0, 0]))) is None
+
+    stats = cache.stats()
+    assert stats["semantic_hits"] == 1 and stats["misses"] == 2
+    assert stats["saved_llm_calls"] == 1
+
+
+def test_invalidate_user_drops_answers_and_questions(cache):
+    run(cache.put("u1", "q1", _unit([1, 0, 0]), "a1"))
+    run(cache.put("u2", "q1", _unit([1, 0, 0]), "a2"))
+
+    cache.invalidate_user("u1")
+
+    assert run(cache.get_exact("u1", "q1")) is None
+    assert run(cache.get_similar("u1", _unit([1, 0, 0]))) is None
+    assert run(cache.get_exact("u2", "q1")) == "a2"
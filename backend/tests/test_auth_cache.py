@@ -0,0 +1,117 @@
+import asyncio
+
+import fakeredis
+import pytest
+from bson import ObjectId
+
+from app.core.security import create_access_token
+from app.services import auth_cache as auth_cache_module
+from app.services.auth_cache import AuthCache
+
+
+class Users:
+    """Stands in for the users collection, counting lookups."""
+
+    def __init__(self):
+        self.records = {}
+        self.lookups = 0
+
+    def add(self, name: str) -> str:
+        user_id = str(ObjectId())
+        self.records[user_id] = {"_id": user_id, "username": name}
+        return user_id
+
+    def __call__(self, user_id):
+        self.lookups += 1
+        return self.records.get(user_id)
+
+
+@pytest.fixture
+def users():
+    return Users()
+
+
+def test_tokens_are_verified_once_until_they_expire(monkeypatch):
+    now = [1_000_000.0]
+    cache = AuthCache(size=10, ttl=3600, clock=lambda: now[0])
+    calls = []
+    monkeypatch.setattr(auth_cache_module, "decode_access_token",
+                        lambda token: calls.append(token) or {"sub": "u1", "exp": now[0] + 60})
+
+    assert cache.decode("token") == cache.decode("token") == {"sub": "u1", "exp": 1_000_060.0}
+    assert len(calls) == 1
+
+    now[0] += 61
+    cache.decode("token")
+    assert len(calls) == 2
+
+
+def test_invalid_tokens_are_not_cached():
+    cache = AuthCache(size=10, ttl=60)
+    assert cache.decode("not-a-jwt") is None
+    assert cache.decode(create_access_token({"sub": "u1"}))["sub"] == "u1"
+
+
+def test_user_records_are_cached_per_token_until_invalidated(users):
+    user_id = users.add("alice")
+    cache = AuthCache(size=10, ttl=60, find_user=users)
+
+    async def scenario():
+        first = await cache.get_user(user_id, "token-a")
+        first["username"] = "changed by a request"
+        assert (await cache.get_user(user_id, "token-a"))["username"] == "alice"
+        assert users.lookups == 1
+
+        await cache.get_user(user_id, "token-b")
+        await cache.invalidate(user_id, "token-a")  # logout of one session
+        await cache.get_user(user_id, "token-a")
+        await cache.get_user(user_id, "token-b")
+        assert users.lookups == 3
+
+        await cache.invalidate(user_id)  # e.g. a profile change
+        await cache.get_user(user_id, "token-b")
+        assert users.lookups == 4
+        assert await cache.get_user(str(ObjectId()), "token-c") is None
+
+    asyncio.run(scenario())
+
+
+def test_records_expire_and_the_cache_is_bounded(users):
+    now = [0.0]
+    ids = [users.add(f"user{i}") for i in range(3)]
+    cache = AuthCache(size=2, ttl=60, find_user=users, clock=lambda: now[0])
+
+    async def scenario():
+        for user_id in ids:
+            await cache.get_user(user_id, "t")
+        await cache.get_user(ids[0], "t")  # evicted by the third
+        now[0] += 61
+        await cache.get_user(ids[0], "t")  # expired
+        return users.lookups
+
+    assert asyncio.run(scenario()) == 5
+
+
+def test_invalidations_reach_the_other_workers(users):
+    user_id = users.add("alice")
+    server = fakeredis.FakeServer()
+    workers = [AuthCache(size=10, ttl=60, find_user=users,
+                         redis_client=fakeredis.FakeAsyncRedis(server=server, decode_responses=True))
+               for _ in range(2)]
+
+    async def scenario():
+        for worker in workers:
+            await worker.get_user(user_id, "t")
+        await asyncio.sleep(0.05)  # both subscribe (which clears what they cached before)
+        for worker in workers:
+            await worker.get_user(user_id, "t")
+        lookups = users.lookups
+
+        await workers[0].invalidate(user_id)
+        await asyncio.sleep(0.05)
+        await workers[1].get_user(user_id, "t")
+        for worker in workers:
+            worker._listener.cancel()
+        return users.lookups - lookups
+
+    assert asyncio.run(scenario()) == 1
@@ -0,0 +1,68 @@
+from app.services.chunking import TokenChunker, WordChunker
+
+
+def _sentences(n, words=8, start=0):
+    return [f"Sentence {i} " + " ".join(["word"] * words) + "." for i in range(start, start + n)]
+
+
+def test_chunks_respect_the_token_limit_and_end_on_sentences():
+    text = " ".join(_sentences(40))
+    chunks = list(TokenChunker(max_tokens=60, overlap_tokens=0)([(1, text)]))
+
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert chunk["tokens"] <= 60
+        assert chunk["text"].startswith("Sentence") and chunk["text"].endswith(".")
+    # Without overlap every sentence lands in exactly one chunk
+    assert " ".join(c["text"] for c in chunks) == text
+
+
+def test_consecutive_chunks_overlap():
+    chunks = list(TokenChunker(max_tokens=60, overlap_tokens=20)([(1, " ".join(_sentences(40)))]))
+
+    for previous, chunk in zip(chunks, chunks[1:]):
+        first_sentence = chunk["text"].split(". ")[0] + "."
+        assert first_sentence in previous["text"]
+        assert chunk["tokens"] <= 60
+
+
+def test_chunks_record_their_pages_and_break_at_paragraphs():
+    pages = [(1, " ".join(_sentences(3))), (2, " ".join(_sentences(3, start=3)) + "\n\nNew paragraph.")]
+    chunks = list(TokenChunker(max_tokens=1000)(pages))
+
+    assert len(chunks) == 1
+    assert (chunks[0]["page_start"], chunks[0]["page_end"]) == (1, 2)
+    assert "Sentence 2 " + " ".join(["word"] * 8) + ".\n\nSentence 3" in chunks[0]["text"]
+    assert chunks[0]["text"].endswith(".\n\nNew paragraph.")
+
+    small = list(TokenChunker(max_tokens=30, overlap_tokens=0)(pages))
+    assert small[0]["page_start"] == 1 and small[-1]["page_end"] == 2
+
+
+def test_overlong_sentence_is_split_by_words():
+    sentence = " ".join(f"w{i}" for i in range(300)) + "."
+    chunks = list(TokenChunker(max_tokens=50, overlap_tokens=0)([(1, sentence)]))
+
+    assert all(c["tokens"] <= 50 for c in chunks)
+    assert " ".join(c["text"] for c in chunks) == sentence
+
+
+def test_pages_are_consumed_lazily():
+    consumed = []
+
+    def pages():
+        for page in range(1, 1001):
+            consumed.append(page)
+            yield page, " ".join(_sentences(5))
+
+    first = next(TokenChunker(max_tokens=100)(pages()))
+    assert first["page_start"] == 1
+    assert len(consumed) < 5
+
+
+def test_word_chunker_matches_the_original_splitter():
+    words = [f"w{i}" for i in range(450)]
+    chunks = list(WordChunker(max_words=200)([(1, " ".join(words[:300])), (2, " ".join(words[300:]))]))
+
+    assert [len(c["text"].split()) for c in chunks] == [200, 200, 50]
+    assert [(c["page_start"], c["page_end"]) for c in chunks] == [(1, 1), (1, 2), (2, 2)]
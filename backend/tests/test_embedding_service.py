@@ -0,0 +1,103 @@
+import fakeredis
+import numpy as np
+import pytest
+from openai import OpenAI
+from app.services import embedding_service
+from app.services.embedding_cache import EmbeddingCache
+from tests.fake_openai import FakeOpenAIServer, fake_embedding
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    cache = EmbeddingCache(fakeredis.FakeRedis(), local_size=100, ttl=60)
+    monkeypatch.setattr(embedding_service, "embedding_cache", cache)
+    return cache
+
+
+@pytest.fixture
+def fake_openai(monkeypatch):
+    server = FakeOpenAIServer(dim=8).start()
+    monkeypatch.setattr(embedding_service, "client", OpenAI(api_key="test", base_url=server.base_url, max_retries=0))
+    yield server
+    server.stop()
+
+
+def test_pack_batches_respects_count_and_token_budgets():
+    texts = ["a" * 40] * 5  # ~11 tokens each
+    assert embedding_service.pack_batches(texts, max_inputs=2, max_tokens=1000) == [[0, 1], [2, 3], [4]]
+    assert embedding_service.pack_batches(texts, max_inputs=10, max_tokens=25) == [[0, 1], [2, 3], [4]]
+
+
+def test_create_embeddings_batches_requests_in_order(fake_openai, monkeypatch):
+    monkeypatch.setattr(embedding_service, "EMBEDDING_BATCH_MAX_INPUTS", 4)
+    texts = [f"chunk {i}" for i in range(10)]
+
+    embeddings = embedding_service.create_embeddings(texts)
+
+    assert len(fake_openai.requests) == 3
+    for text, emb in zip(texts, embeddings):
+        np.testing.assert_allclose(emb, fake_embedding(text, 8), rtol=1e-6)
+
+
+def test_failed_batch_is_retried_individually(monkeypatch):
+    server = FakeOpenAIServer(dim=8, fail_texts={"poison"}).start()
+    monkeypatch.setattr(embedding_service, "client", OpenAI(api_key="test", base_url=server.base_url, max_retries=0))
+    try:
+        embeddings = embedding_service.create_embeddings(["ok 1", "poison", "ok 2"])
+    finally:
+        server.stop()
+
+    assert embeddings[1] is None
+    assert embeddings[0] is not None and embeddings[2] is not None
+    assert len(server.requests) == 4  # 1 batch + 3 single retries
+
+
+def test_concurrent_batches_keep_order_and_bound_in_flight(monkeypatch):
+    server = FakeOpenAIServer(dim=8, latency=0.05).start()
+    monkeypatch.setattr(embedding_service, "client", OpenAI(api_key="test", base_url=server.base_url, max_retries=0))
+    monkeypatch.setattr(embedding_service, "EMBEDDING_BATCH_MAX_INPUTS", 2)
+    texts = [f"chunk {i}" for i in range(20)]
+    try:
+        embeddings = embedding_service.create_embeddings(texts, max_concurrency=3)
+    finally:
+        server.stop()
+
+    assert 1 < server.max_in_flight <= 3
+    for text, emb in zip(texts, embeddings):
+        np.testing.assert_allclose(emb, fake_embedding(text, 8), rtol=1e-6)
+
+
+def test_rate_limited_batch_backs_off_and_succeeds(monkeypatch):
+    server = FakeOpenAIServer(dim=8, rate_limit_first=2).start()
+    monkeypatch.setattr(embedding_service, "client", OpenAI(api_key="test", base_url=server.base_url, max_retries=0))
+    monkeypatch.setattr(embedding_service, "EMBEDDING_BACKOFF_BASE", 0.01)
+    try:
+        embeddings = embedding_service.create_embeddings(["a", "b"])
+    finally:
+        server.stop()
+
+    assert len(server.requests) == 3  # two 429s, then the same batch succeeds
+    assert all(emb is not None for emb in embeddings)
+
+
+def test_cached_and_repeated_texts_are_not_re_embedded(fake_openai, fresh_cache):
+    first = embedding_service.create_embeddings(["intro", "disclaimer", "disclaimer"])
+    assert len(fake_openai.requests) == 1
+    assert fake_openai.requests[0][1]["input"] == ["intro", "disclaimer"]
+    assert first[1] == first[2]
+
+    # Re-upload with whitespace differences: served from cache, query path included
+    again = embedding_service.create_embeddings(["intro ", "  disclaimer"])
+    assert embedding_service.create_embedding("intro") == again[0]
+    assert len(fake_openai.requests) == 1
+    np.testing.assert_allclose(again[1], first[1])
+
+
+def test_redis_tier_serves_other_processes(fake_openai, fresh_cache):
+    embedding_service.create_embeddings(["shared chunk"])
+
+    # A new process: empty local tier, same Redis
+    other = EmbeddingCache(fresh_cache.redis, local_size=100, ttl=60)
+    [emb] = other.get_many([embedding_service.cache_key(embedding_service.EMBEDDING_MODEL, "shared chunk")])
+    np.testing.assert_allclose(emb, fake_embedding("shared chunk", 8), rtol=1e-6)
+    assert other.stats()["redis_hits"] == 1
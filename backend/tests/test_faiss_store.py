@@ -0,0 +1,400 @@
+import os
+import faiss
+import numpy as np
+from app.db.ann_index import IndexConfig
+from app.db.faiss_store import FaissStore, _shard_dirname, select_context
+
+
+DIM = 8
+
+
+def _vectors(n, seed=0):
+    return np.random.default_rng(seed).random((n, DIM), dtype="float32").tolist()
+
+
+def _meta(user_id, n, doc_id="d1"):
+    return [{"user_id": user_id, "chunk": f"{user_id}-c{i}", "doc_id": doc_id} for i in range(n)]
+
+
+def test_search_picks_up_new_generation_without_full_reload(tmp_path):
+    writer = FaissStore(dim=DIM, data_dir=str(tmp_path))
+    reader = FaissStore(dim=DIM, data_dir=str(tmp_path))
+
+    vecs = _vectors(3)
+    writer.add(vecs, _meta("u1", 3))
+
+    results = reader.search(vecs[0], user_id="u1", top_k=1)
+    assert results[0][0]["chunk"] == "u1-c0"
+
+    # Unchanged generation: refresh is a no-op
+    shard = reader._shard("u1")
+    assert shard.refresh() is False
+
+    writer.add(_vectors(1, seed=1), _meta("u1", 1, doc_id="d2"))
+    assert shard.refresh() is True
+    assert shard.ntotal == 4
+
+
+def test_small_tenant_gets_full_top_k_next_to_large_tenant(tmp_path):
+    store = FaissStore(dim=DIM, data_dir=str(tmp_path))
+    store.add(_vectors(500), _meta("big", 500))
+    store.add(_vectors(3, seed=2), _meta("small", 3))
+
+    results = store.search(_vectors(1, seed=3)[0], user_id="small", top_k=5)
+    assert len(results) == 3
+    assert all(meta["user_id"] == "small" for meta, _ in results)
+
+
+def test_shards_are_evicted_lru(tmp_path):
+    store = FaissStore(dim=DIM, data_dir=str(tmp_path), max_loaded_users=2)
+    for user in ("a", "b", "c"):
+        store.add(_vectors(2), _meta(user, 2))
+    assert list(store._shards) == ["b", "c"]
+
+    # Evicted shards load lazily again from disk
+    assert len(store.search(_vectors(1)[0], user_id="a", top_k=2)) == 2
+    assert list(store._shards) == ["c", "a"]
+
+
+def test_migrate_legacy_index(tmp_path):
+    index = faiss.IndexFlatL2(DIM)
+    index.add(np.array(_vectors(4), dtype="float32"))
+    np.save(tmp_path / "metadata.npy", _meta("a", 2) + _meta("b", 2), allow_pickle=True)
+    faiss.write_index(index, str(tmp_path / "faiss.index"))
+
+    store = FaissStore(dim=DIM, data_dir=str(tmp_path))
+    store.migrate_legacy_index()
+
+    assert store._shard("a").ntotal == 2
+    assert store._shard("b").ntotal == 2
+    assert not (tmp_path / "faiss.index").exists()
+
+
+def test_add_appends_segments_and_compaction_merges_them(tmp_path):
+    writer = FaissStore(dim=DIM, data_dir=str(tmp_path))
+    reader = FaissStore(dim=DIM, data_dir=str(tmp_path))
+    for i in range(3):
+        writer.add(_vectors(2, seed=i), _meta("u1", 2, doc_id=f"d{i}"))
+
+    shard = writer._shard("u1")
+    assert [s["file"] for s in shard.segments] == ["seg-000001.index", "seg-000002.index", "seg-000003.index"]
+    assert len(reader.search(_vectors(1)[0], user_id="u1", top_k=10)) == 6
+
+    shard.compact()
+    assert len(shard.segments) == 1
+    assert sorted(p.name for p in shard_dir(tmp_path, "u1").glob("seg-*")) == ["seg-000004.index"]
+
+    # The reader notices the segment list changed and reloads from the merged segment
+    reader_shard = reader._shard("u1")
+    assert reader_shard.refresh() is True
+    assert reader_shard.ntotal == 6
+    assert [reader_shard.meta.row(i)["doc_id"] for i in range(6)] == ["d0", "d0", "d1", "d1", "d2", "d2"]
+
+
+def test_uncommitted_writes_are_invisible(tmp_path):
+    store = FaissStore(dim=DIM, data_dir=str(tmp_path))
+    store.add(_vectors(2), _meta("u1", 2))
+
+    # Simulate a writer killed after writing a segment and part of the metadata
+    directory = shard_dir(tmp_path, "u1")
+    (directory / "seg-000002.index").write_bytes(b"garbage")
+    with open(directory / "chunks.bin", "ab") as f:
+        f.write("torn chunk".encode("utf-8"))
+    with open(directory / "offsets.bin", "ab") as f:
+        f.write(b"\x01\x02\x03")
+
+    fresh = FaissStore(dim=DIM, data_dir=str(tmp_path))
+    assert fresh._shard("u1").ntotal == 2
+
+    # The next committed write truncates the torn tail
+    fresh.add(_vectors(1, seed=5), [{"user_id": "u1", "chunk": "new", "doc_id": "d2", "filename": "b.pdf"}])
+    reloaded = FaissStore(dim=DIM, data_dir=str(tmp_path))._shard("u1")
+    assert [reloaded.meta.row(i)["chunk"] for i in range(3)] == ["u1-c0", "u1-c1", "new"]
+    assert reloaded.meta.row(2)["filename"] == "b.pdf"
+
+
+def test_compaction_builds_ann_index_and_keeps_new_rows_exact(tmp_path):
+    config = IndexConfig("ivf_flat", nlist=8, nprobe=8, min_vectors=300)
+    writer = FaissStore(dim=DIM, data_dir=str(tmp_path), index_config=config)
+    vecs = _vectors(400)
+    writer.add(vecs, _meta("u1", 400))
+
+    # Reaching min_vectors schedules the build in the background
+    writer._compactor.submit(lambda: None).result()
+    shard = writer._shard("u1")
+    assert shard.ann["type"] == "ivf_flat" and shard.ann_ntotal == 400
+    assert shard.index.ntotal == 0
+
+    writer.add(_vectors(2, seed=9), [{"user_id": "u1", "chunk": "tail", "doc_id": "d2"}] * 2)
+    reader = FaissStore(dim=DIM, data_dir=str(tmp_path))._shard("u1")
+    assert isinstance(reader.ann_index, faiss.IndexIVFFlat)
+    assert (reader.ann_ntotal, reader.index.ntotal) == (400, 2)
+
+    # nprobe == nlist scans every list, so the results are exact
+    results = reader.search(np.array([vecs[7]], dtype="float32"), top_k=1, nprobe=8)
+    assert results[0][0]["chunk"] == "u1-c7"
+    results = reader.search(np.array(_vectors(1, seed=9), dtype="float32"), top_k=1)
+    assert results[0][0]["chunk"] == "tail"
+
+
+def test_rebuild_indexes_migrates_flat_shards(tmp_path):
+    FaissStore(dim=DIM, data_dir=str(tmp_path)).add(_vectors(300), _meta("u1", 300))
+
+    hnsw = FaissStore(dim=DIM, data_dir=str(tmp_path), index_config=IndexConfig("hnsw", min_vectors=100))
+    hnsw.rebuild_indexes()
+    assert hnsw._shard("u1").ann["type"] == "hnsw"
+    assert [p.name for p in shard_dir(tmp_path, "u1").glob("ann-*")] == ["ann-000002.index"]
+
+    # And back to exact search
+    flat = FaissStore(dim=DIM, data_dir=str(tmp_path))
+    flat.rebuild_indexes()
+    shard = flat._shard("u1")
+    assert shard.ann is None and shard.index.ntotal == 300
+    assert not list(shard_dir(tmp_path, "u1").glob("ann-*"))
+
+
+def test_search_scores_are_cosine_similarity_with_threshold(tmp_path):
+    store = FaissStore(dim=DIM, data_dir=str(tmp_path))
+    x, y = np.eye(DIM, dtype="float32")[:2]
+    store.add([10 * x, x + y, y], [{"user_id": "u1", "chunk": c, "doc_id": "d1"} for c in ("x", "xy", "y")])
+
+    results = store.search(3 * x, user_id="u1", top_k=3)
+    assert [m["chunk"] for m, _ in results] == ["x", "xy", "y"]
+    assert np.allclose([s for _, s in results], [1.0, np.sqrt(0.5), 0.0], atol=1e-6)
+
+    results = store.search(3 * x, user_id="u1", top_k=3, min_score=0.5)
+    assert [m["chunk"] for m, _ in results] == ["x", "xy"]
+
+
+def test_select_context_respects_token_budget():
+    results = [({"chunk": "a" * 40}, 0.9), ({"chunk": "b" * 40}, 0.8), ({"chunk": "c"}, 0.7)]
+    # 11 estimated tokens per 40-char chunk
+    assert [m["chunk"][0] for m, _ in select_context(results, max_tokens=22)] == ["a", "b"]
+    assert [m["chunk"][0] for m, _ in select_context(results, max_tokens=15)] == ["a"]
+    # The best chunk is always kept, even over budget
+    assert len(select_context(results, max_tokens=1)) == 1
+    assert select_context(results, min_score=0.95) == []
+
+
+def test_deleted_document_is_hidden_without_losing_top_k(tmp_path):
+    writer = FaissStore(dim=DIM, data_dir=str(tmp_path))
+    reader = FaissStore(dim=DIM, data_dir=str(tmp_path))
+    vecs = _vectors(6)
+    writer.add(vecs[:3], _meta("u1", 3, doc_id="old"))
+    writer.add(vecs[3:], [{"user_id": "u1", "chunk": f"new{i}", "doc_id": "new"} for i in range(3)])
+    assert len(reader.search(vecs[0], user_id="u1", top_k=6)) == 6
+
+    # Deleting from the API process only appends a tombstone
+    assert reader.delete_document("u1", "old") == 3
+    results = reader.search(vecs[0], user_id="u1", top_k=3)
+    assert sorted(m["chunk"] for m, _ in results) == ["new0", "new1", "new2"]
+
+    # The writer sees it on refresh, and compaction reclaims the rows
+    shard = writer._shard("u1")
+    assert shard.refresh() is True
+    assert shard.needs_compaction()
+    shard.compact()
+    assert shard.ntotal == 3
+    assert [shard.meta.row(i)["chunk"] for i in range(3)] == ["new0", "new1", "new2"]
+    assert not (shard_dir(tmp_path, "u1") / "chunks.bin").exists()
+
+    fresh = FaissStore(dim=DIM, data_dir=str(tmp_path))
+    assert [m["doc_id"] for m, _ in fresh.search(vecs[0], user_id="u1", top_k=6)] == ["new"] * 3
+
+
+def test_reclaim_deleted_compacts_once_enough_of_the_shard_is_deleted(tmp_path):
+    store = FaissStore(dim=DIM, data_dir=str(tmp_path))
+    store.add(_vectors(10), _meta("u1", 1, doc_id="a") + _meta("u1", 9, doc_id="b"))
+
+    store.delete_document("u1", "a")
+    store.reclaim_deleted("u1", "a")
+    store._compactor.submit(lambda: None).result()
+    assert store._shard("u1").ntotal == 10
+
+    store.delete_document("u1", "b")
+    store.reclaim_deleted("u1", "b")
+    store._compactor.submit(lambda: None).result()
+    assert store._shard("u1").ntotal == 0
+
+
+def test_tombstones_apply_to_ann_index_and_late_chunks(tmp_path):
+    config = IndexConfig("hnsw", min_vectors=100)
+    store = FaissStore(dim=DIM, data_dir=str(tmp_path), index_config=config)
+    vecs = _vectors(200)
+    store.add(vecs, _meta("u1", 100, doc_id="a") + _meta("u1", 100, doc_id="b"))
+    store._compactor.submit(lambda: None).result()
+    assert store._shard("u1").ann_ntotal == 200
+
+    store.delete_document("u1", "a")
+    # Chunks of the deleted document still being processed stay hidden too
+    store.add(_vectors(1, seed=4), [{"user_id": "u1", "chunk": "late", "doc_id": "a"}])
+    results = store.search(vecs[0], user_id="u1", top_k=5)
+    assert len(results) == 5
+    assert all(m["doc_id"] == "b" for m, _ in results)
+
+
+def test_hybrid_search_fuses_keyword_hits(tmp_path):
+    store = FaissStore(dim=DIM, data_dir=str(tmp_path))
+    chunks = ["pump manual", "order XJ-4500 spares", "warranty terms", "XJ-4500 recall notice"]
+    vecs = _vectors(4)
+    store.add(vecs, [{"user_id": "u1", "chunk": c, "doc_id": f"d{i}"} for i, c in enumerate(chunks)])
+
+    # Keyword-only: no query vector needed
+    results = store.search(None, user_id="u1", top_k=5, query_text="XJ-4500")
+    assert sorted(m["chunk"] for m, _ in results) == ["XJ-4500 recall notice", "order XJ-4500 spares"]
+
+    # Fused: the keyword hit joins the vector hits even when it is not the nearest vector
+    results = store.search(vecs[0], user_id="u1", top_k=2, query_text="recall")
+    assert {m["chunk"] for m, _ in results} == {"pump manual", "XJ-4500 recall notice"}
+
+    store.delete_document("u1", "d3")
+    results = store.search(None, user_id="u1", top_k=5, query_text="XJ-4500")
+    assert [m["chunk"] for m, _ in results] == ["order XJ-4500 spares"]
+
+
+def shard_dir(root, user_id):
+    return root / "users" / user_id
+
+
+def test_page_numbers_survive_compaction_and_legacy_rows(tmp_path):
+    store = FaissStore(dim=DIM, data_dir=str(tmp_path))
+    store.add(_vectors(1), _meta("u1", 1))  # written without page numbers
+    shard = store._shard("u1")
+    # Metadata state from before the pages column existed
+    shard.meta.pages_from = 1
+    shard._commit()
+
+    pages = [{**m, "page_start": i + 1, "page_end": i + 2} for i, m in enumerate(_meta("u1", 2, doc_id="d2"))]
+    store.add(_vectors(2, seed=1), pages)
+    reloaded = FaissStore(dim=DIM, data_dir=str(tmp_path))._shard("u1")
+    assert [(reloaded.meta.row(i)["page_start"], reloaded.meta.row(i)["page_end"]) for i in range(3)] == \
+        [(None, None), (1, 2), (2, 3)]
+
+    # Deleting a document makes compaction rewrite the metadata columns
+    store.add(_vectors(1, seed=2), _meta("u1", 1, doc_id="d3"))
+    store.delete_document("u1", "d3")
+    shard.compact()
+    assert shard.meta.pages_from == 0
+    assert [shard.meta.pages(i) for i in range(3)] == [(0, 0), (1, 2), (2, 3)]
+
+
+def test_mmap_reader_matches_and_survives_compaction(tmp_path):
+    config = IndexConfig("ivf_flat", nlist=8, nprobe=8, min_vectors=300)
+    writer = FaissStore(dim=DIM, data_dir=str(tmp_path), index_config=config)
+    writer.add(_vectors(200), _meta("u1", 200))
+    writer.add(_vectors(50, seed=1), _meta("u1", 50, doc_id="d2"))
+    copied = FaissStore(dim=DIM, data_dir=str(tmp_path), index_config=config)
+    mapped = FaissStore(dim=DIM, data_dir=str(tmp_path), index_config=config, mmap=True)
+
+    queries = _vectors(5, seed=7)
+
+    def chunks(store):
+        return [[m["chunk"] for m, _ in store.search(q, "u1", top_k=4, nprobe=8)] for q in queries]
+    assert chunks(mapped) == chunks(copied)
+    assert [start for start, _ in mapped._shard("u1").index.parts] == [0, 200]
+
+    # The writer deletes the files the reader has mapped; searches go on until the
+    # reader swaps to the new snapshot, which then holds an IVF index without d2
+    mapped._shard("u1").delete_document("d2")
+    writer.add(_vectors(100, seed=2), _meta("u1", 100, doc_id="d3"))
+    writer._compactor.submit(lambda: None).result()
+    assert writer._shard("u1").ann is not None
+    assert not (tmp_path / "users" / "u1" / "seg-000001.index").exists()
+
+    shard = mapped._shard("u1")
+    assert len(shard.search(np.array([queries[0]], dtype="float32"), 4)) == 4
+    assert shard.refresh() is True
+    assert isinstance(shard.ann_index, faiss.IndexIVFFlat) and shard.index.ntotal == 0
+    assert chunks(mapped) == chunks(FaissStore(dim=DIM, data_dir=str(tmp_path), index_config=config))
+    assert not any(m["doc_id"] == "d2" for m, _ in mapped.search(queries[0], "u1", top_k=300, nprobe=8))
+
+
+def test_warm_up_loads_the_most_recent_shards(tmp_path):
+    writer = FaissStore(dim=DIM, data_dir=str(tmp_path))
+    for i, user_id in enumerate(["old", "user@example.com", "new"]):
+        writer.add(_vectors(2, seed=i), _meta(user_id, 2))
+        os.utime(tmp_path / "users" / _shard_dirname(user_id) / "faiss.manifest.json", (1000 + i, 1000 + i))
+
+    reader = FaissStore(dim=DIM, data_dir=str(tmp_path))
+    assert reader.warm_up(limit=2) == 2
+    # Hashed directory names are mapped back to their user
+    assert list(reader._shards) == ["user@example.com", "new"]
+    assert reader._shards["new"].ntotal == 2
+    assert FaissStore(dim=DIM, data_dir=str(tmp_path / "empty")).warm_up() == 0
+
+    # Shards loaded by searches meanwhile are reused, and count against max_loaded_users
+    live = FaissStore(dim=DIM, data_dir=str(tmp_path), max_loaded_users=2)
+    live._shard("old")
+    searched = live._shard("new")
+    assert live.warm_up() == 2
+    assert list(live._shards) == ["user@example.com", "new"]
+    assert live._shards["new"] is searched
+
+
+def test_compaction_is_skipped_when_another_shard_instance_committed(tmp_path):
+    store = FaissStore(dim=DIM, data_dir=str(tmp_path))
+    for i in range(3):
+        store.add(_vectors(2, seed=i), _meta("u1", 2, doc_id=f"d{i}"))
+    stale = store._shard("u1")
+
+    # The shard was evicted and reloaded, and the new instance committed a segment
+    store._shards.clear()
+    store.add(_vectors(3, seed=9), _meta("u1", 3, doc_id="late"))
+    stale.compact(force=True)
+
+    assert stale.ntotal == 9
+    assert FaissStore(dim=DIM, data_dir=str(tmp_path))._shard("u1").ntotal == 9
+
+
+def test_shards_with_pending_compaction_are_not_evicted(tmp_path):
+    store = FaissStore(dim=DIM, data_dir=str(tmp_path), max_loaded_users=1)
+    store.add(_vectors(2), _meta("a", 2))
+    store._compacting.add(store._shard("a").shard_dir)
+    store.add(_vectors(2), _meta("b", 2))
+    assert "a" in store._shards
+    store._compacting.clear()
+    store.add(_vectors(2), _meta("c", 2))
+    assert list(store._shards) == ["c"]
+
+
+def test_cold_shard_loads_do_not_block_other_users(tmp_path, monkeypatch):
+    import threading
+    import time
+    from app.db import faiss_store as faiss_store_module
+
+    FaissStore(dim=DIM, data_dir=str(tmp_path)).add(_vectors(4), _meta("slow", 2) + _meta("fast", 2))
+    store = FaissStore(dim=DIM, data_dir=str(tmp_path))
+    loading, release = threading.Event(), threading.Event()
+    real_shard = faiss_store_module.UserShard
+
+    def shard(dim, shard_dir, *args):
+        if shard_dir.endswith("slow"):
+            loading.set()
+            release.wait(5)
+        return real_shard(dim, shard_dir, *args)
+
+    monkeypatch.setattr(faiss_store_module, "UserShard", shard)
+    slow = [threading.Thread(target=store._shard, args=("slow",)) for _ in range(2)]
+    for thread in slow:
+        thread.start()
+    assert loading.wait(5)
+    started = time.monotonic()
+    assert store._shard("fast").ntotal == 2  # while "slow" is still loading
+    assert time.monotonic() - started < 2
+    release.set()
+    for thread in slow:
+        thread.join(5)
+    assert store._shard("slow").ntotal == 2 and not store._loading
+
+
+def test_hybrid_search_keeps_keyword_hits_below_min_score_out(tmp_path):
+    store = FaissStore(dim=DIM, data_dir=str(tmp_path))
+    query = np.eye(DIM, dtype="float32")[0]
+    chunks = {"relevant pump manual": np.eye(DIM)[0] + 0.1, "unrelated pump invoice": np.eye(DIM)[1]}
+    store.add(list(chunks.values()), [{"user_id": "u1", "chunk": c, "doc_id": c} for c in chunks])
+
+    results = store.search(query, user_id="u1", top_k=5, min_score=0.9, query_text="pump invoice")
+    assert [m["chunk"] for m, _ in results] == ["relevant pump manual"]
+
+    results = store.search(query * -1, user_id="u1", top_k=5, min_score=0.9, query_text="pump invoice")
+    assert results == []
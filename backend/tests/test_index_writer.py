@@ -0,0 +1,116 @@
+import os
+import threading
+import numpy as np
+import pytest
+from app.db.faiss_store import FaissStore
+from app.db.index_spool import IndexSpool
+from app.db.index_writer import IndexWriter, writer_lock
+
+DIM = 8
+
+
+def _batch(user_id, doc_id, n, seed=0):
+    vectors = np.random.default_rng(seed).random((n, DIM), dtype="float32")
+    return vectors, [{"user_id": user_id, "chunk": f"{doc_id}-c{i}", "doc_id": doc_id, "page_start": 1} for i in range(n)]
+
+
+def test_spooled_batches_from_many_producers_are_applied_by_one_writer(tmp_path):
+    spool = IndexSpool(str(tmp_path / "spool"))
+
+    def produce(worker):
+        for i in range(5):
+            spool.submit(*_batch("u1", f"w{worker}-d{i}", 3, seed=worker * 10 + i))
+
+    threads = [threading.Thread(target=produce, args=(w,)) for w in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    writer = IndexWriter(FaissStore(dim=DIM, data_dir=str(tmp_path / "data")), spool)
+    assert writer.apply_pending() == 20
+    assert spool.pending() == []
+
+    reader = FaissStore(dim=DIM, data_dir=str(tmp_path / "data"))
+    shard = reader._shard("u1")
+    assert shard.ntotal == 60
+    assert shard.meta.row(0)["page_start"] == 1
+
+
+def test_reapplied_batch_is_skipped(tmp_path):
+    spool = IndexSpool(str(tmp_path / "spool"))
+    data_dir = str(tmp_path / "data")
+    spool.submit(*_batch("u1", "d1", 3), batch_id="d1-0")
+    IndexWriter(FaissStore(dim=DIM, data_dir=data_dir), spool).apply_pending()
+
+    # The same batch again (a retried document), seen by a restarted writer
+    spool.submit(*_batch("u1", "d1", 3), batch_id="d1-0")
+    spool.submit(*_batch("u1", "d1", 2, seed=1), batch_id="d1-3")
+    IndexWriter(FaissStore(dim=DIM, data_dir=data_dir), spool).apply_pending()
+
+    assert FaissStore(dim=DIM, data_dir=data_dir)._shard("u1").ntotal == 5
+
+
+def test_unreadable_batch_is_set_aside(tmp_path):
+    spool = IndexSpool(str(tmp_path / "spool"))
+    os.makedirs(spool.pending_dir)
+    with open(os.path.join(spool.pending_dir, "00000000000000000000-bad.npz"), "wb") as f:
+        f.write(b"not a batch")
+    spool.submit(*_batch("u1", "d1", 2))
+
+    store = FaissStore(dim=DIM, data_dir=str(tmp_path / "data"))
+    assert IndexWriter(store, spool).apply_pending() == 1
+    assert store._shard("u1").ntotal == 2
+    assert os.listdir(tmp_path / "spool" / "failed") == ["00000000000000000000-bad.npz"]
+
+
+def test_wait_applied_returns_once_the_writer_is_done(tmp_path):
+    spool = IndexSpool(str(tmp_path / "spool"))
+    path = spool.submit(*_batch("u1", "d1", 2))
+    assert spool.wait_applied([path], timeout=0.05) is False
+
+    writer = IndexWriter(FaissStore(dim=DIM, data_dir=str(tmp_path / "data")), spool)
+    thread = threading.Thread(target=writer.run)
+    thread.start()
+    try:
+        assert spool.wait_applied([path], timeout=5) is True
+    finally:
+        writer.stop()
+        thread.join()
+
+
+def test_wait_applied_fails_for_batches_set_aside(tmp_path):
+    spool = IndexSpool(str(tmp_path / "spool"))
+    good = spool.submit(*_batch("u1", "d1", 2))
+    bad = spool.submit(*_batch("u1", "d2", 2))
+    spool.done(good)
+    spool.fail(bad)
+    assert spool.wait_applied([good], timeout=1) is True
+    assert spool.wait_applied([good, bad], timeout=1) is False
+
+
+def test_compaction_requests_are_applied_in_order_with_batches(tmp_path):
+    spool = IndexSpool(str(tmp_path / "spool"))
+    store = FaissStore(dim=DIM, data_dir=str(tmp_path / "data"))
+    spool.submit(*_batch("u1", "d1", 3))
+    IndexWriter(store, spool).apply_pending()
+
+    FaissStore(dim=DIM, data_dir=str(tmp_path / "data")).delete_document("u1", "d1")
+    spool.request_compaction("u1", "d1")
+    spool.submit(*_batch("u1", "d2", 2, seed=1))
+    assert len(spool.pending()) == 2
+
+    assert IndexWriter(store, spool).apply_pending() == 2
+    store._compactor.submit(lambda: None).result()
+    shard = store._shard("u1")
+    assert shard.ntotal == 2
+    assert {shard.meta.row(i)["doc_id"] for i in range(2)} == {"d2"}
+
+
+def test_writer_lock_is_exclusive(tmp_path):
+    with writer_lock(str(tmp_path)):
+        with pytest.raises(BlockingIOError):
+            with writer_lock(str(tmp_path), blocking=False):
+                pass
+    with writer_lock(str(tmp_path), blocking=False):
+        pass
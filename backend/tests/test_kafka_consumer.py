@@ -0,0 +1,150 @@
+import threading
+import time
+import pytest
+from app.core.config import settings
+from app.kafka_events.base_consumer import KafkaEventConsumer
+from tests.fake_kafka import FakeBroker
+
+TOPIC = "document_uploaded"
+
+
+class RecordingConsumer(KafkaEventConsumer):
+    def __init__(self, consumer, concurrency, handler):
+        super().__init__(topic=TOPIC, group_id="test", concurrency=concurrency, consumer=consumer)
+        self.handler = handler
+
+    def handle_event(self, event: dict):
+        self.handler(event)
+
+
+@pytest.fixture
+def running():
+    """Start a consumer's run() in a thread; stop and join it after the test."""
+    started = []
+
+    def start(consumer):
+        thread = threading.Thread(target=consumer.run, daemon=True)
+        thread.start()
+        started.append((consumer, thread))
+        return consumer
+
+    yield start
+    for consumer, thread in started:
+        consumer.stop()
+        thread.join(timeout=10)
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def _committed(broker):
+    return sum(broker.committed_offset("test", TOPIC, p) for p in range(broker.partitions))
+
+
+def test_events_run_in_parallel_but_in_order_per_doc(running):
+    broker = FakeBroker(partitions=2)
+    for seq in range(5):
+        for doc in ("a", "b", "c", "d"):
+            broker.send(TOPIC, {"doc_id": doc, "seq": seq}, key=doc)
+
+    lock = threading.Lock()
+    seen, active, peak = [], [0], [0]
+
+    def handler(event):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.01)
+        with lock:
+            active[0] -= 1
+            seen.append((event["doc_id"], event["seq"]))
+
+    running(RecordingConsumer(broker.consumer(TOPIC, "test"), concurrency=4, handler=handler))
+    _wait_for(lambda: _committed(broker) == 20)
+
+    assert peak[0] > 1
+    for doc in "abcd":
+        assert [seq for d, seq in seen if d == doc] == list(range(5))
+
+
+def test_offsets_are_committed_only_after_handling(running):
+    broker = FakeBroker(partitions=1)
+    for i in range(4):
+        broker.send(TOPIC, {"doc_id": f"d{i}"})
+    release = threading.Event()
+    handled = set()
+
+    def handler(event):
+        if event["doc_id"] == "d1":
+            release.wait(5)
+        handled.add(event["doc_id"])
+
+    consumer = running(RecordingConsumer(broker.consumer(TOPIC, "test"), concurrency=2, handler=handler))
+    _wait_for(lambda: {"d0", "d2", "d3"} <= handled)
+    time.sleep(0.1)
+    # d2 and d3 are done, but d1 is not: the commit stops in front of it
+    assert broker.committed_offset("test", TOPIC, 0) == 1
+
+    release.set()
+    _wait_for(lambda: broker.committed_offset("test", TOPIC, 0) == 4)
+
+    # A restarted consumer resumes after the committed work
+    consumer.stop()
+    again = []
+    running(RecordingConsumer(broker.consumer(TOPIC, "test"), concurrency=1, handler=again.append))
+    broker.send(TOPIC, {"doc_id": "d4"})
+    _wait_for(lambda: again)
+    assert again == [{"doc_id": "d4"}]
+
+
+def test_failed_record_is_not_committed_but_redelivered(running, monkeypatch):
+    monkeypatch.setattr(settings, "KAFKA_REDELIVERY_DELAY", 0.2)
+    broker = FakeBroker(partitions=1)
+    broker.send(TOPIC, {"doc_id": "bad"})
+    broker.send(TOPIC, {"doc_id": "good"})
+    attempts = []
+
+    def handler(event):
+        attempts.append(event["doc_id"])
+        if attempts.count("bad") < 3:
+            raise RuntimeError("boom")
+
+    running(RecordingConsumer(broker.consumer(TOPIC, "test"), concurrency=1, handler=handler))
+    _wait_for(lambda: attempts.count("bad") == 2)
+    # Nothing behind the failed record runs or is committed until it succeeds
+    assert broker.committed_offset("test", TOPIC, 0) == 0
+    assert "good" not in attempts
+
+    _wait_for(lambda: _committed(broker) == 2)
+    assert attempts == ["bad", "bad", "bad", "good"]
+
+
+def test_saturated_workers_pause_the_partitions(running, monkeypatch):
+    monkeypatch.setattr(settings, "KAFKA_MAX_IN_FLIGHT_PER_WORKER", 2)
+    broker = FakeBroker(partitions=2)
+    for i in range(30):
+        broker.send(TOPIC, {"doc_id": f"d{i}"}, key=f"d{i}")
+
+    fake = broker.consumer(TOPIC, "test")
+    lock = threading.Lock()
+    finished, peak = [0], [0]
+
+    def handler(event):
+        with lock:
+            # Polled but not yet finished, this record included
+            peak[0] = max(peak[0], sum(fake._positions.values()) - finished[0])
+        time.sleep(0.005)
+        with lock:
+            finished[0] += 1
+
+    consumer = running(RecordingConsumer(fake, concurrency=2, handler=handler))
+    _wait_for(lambda: _committed(broker) == 30)
+
+    assert consumer.max_in_flight == 4
+    assert peak[0] <= 4
+    assert fake.pause_count > 0
+    assert not fake.paused()
@@ -0,0 +1,40 @@
+from app.db.lexical_index import BM25Index, is_lexical_query, reciprocal_rank_fusion, tokenize
+
+
+def test_tokenize_keeps_identifiers_and_their_parts():
+    assert tokenize("The XJ-4500 pump, v2.1!") == ["xj-4500", "xj", "4500", "pump", "v2.1", "v2", "1"]
+
+
+def test_is_lexical_query():
+    assert is_lexical_query("XJ-4500")
+    assert is_lexical_query("invoice 2023-117?")
+    assert is_lexical_query('"force majeure"')
+    assert not is_lexical_query("What is the warranty period?")
+    assert not is_lexical_query("How long is the 2 year warranty period?")
+    assert not is_lexical_query("")
+
+
+def test_short_questions_with_numbers_are_not_identifier_lookups():
+    for question in ("Summarize page 3", "top 5 skills", "Who won in 2020?", "What is 2+2?",
+                     "What changed in v2?", "What is 3.5?"):
+        assert not is_lexical_query(question), question
+    assert is_lexical_query("v2.1 changes")
+    assert is_lexical_query("inv/2023/17")
+    assert is_lexical_query("batch_42")
+
+
+def test_bm25_ranks_rare_terms_and_updates_incrementally():
+    index = BM25Index()
+    index.add(["the pump model XJ-4500 manual", "pump maintenance schedule", "pump pump pump"])
+    assert [row for row, _ in index.search("xj-4500", top_k=5)] == [0]
+    assert index.search("turbine", top_k=5) == []
+
+    index.add(["turbine spare parts"])
+    assert [row for row, _ in index.search("turbine pump", top_k=1)] == [3]
+    assert {row for row, _ in index.search("pump", top_k=5, exclude=[2])} == {0, 1}
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    vector = [(1, 0.9), (2, 0.8), (3, 0.7)]
+    lexical = [(3, 12.0), (4, 3.0)]
+    assert [row for row, _ in reciprocal_rank_fusion([vector, lexical], top_k=3)] == [3, 1, 2]
@@ -0,0 +1,77 @@
+import os
+import signal
+import time
+import PyPDF2
+import pytest
+from app.services import pdf_extraction
+from app.services.pdf_extraction import extract_pages
+from tests.fake_pdf import generated_pages, write_pdf
+
+
+@pytest.fixture
+def forked_pool(monkeypatch):
+    """Workers forked from the test process, so they inherit its monkeypatches."""
+    monkeypatch.setattr(pdf_extraction, "MP_CONTEXT", "fork")
+    if pdf_extraction._executor is not None:
+        pdf_extraction._discard_pool(pdf_extraction._executor)
+    yield
+    if pdf_extraction._executor is not None:
+        pdf_extraction._discard_pool(pdf_extraction._executor)
+
+
+def test_parallel_extraction_matches_in_process_order(tmp_path):
+    path = tmp_path / "doc.pdf"
+    write_pdf(path, generated_pages(20, lines_per_page=5))
+
+    sequential = list(extract_pages(str(path), workers=1))
+    parallel = list(extract_pages(str(path), workers=2, pages_per_task=3))
+
+    assert [number for number, _ in sequential] == list(range(1, 21))
+    assert parallel == sequential
+    assert "on page 20." in sequential[-1][1]
+
+
+def test_slow_and_broken_pages_are_skipped(tmp_path, monkeypatch, forked_pool):
+    path = tmp_path / "doc.pdf"
+    write_pdf(path, [["First page."], ["Slow page."], ["Broken page."], ["Last page."]])
+    original = PyPDF2.PageObject.extract_text
+
+    def extract_text(page, *args, **kwargs):
+        text = original(page, *args, **kwargs)
+        if "Slow" in text:
+            time.sleep(5)
+        if "Broken" in text:
+            raise ValueError("bad content stream")
+        return text
+
+    monkeypatch.setattr(PyPDF2.PageObject, "extract_text", extract_text)
+    started = time.perf_counter()
+    pages = list(extract_pages(str(path), workers=1, page_timeout=0.2))
+
+    assert time.perf_counter() - started < 2
+    assert [(number, text.strip()) for number, text in pages] == \
+        [(1, "First page."), (2, ""), (3, ""), (4, "Last page.")]
+
+
+def test_stuck_and_crashing_pages_are_cut_short_by_replacing_the_pool(tmp_path, monkeypatch, forked_pool):
+    path = tmp_path / "doc.pdf"
+    write_pdf(path, [["First page."], ["Stuck page."], ["Crashing page."], ["Last page."]])
+    original = PyPDF2.PageObject.extract_text
+
+    def extract_text(page, *args, **kwargs):
+        text = original(page, *args, **kwargs)
+        if "Stuck" in text:
+            signal.pthread_sigmask(signal.SIG_BLOCK, [signal.SIGALRM])  # out of the alarm's reach
+            time.sleep(60)
+        if "Crashing" in text:
+            os._exit(1)
+        return text
+
+    monkeypatch.setattr(PyPDF2.PageObject, "extract_text", extract_text)
+    monkeypatch.setattr(pdf_extraction, "POOL_GRACE", 0.5)
+    started = time.perf_counter()
+    pages = list(extract_pages(str(path), workers=1, pages_per_task=4, page_timeout=0.2))
+
+    assert time.perf_counter() - started < 10
+    assert [(number, text.strip()) for number, text in pages] == \
+        [(1, "First page."), (2, ""), (3, ""), (4, "Last page.")]
@@ -0,0 +1,123 @@
+import json
+import socket
+import threading
+import time
+
+import fakeredis
+import httpx
+import numpy as np
+import pytest
+import uvicorn
+from fastapi import FastAPI, Request
+from openai import AsyncOpenAI
+
+from app.api import query
+from app.db.faiss_store import FaissStore
+from app.services import embedding_service
+from app.services.answer_cache import SemanticAnswerCache
+from app.services.embedding_cache import EmbeddingCache
+from app.utils.rate_limiter import RedisRateLimiter
+from tests.fake_openai import FakeOpenAIServer, fake_embedding
+
+DIM = 8
+REPLY = "one two three four five six seven eight nine ten"
+TOKEN_DELAY = 0.1
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def app_url(tmp_path, monkeypatch):
+    openai_server = FakeOpenAIServer(dim=DIM, chat_reply=REPLY, token_delay=TOKEN_DELAY).start()
+    monkeypatch.setattr(embedding_service, "async_client",
+                        AsyncOpenAI(api_key="test", base_url=openai_server.base_url, max_retries=0))
+    monkeypatch.setattr(embedding_service, "embedding_cache", EmbeddingCache(
+        fakeredis.FakeRedis(), local_size=100, ttl=60, async_redis_client=fakeredis.FakeAsyncRedis()))
+
+    redis_server = fakeredis.FakeServer()
+    monkeypatch.setattr(query, "llm_limiter", RedisRateLimiter(
+        fakeredis.FakeAsyncRedis(server=redis_server, decode_responses=True), limit=5, window=60))
+    monkeypatch.setattr(query, "answer_cache", SemanticAnswerCache(
+        fakeredis.FakeRedis(server=redis_server, decode_responses=True),
+        fakeredis.FakeAsyncRedis(server=redis_server, decode_responses=True),
+        fakeredis.FakeAsyncRedis(server=redis_server),
+        threshold=0.95, ttl=60, max_entries=10,
+    ))
+
+    store = FaissStore(dim=DIM, data_dir=str(tmp_path))
+    chunks = ["The deadline is Friday.", "Part XJ-4500 ships in March."]
+    store.add([fake_embedding(c, DIM) for c in chunks],
+              [{"user_id": "u1", "chunk": c, "doc_id": "d1", "filename": "a.pdf"} for c in chunks])
+    monkeypatch.setattr(query, "search_store", store)
+
+    app = FastAPI()
+
+    @app.middleware("http")
+    async def fake_auth(request: Request, call_next):
+        request.state.user = {"_id": "u1"}
+        return await call_next(request)
+
+    app.include_router(query.router)
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+
+    yield f"http://127.0.0.1:{port}"
+
+    server.should_exit = True
+    thread.join()
+    openai_server.stop()
+
+
+def _stream(url: str, question: str):
+    """Returns [(seconds since request, event, data)]."""
+    events = []
+    start = time.perf_counter()
+    with httpx.stream("POST", f"{url}/query/stream", data={"question": question}, timeout=10) as response:
+        assert response.headers["content-type"].startswith("text/event-stream")
+        for block in response.iter_text():
+            for raw in filter(None, block.split("\n\n")):
+                lines = dict(line.split(": ", 1) for line in raw.splitlines())
+                events.append((time.perf_counter() - start, lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_tokens_arrive_before_generation_finishes_and_answer_is_cached(app_url):
+    events = _stream(app_url, "When is the deadline?")
+
+    tokens = [e for e in events if e[1] == "token"]
+    assert "".join(data for _, _, data in tokens) == REPLY
+    assert events[-1][1:] == ("done", {"cached": False})
+
+    generation_time = TOKEN_DELAY * (len(REPLY.split()) - 1)
+    assert tokens[0][0] < generation_time / 2
+    assert events[-1][0] >= generation_time
+
+    again = _stream(app_url, "when is the deadline?")
+    assert [e[1:] for e in again] == [("token", REPLY), ("done", {"cached": True})]
+
+
+def test_identifier_lookup_skips_the_embedding_call(app_url, monkeypatch):
+    async def no_embedding(text):
+        raise AssertionError("embedding requested for a keyword query")
+    monkeypatch.setattr(embedding_service, "create_embedding_async", no_embedding)
+
+    events = _stream(app_url, "XJ-4500?")
+    assert events[-1][1:] == ("done", {"cached": False})
+    assert _stream(app_url, "xj-4500?")[-1][1:] == ("done", {"cached": True})
+
+
+def test_llm_limit_does_not_block_cached_answers(app_url, monkeypatch):
+    monkeypatch.setattr(query.llm_limiter, "limit", 1)
+    assert _stream(app_url, "When is the deadline?")[-1][1:] == ("done", {"cached": False})
+
+    assert [e[1:] for e in _stream(app_url, "XJ-4500?")] == [("error", query.LLM_LIMIT_MESSAGE)]
+    assert _stream(app_url, "when is the deadline?")[-1][1:] == ("done", {"cached": True})
@@ -0,0 +1,160 @@
+import asyncio
+
+import fakeredis
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.utils import rate_limiter
+from app.utils.rate_limiter import HybridRateLimiter, RedisRateLimiter
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@pytest.fixture
+def redis():
+    return fakeredis.FakeAsyncRedis(decode_responses=True)
+
+
+@pytest.mark.parametrize("algorithm", ["sliding_window", "token_bucket"])
+def test_limit_is_enforced_and_recovers(redis, algorithm):
+    clock = Clock()
+    limiter = RedisRateLimiter(redis, limit=3, window=60, algorithm=algorithm, clock=clock)
+
+    results = [run(limiter.take("k")) for _ in range(4)]
+    assert [allowed for allowed, _, _ in results] == [True, True, True, False]
+    assert [remaining for _, remaining, _ in results[:3]] == [2, 1, 0]
+    assert 0 < results[3][2] <= 60
+
+    # Rejected requests are not counted; a full window later everything is back
+    clock.now += 120
+    assert [run(limiter.take("k"))[0] for _ in range(4)] == [True, True, True, False]
+
+
+def test_sliding_window_weighs_the_previous_window(redis):
+    clock = Clock(now=6000.0)  # the start of a window
+    limiter = RedisRateLimiter(redis, limit=4, window=60, clock=clock)
+    for _ in range(4):
+        assert run(limiter.take("k"))[0]
+
+    # A quarter into the next window, 3/4 of the previous 4 requests still count
+    clock.now += 75
+    assert run(limiter.take("k"))[0]
+    assert not run(limiter.take("k"))[0]
+
+
+def test_token_bucket_refills_gradually(redis):
+    clock = Clock()
+    limiter = RedisRateLimiter(redis, limit=4, window=60, algorithm="token_bucket", clock=clock)
+    for _ in range(4):
+        run(limiter.take("k"))
+    allowed, _, retry_after = run(limiter.take("k"))
+    assert not allowed and retry_after == pytest.approx(15, abs=0.01)
+
+    clock.now += 15
+    assert run(limiter.take("k"))[0]
+
+
+def test_cached_value_is_returned_without_counting(redis):
+    limiter = RedisRateLimiter(redis, limit=1, window=60, clock=Clock())
+    run(redis.set("answer", "cached"))
+
+    assert run(limiter.take_unless_cached("k", "answer")) == ("cached", True, 0)
+    assert run(limiter.take_unless_cached("k", "missing"))[:2] == (None, True)
+    assert run(limiter.take_unless_cached("k", "missing"))[:2] == (None, False)
+
+    run(limiter.give_back("k"))
+    assert run(limiter.take("k"))[0]
+
+
+def test_state_does_not_collide_with_legacy_counters(redis):
+    run(redis.set("ratelimit:user:u1", 7))  # an INCR counter left by the previous limiter
+    limiter = RedisRateLimiter(redis, limit=1, window=60)
+    assert run(limiter.take("ratelimit:user:u1"))[0]
+
+
+def test_middleware_answers_429_with_retry_after(monkeypatch):
+    limiter = RedisRateLimiter(fakeredis.FakeAsyncRedis(decode_responses=True), limit=1, window=60)
+    monkeypatch.setattr(rate_limiter, "general_limiter", limiter)
+    app = FastAPI()
+    app.middleware("http")(rate_limiter.rate_limiter)
+    app.get("/")(lambda: {"ok": True})
+    app.get("/healthz")(lambda: {"status": "alive"})
+
+    client = TestClient(app)
+    assert client.get("/").status_code == 200
+    response = client.get("/")
+    assert response.status_code == 429
+    assert 1 <= int(response.headers["Retry-After"]) <= 60
+    assert client.get("/healthz").status_code == 200
+
+
+def test_hybrid_limiter_counts_in_memory_within_the_error_bound(redis):
+    clock = Clock()
+    strict = RedisRateLimiter(redis, limit=10, window=60, clock=clock)
+    workers = [HybridRateLimiter(RedisRateLimiter(redis, limit=10, window=60, clock=clock), max_error=3)
+               for _ in range(2)]
+
+    async def scenario():
+        # The first max_error requests of a worker never reach Redis
+        assert all([(await workers[0].take("k"))[0] for _ in range(3)])
+        assert await redis.keys("*") == []
+
+        # Then each sync adds what was let through; both workers together stay
+        # within limit + max_error per worker
+        admitted = 0
+        for i in range(30):
+            admitted += (await workers[i % 2].take("k"))[0]
+        for worker in workers:
+            await worker.flush()
+        return admitted
+
+    admitted = run(scenario()) + 3
+    assert 10 <= admitted <= 10 + 2 * 3
+    assert not run(strict.take("k"))[0]
+
+
+def test_hybrid_limiter_caches_rejections(redis):
+    clock = Clock()
+    limiter = HybridRateLimiter(RedisRateLimiter(redis, limit=2, window=60, clock=clock), max_error=2)
+
+    async def scenario():
+        results = [await limiter.take("k") for _ in range(3)]
+        await redis.flushall()  # a rejected key is not asked again until it may retry
+        results.append(await limiter.take("k"))
+        clock.now += results[-1][2]
+        results.append(await limiter.take("k"))
+        return results
+
+    results = run(scenario())
+    assert [allowed for allowed, _, _ in results] == [True, True, False, False, True]
+    assert 0 < results[3][2] < results[2][2] + 1
+
+
+def test_hybrid_limiter_keeps_requests_pending_when_redis_fails(redis, monkeypatch):
+    clock = Clock()
+    limiter = HybridRateLimiter(RedisRateLimiter(redis, limit=5, window=60, clock=clock), max_error=5)
+
+    async def down(admitted, cost=0):
+        raise ConnectionError("redis down")
+
+    async def scenario():
+        await limiter.take("k")
+        with monkeypatch.context() as patch:
+            patch.setattr(limiter.limiter, "count", down)
+            with pytest.raises(ConnectionError):
+                await limiter.flush()
+        await limiter.flush()
+
+    run(scenario())
+    assert run(RedisRateLimiter(redis, limit=5, window=60, clock=clock).take("k"))[1] == 3
@@ -0,0 +1,192 @@
+import threading
+import time
+import pytest
+from kafka.errors import KafkaTimeoutError
+from app.core.config import settings
+from app.db.index_spool import IndexSpool
+from app.kafka_events import document_uploaded_consumer, producer
+from app.services import document_service, embedding_service
+from app.kafka_events.document_retry_consumer import DocumentRetryConsumer
+from app.kafka_events.document_uploaded_consumer import DocumentUploadedConsumer
+from app.main_replay_dlq import replay_dead_letters
+from tests.fake_kafka import FakeBroker
+
+UPLOADED = settings.KAFKA_TOPIC_DOCUMENT_UPLOADED
+DLQ = settings.KAFKA_TOPIC_DOCUMENT_DLQ
+EVENT = {"doc_id": "d1", "filename": "a.pdf", "user_id": "u1", "file_path": "/tmp/a.pdf"}
+
+
+class FakeCollection:
+    def __init__(self, docs=()):
+        self.docs = {d["_id"]: dict(d) for d in docs}
+
+    def find_one(self, query, projection=None):
+        return self.docs.get(query["_id"])
+
+    def update_one(self, query, update):
+        if query["_id"] in self.docs:
+            self.docs[query["_id"]].update(update["$set"])
+
+
+@pytest.fixture
+def broker(monkeypatch):
+    broker = FakeBroker(partitions=1)
+    monkeypatch.setattr(producer, "get_kafka_producer", broker.producer)
+    monkeypatch.setattr(settings, "KAFKA_RETRY_DELAYS", [1, 2])
+    return broker
+
+
+@pytest.fixture
+def documents(monkeypatch):
+    documents = FakeCollection([{"_id": "d1", "status": "queued"}])
+    monkeypatch.setattr(document_uploaded_consumer, "documents_collection", documents)
+    monkeypatch.setattr("app.main_replay_dlq.documents_collection", documents)
+    return documents
+
+
+def _failing(error):
+    def process_pdf(*args, **kwargs):
+        raise error
+    return process_pdf
+
+
+def test_failures_climb_the_retry_tiers_then_dead_letter(broker, documents, monkeypatch):
+    monkeypatch.setattr(document_uploaded_consumer, "process_pdf", _failing(RuntimeError("openai timeout")))
+    consumer = DocumentUploadedConsumer(consumer=broker.consumer(UPLOADED, "test"))
+
+    consumer.handle_event(EVENT)
+    [first] = broker.records(f"{UPLOADED}-retry-1s")
+    assert first.value["attempt"] == 2 and first.value["last_error"] == "openai timeout"
+    assert first.value["retry_at"] == pytest.approx(time.time() + 1, abs=1)
+    assert documents.docs["d1"]["status"] == "retrying" and documents.docs["d1"]["attempts"] == 1
+
+    consumer.handle_event(first.value)
+    [second] = broker.records(f"{UPLOADED}-retry-2s")
+    assert second.value["attempt"] == 3
+
+    consumer.handle_event(second.value)
+    [dead] = broker.records(DLQ)
+    assert dead.value["attempt"] == 3 and "failed_at" in dead.value
+    assert documents.docs["d1"]["status"] == "failed"
+
+
+def test_permanent_errors_are_dead_lettered_at_once(broker, documents, monkeypatch):
+    monkeypatch.setattr(document_uploaded_consumer, "process_pdf", _failing(FileNotFoundError("/tmp/a.pdf")))
+    DocumentUploadedConsumer(consumer=broker.consumer(UPLOADED, "test")).handle_event(EVENT)
+
+    assert not broker.records(f"{UPLOADED}-retry-1s")
+    assert [r.value["attempt"] for r in broker.records(DLQ)] == [1]
+
+
+def test_failed_retry_publish_redelivers_the_event(broker, documents, monkeypatch):
+    monkeypatch.setattr(settings, "KAFKA_REDELIVERY_DELAY", 0.05)
+    monkeypatch.setattr(document_uploaded_consumer, "process_pdf", _failing(RuntimeError("openai timeout")))
+    kafka_down = threading.Event()
+    kafka_down.set()
+
+    class FlakyProducer:
+        def send(self, topic, value=None, key=None, headers=None):
+            if kafka_down.is_set():
+                raise KafkaTimeoutError("flush timed out")
+            broker.send(topic, value, key=key, headers=headers)
+
+        def flush(self):
+            pass
+
+    monkeypatch.setattr(producer, "get_kafka_producer", FlakyProducer)
+    broker.send(UPLOADED, EVENT)
+    consumer = DocumentUploadedConsumer(consumer=broker.consumer(UPLOADED, "test"))
+    thread = threading.Thread(target=consumer.run, daemon=True)
+    thread.start()
+    try:
+        deadline = time.monotonic() + 5
+        while documents.docs["d1"].get("error") != "openai timeout":
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        # Not lost: the document is marked failed and the event stays uncommitted
+        assert documents.docs["d1"]["status"] in ("failed", "processing")
+        assert broker.committed_offset("test", UPLOADED, 0) == 0
+
+        kafka_down.clear()
+        while broker.committed_offset("test", UPLOADED, 0) < 1:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        [retry] = broker.records(f"{UPLOADED}-retry-1s")
+        assert retry.value["attempt"] == 2
+        assert documents.docs["d1"]["status"] == "retrying"
+    finally:
+        consumer.stop()
+        thread.join(timeout=5)
+
+
+def test_retry_consumer_waits_until_due_and_requeues_on_shutdown(broker, documents, monkeypatch):
+    processed = []
+    monkeypatch.setattr(document_uploaded_consumer, "process_pdf", lambda *a: processed.append(time.time()) or 3)
+    monkeypatch.setattr(document_uploaded_consumer, "publish_document_processed", lambda *a: None)
+    topic = f"{UPLOADED}-retry-1s"
+    due = time.time() + 0.3
+    broker.send(topic, {**EVENT, "attempt": 2, "retry_at": due})
+
+    consumer = DocumentRetryConsumer(1, consumer=broker.consumer(topic, "document-retry-1s"))
+    thread = threading.Thread(target=consumer.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 5
+    while broker.committed_offset("document-retry-1s", topic, 0) < 1:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    assert processed and processed[0] >= due
+    assert documents.docs["d1"]["status"] == "processed"
+
+    # Not due before shutdown: the event goes back on its tier instead of being dropped
+    broker.send(topic, {**EVENT, "attempt": 2, "retry_at": time.time() + 60})
+    time.sleep(0.1)
+    consumer.stop()
+    thread.join(timeout=5)
+    assert len(processed) == 1
+    assert [r.value["retry_at"] > time.time() for r in broker.records(topic)[1:]] == [True, True]
+    assert broker.committed_offset("document-retry-1s", topic, 0) == 2
+
+
+def test_replay_re_drives_failed_documents_once(broker, documents):
+    documents.docs["d1"]["status"] = "failed"
+    documents.docs["d2"] = {"_id": "d2", "status": "processed"}
+    broker.send(DLQ, {**EVENT, "attempt": 3, "last_error": "boom", "failed_at": "2026-01-01T00:00:00+00:00"})
+    broker.send(DLQ, {**EVENT, "doc_id": "d2", "attempt": 3})
+
+    assert replay_dead_letters(broker.consumer(DLQ, "replay"), dry_run=True, idle_timeout_ms=10) == ["d1"]
+    assert not broker.records(UPLOADED)
+
+    assert replay_dead_letters(broker.consumer(DLQ, "replay"), idle_timeout_ms=10) == ["d1"]
+    [replayed] = broker.records(UPLOADED)
+    assert set(replayed.value) == set(EVENT) | {"timestamp"}
+    assert documents.docs["d1"]["status"] == "queued"
+
+    assert replay_dead_letters(broker.consumer(DLQ, "replay"), idle_timeout_ms=10) == []
+
+
+@pytest.fixture
+def pipeline(monkeypatch, tmp_path):
+    """The real process_pdf, on a one-page PDF, a spool nobody applies and stubbed embeddings."""
+    monkeypatch.setattr(document_service, "extract_pages", lambda path: iter([(1, "pump manual " * 50)]))
+    monkeypatch.setattr(document_service, "documents_collection", FakeCollection())
+    monkeypatch.setattr(document_service, "index_spool", IndexSpool(str(tmp_path / "spool")))
+    monkeypatch.setattr(settings, "INDEX_SPOOL_WAIT_TIMEOUT", 0.05)
+    monkeypatch.setattr(embedding_service, "create_embeddings", lambda texts: [[0.1] * 8 for _ in texts])
+    return monkeypatch
+
+
+def test_batches_the_writer_does_not_apply_are_retried(broker, documents, pipeline):
+    DocumentUploadedConsumer(consumer=broker.consumer(UPLOADED, "test")).handle_event(EVENT)
+
+    [retry] = broker.records(f"{UPLOADED}-retry-1s")
+    assert "did not apply" in retry.value["last_error"]
+    assert documents.docs["d1"]["status"] == "retrying"
+
+
+def test_embedding_failures_are_retried(broker, documents, pipeline):
+    pipeline.setattr(embedding_service, "create_embeddings", lambda texts: [None for _ in texts])
+    DocumentUploadedConsumer(consumer=broker.consumer(UPLOADED, "test")).handle_event(EVENT)
+
+    [retry] = broker.records(f"{UPLOADED}-retry-1s")
+    assert retry.value["last_error"].startswith("Could not embed 1 of 1 chunks of d1")
+    assert documents.docs["d1"]["status"] == "retrying"
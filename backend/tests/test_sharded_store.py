@@ -0,0 +1,115 @@
+import threading
+import time
+from multiprocessing.connection import Listener
+import numpy as np
+import pytest
+from app.core.config import settings
+from app.db.faiss_store import FaissStore
+from app.db.sharded_store import (ShardedFaissStore, ShardSearchClient, shard_authkey, shard_for, shard_roots,
+                                  start_local_workers)
+
+DIM = 8
+AUTHKEY = b"test"
+
+
+def _add_docs(store, users=("u1", "u2", "u3"), docs=6, chunks=4):
+    rng = np.random.default_rng(0)
+    for user in users:
+        for d in range(docs):
+            doc_id = f"{user}-d{d}"
+            store.add(rng.random((chunks, DIM), dtype="float32"),
+                      [{"user_id": user, "chunk": f"{doc_id}-c{i}", "doc_id": doc_id} for i in range(chunks)])
+
+
+def test_shard_for_is_stable_and_spreads_keys():
+    assert shard_for("user-42", 4) == shard_for("user-42", 4)
+    counts = np.bincount([shard_for(f"user-{i}", 4) for i in range(4000)], minlength=4)
+    assert counts.min() > 800
+
+
+@pytest.mark.parametrize("key", ["user_id", "doc_id"])
+def test_sharded_search_matches_a_single_store(tmp_path, key):
+    single = FaissStore(dim=DIM, data_dir=str(tmp_path / "single"))
+    sharded = ShardedFaissStore(shard_roots(str(tmp_path / "shards"), 3), key, dim=DIM)
+    _add_docs(single)
+    _add_docs(sharded)
+
+    query = np.random.default_rng(1).random(DIM, dtype="float32")
+    expected = [(m["chunk"], round(s, 5)) for m, s in single.search(query, "u2", top_k=5)]
+    assert [(m["chunk"], round(s, 5)) for m, s in sharded.search(query, "u2", top_k=5)] == expected
+
+    # Sharding by user keeps a user's rows together; by doc spreads them
+    holding = [store for store in sharded.stores if store._shard("u2").ntotal]
+    assert len(holding) == (1 if key == "user_id" else 3)
+
+
+def test_scatter_gather_over_worker_processes(tmp_path):
+    roots = shard_roots(str(tmp_path), 3)
+    writer = ShardedFaissStore(roots, "doc_id", dim=DIM)
+    _add_docs(writer)
+    addresses, processes = start_local_workers(roots, AUTHKEY, dim=DIM)
+    try:
+        client = ShardSearchClient(addresses, AUTHKEY, key="doc_id", timeout=10)
+        query = np.random.default_rng(1).random(DIM, dtype="float32")
+        expected = [m["chunk"] for m, _ in writer.search(query, "u1", top_k=5)]
+        assert [m["chunk"] for m, _ in client.search(query, "u1", top_k=5)] == expected
+
+        # Deletes go to the shard holding the document, and the connections are reused
+        assert client.delete_document("u1", "u1-d0") == 4
+        assert not any(m["doc_id"] == "u1-d0" for m, _ in client.search(query, "u1", top_k=24))
+        assert all(pool.qsize() >= 1 for pool in client._idle)
+    finally:
+        for process in processes:
+            process.terminate()
+
+
+def test_slow_shard_is_left_out_after_the_timeout(tmp_path):
+    roots = shard_roots(str(tmp_path), 2)
+    writer = ShardedFaissStore(roots, "doc_id", dim=DIM)
+    _add_docs(writer, users=("u1",))
+    addresses, processes = start_local_workers(roots[:1], AUTHKEY, dim=DIM)
+
+    # A shard that accepts the request but never answers
+    listener = Listener(("127.0.0.1", 0), authkey=AUTHKEY)
+
+    def stall():
+        conn = listener.accept()
+        conn.recv()
+        time.sleep(5)
+
+    threading.Thread(target=stall, daemon=True).start()
+    try:
+        client = ShardSearchClient(addresses + [listener.address], AUTHKEY, key="doc_id", timeout=0.5)
+        query = np.random.default_rng(1).random(DIM, dtype="float32")
+        client.search(query, "u1", top_k=3)  # warm up the worker
+
+        started = time.monotonic()
+        results = client.search(query, "u1", top_k=3)
+        assert time.monotonic() - started < 1.5
+        expected = [m["chunk"] for m, _ in writer.stores[0].search(query, "u1", top_k=3)]
+        assert [m["chunk"] for m, _ in results] == expected
+    finally:
+        for process in processes:
+            process.terminate()
+        listener.close()
+
+
+def test_connection_completed_after_the_timeout_is_closed():
+    listener = Listener(("127.0.0.1", 0), authkey=AUTHKEY)
+    client = ShardSearchClient([listener.address], AUTHKEY, timeout=0.2)
+    try:
+        assert client.warm_up() == 0  # the worker has not accepted in time
+
+        conn = listener.accept()  # the handshake completes now, after the timeout
+        with pytest.raises(EOFError):
+            conn.recv()
+    finally:
+        listener.close()
+
+
+def test_search_workers_need_their_own_authkey(monkeypatch):
+    monkeypatch.setattr(settings, "SEARCH_SHARD_AUTHKEY", "")
+    with pytest.raises(ValueError):
+        shard_authkey(settings)
+    monkeypatch.setattr(settings, "SEARCH_SHARD_AUTHKEY", "shard-secret")
+    assert shard_authkey(settings) == b"shard-secret"
@@ -0,0 +1,39 @@
+import subprocess
+import sys
+import threading
+
+from fastapi.testclient import TestClient
+
+from app.core import startup
+from tests.conftest import SRC_DIR
+
+
+def _imported_after(module: str) -> set[str]:
+    code = f"import sys, {module}; print(' '.join(sys.modules))"
+    output = subprocess.run([sys.executable, "-c", code], cwd=SRC_DIR, capture_output=True, text=True, check=True)
+    return set(output.stdout.split())
+
+
+def test_entry_points_do_not_import_what_they_do_not_use():
+    assert "openai" not in _imported_after("app.main")
+    assert not {"openai", "faiss", "numpy"} & _imported_after("app.main_notifier_consumer")
+
+
+def test_readiness_waits_for_the_warm_up(monkeypatch):
+    from app.main import app
+
+    release = threading.Event()
+
+    class SlowStore:
+        def warm_up(self, limit):
+            release.wait(10)
+
+    monkeypatch.setattr(startup, "search_store", SlowStore())
+    monkeypatch.setattr(startup, "ready", threading.Event())
+
+    with TestClient(app) as client:
+        assert client.get("/healthz").status_code == 200
+        assert client.get("/readyz").status_code == 503
+        release.set()
+        assert startup.ready.wait(10)
+        assert client.get("/readyz").json() == {"status": "ready"}
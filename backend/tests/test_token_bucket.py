@@ -0,0 +1,15 @@
+from app.utils.token_bucket import TokenBucket
+
+
+def test_bucket_allows_burst_then_asks_to_wait():
+    bucket = TokenBucket(rate_per_minute=60, capacity=2)
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() == 0
+    wait = bucket.try_acquire()
+    assert 0 < wait <= 1.0
+
+
+def test_oversized_request_passes_when_bucket_is_full():
+    bucket = TokenBucket(rate_per_minute=600, capacity=10)
+    assert bucket.try_acquire(50) == 0
+    assert bucket.try_acquire(1) > 0
@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.api import upload
+from app.core.config import settings
+from app.db.faiss_store import FaissStore
+from app.db.index_spool import IndexSpool
+from app.db.index_writer import IndexWriter
+
+DIM = 8
+
+
+class FakeCollection:
+    def __init__(self, docs=()):
+        self.docs = {d["_id"]: dict(d) for d in docs}
+
+    def find_one(self, query, projection=None):
+        doc = self.docs.get(query["_id"])
+        return dict(doc) if doc and all(doc.get(k) == v for k, v in query.items()) else None
+
+    def delete_one(self, query):
+        self.docs.pop(query["_id"], None)
+
+
+class FakeAnswerCache:
+    def __init__(self):
+        self.invalidated = []
+
+    def invalidate_user(self, user_id):
+        self.invalidated.append(user_id)
+        return 0
+
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    pdf = tmp_path / "d1_a.pdf"
+    pdf.write_bytes(b"%PDF")
+    documents = FakeCollection([
+        {"_id": "d1", "user_id": "u1", "filename": "a.pdf", "path": str(pdf)},
+        {"_id": "d2", "user_id": "u2", "filename": "b.pdf", "path": str(tmp_path / "d2_b.pdf")},
+    ])
+    store = FaissStore(dim=DIM, data_dir=str(tmp_path / "data"))
+    vectors = np.random.default_rng(0).random((6, DIM), dtype="float32")
+    store.add(vectors, [{"user_id": "u1", "chunk": f"c{i}", "doc_id": "d1" if i < 4 else "d3"} for i in range(6)])
+    spool = IndexSpool(str(tmp_path / "spool"))
+    cache = FakeAnswerCache()
+    deleted_files = []
+
+    monkeypatch.setattr(upload, "documents_collection", documents)
+    monkeypatch.setattr(upload, "search_store", store)
+    monkeypatch.setattr(upload, "index_spool", spool)
+    monkeypatch.setattr(upload, "answer_cache", cache)
+    monkeypatch.setattr(upload.storage_service, "delete_file", deleted_files.append)
+    monkeypatch.setattr(settings, "INDEX_WRITES", "spool")
+
+    app = FastAPI()
+
+    @app.middleware("http")
+    async def fake_auth(request: Request, call_next):
+        request.state.user = {"_id": "u1"}
+        return await call_next(request)
+
+    app.include_router(upload.router)
+    with TestClient(app) as client:
+        yield client, documents, store, spool, cache, deleted_files, pdf
+
+
+def test_another_users_document_is_not_found(api):
+    client, documents, store, spool, cache, deleted_files, _ = api
+    assert client.delete("/documents/d2").status_code == 404
+    assert "d2" in documents.docs
+    assert cache.invalidated == [] and deleted_files == [] and spool.pending() == []
+
+
+def test_delete_document_removes_it_everywhere_and_compacts_the_shard(api):
+    client, documents, store, spool, cache, deleted_files, pdf = api
+    response = client.delete("/documents/d1")
+    assert response.status_code == 200
+    assert response.json() == {"deleted": "d1", "chunks": 4}
+
+    assert "d1" not in documents.docs
+    assert deleted_files == ["d1"]
+    assert not pdf.exists()
+    assert cache.invalidated == ["u1"]
+    assert {m["doc_id"] for m, _ in store.search(np.ones(DIM), user_id="u1", top_k=6)} == {"d3"}
+
+    # The writer compacts the shard, as most of it is now deleted
+    assert IndexWriter(store, spool).apply_pending() == 1
+    store._compactor.submit(lambda: None).result()
+    assert store._shard("u1").ntotal == 2